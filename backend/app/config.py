@@ -3,10 +3,79 @@ import os
 class Settings:
     PROJECT_NAME: str = "UniQuest"
     PROJECT_VERSION: str = "1.0.0"
-    DATABASE_URL: str = "sqlite:///./uniquest.db"
+    # Any SQLAlchemy URL; SQLite (default) and PostgreSQL are supported
+    DATABASE_URL: str = os.environ.get("DATABASE_URL", "sqlite:///./uniquest.db")
+    # Serve requests with an asyncio engine/session (SQLAlchemy asyncio + aiosqlite/psycopg)
+    DB_ASYNC: bool = os.environ.get("DB_ASYNC", "0").lower() in ("1", "true", "yes")
+    # "production" turns on the tuned SQLite profile (WAL, pragmas, sized pools, read-only pool)
+    DB_PROFILE: str = os.environ.get("DB_PROFILE", "default").lower()
+    # Connections kept per worker process (production SQLite and PostgreSQL); WEB_CONCURRENCY workers share the database
+    DB_POOL_SIZE: int = int(os.environ.get("DB_POOL_SIZE", str(max(4, 32 // max(1, int(os.environ.get("WEB_CONCURRENCY", "1")))))))
+    DB_MAX_OVERFLOW: int = int(os.environ.get("DB_MAX_OVERFLOW", "8"))
+    # PostgreSQL: recycle connections older than this (seconds) and cancel statements running longer (ms, 0 = off)
+    DB_POOL_RECYCLE: int = int(os.environ.get("DB_POOL_RECYCLE", "1800"))
+    DB_STATEMENT_TIMEOUT_MS: int = int(os.environ.get("DB_STATEMENT_TIMEOUT_MS", "30000"))
+    SQLITE_CACHE_SIZE_KB: int = int(os.environ.get("SQLITE_CACHE_SIZE_KB", str(64 * 1024)))
+    SQLITE_MMAP_SIZE: int = int(os.environ.get("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+    SQLITE_BUSY_TIMEOUT_MS: int = int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", "5000"))
     UPLOAD_DIR: str = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "uploads")
+    # Upload size limits in bytes, per task type ("default" for the others), for profile pictures and rosters
+    UPLOAD_LIMITS: dict = {
+        "default": int(os.environ.get("MAX_UPLOAD_MB", "25")) * 1024 * 1024,
+        "project": int(os.environ.get("MAX_PROJECT_UPLOAD_MB", "200")) * 1024 * 1024,
+        "profile_picture": int(os.environ.get("MAX_PROFILE_PICTURE_MB", "5")) * 1024 * 1024,
+        "roster": int(os.environ.get("MAX_ROSTER_UPLOAD_MB", "100")) * 1024 * 1024,
+    }
+    UPLOAD_CHUNK_SIZE: int = 1024 * 1024
+    # Roster import: records resolved and inserted per transaction
+    ROSTER_BATCH_SIZE: int = int(os.environ.get("ROSTER_BATCH_SIZE", "500"))
+    # Max tasks one POST /rooms/{code}/tasks/batch may create, recurrences expanded
+    TASK_BATCH_MAX: int = int(os.environ.get("TASK_BATCH_MAX", "1000"))
+    # Logging: level of the "app" loggers, JSON log file (empty to disable) rotated by size
+    LOG_LEVEL: str = os.environ.get("LOG_LEVEL", "INFO").upper()
+    LOG_FILE: str = os.environ.get("LOG_FILE", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "logs", "uniquest.log"))
+    LOG_MAX_BYTES: int = int(os.environ.get("LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+    LOG_BACKUP_COUNT: int = int(os.environ.get("LOG_BACKUP_COUNT", "5"))
+    # Add a Server-Timing header (DB time, query count, total time) to every response
+    SERVER_TIMING: bool = os.environ.get("SERVER_TIMING", "0").lower() in ("1", "true", "yes")
+    # Bearer token GET /metrics requires; without one it only answers requests from this machine
+    METRICS_TOKEN: str = os.environ.get("METRICS_TOKEN", "")
+    # Warn when one request runs the same SQL statement more often than this
+    N_PLUS_ONE_THRESHOLD: int = int(os.environ.get("N_PLUS_ONE_THRESHOLD", "10"))
+    # Seconds between reloads of the in-memory global ranking from the XP ledger (0 = never);
+    # bounds how long XP changed by other workers or scripts takes to reach this one's ranks
+    RANK_INDEX_RESYNC_SECONDS: float = float(os.environ.get("RANK_INDEX_RESYNC_SECONDS", "60"))
+    # Max number of users whose dashboard is kept in memory, and for how long (seconds); changes
+    # made by other processes (another worker, a maintenance script) show up after at most the TTL
+    DASHBOARD_CACHE_SIZE: int = int(os.environ.get("DASHBOARD_CACHE_SIZE", "10000"))
+    DASHBOARD_CACHE_TTL: float = float(os.environ.get("DASHBOARD_CACHE_TTL", "30"))
+    # bcrypt cost for new hashes (older hashes are upgraded at login) and the worker
+    # processes that compute them (0 = hash in the request threadpool instead)
+    BCRYPT_ROUNDS: int = int(os.environ.get("BCRYPT_ROUNDS", "12"))
+    PASSWORD_WORKERS: int = int(os.environ.get("PASSWORD_WORKERS", str(min(4, os.cpu_count() or 1))))
+    # Logged-in users whose row is kept in memory, and for how long (seconds); changes made by
+    # other processes (another worker, a maintenance script) show up after at most the TTL
+    USER_CACHE_SIZE: int = int(os.environ.get("USER_CACHE_SIZE", "10000"))
+    USER_CACHE_TTL: float = float(os.environ.get("USER_CACHE_TTL", "30"))
+    # Firebase: JSON file of {kid: PEM key} used instead of Google's signing keys (local testing),
+    # and how many verified ID tokens are remembered until they expire
+    FIREBASE_KEYSET_PATH: str = os.environ.get("FIREBASE_KEYSET_PATH", "")
+    FIREBASE_TOKEN_CACHE_SIZE: int = int(os.environ.get("FIREBASE_TOKEN_CACHE_SIZE", "10000"))
+    # Live activity feeds: events kept for Last-Event-ID resume, events queued per client
+    # before the oldest are dropped, and seconds between heartbeats on an idle stream
+    EVENTS_BUFFER_SIZE: int = int(os.environ.get("EVENTS_BUFFER_SIZE", "1000"))
+    EVENTS_QUEUE_SIZE: int = int(os.environ.get("EVENTS_QUEUE_SIZE", "100"))
+    EVENTS_HEARTBEAT_SECONDS: float = float(os.environ.get("EVENTS_HEARTBEAT_SECONDS", "15"))
+    # Live leaderboards: entries streamed per board, and the window (seconds) over which
+    # score changes are collected into one update
+    LEADERBOARD_STREAM_SIZE: int = int(os.environ.get("LEADERBOARD_STREAM_SIZE", "100"))
+    LEADERBOARD_COALESCE_SECONDS: float = float(os.environ.get("LEADERBOARD_COALESCE_SECONDS", "0.5"))
 
 settings = Settings()
 
+# Hosting providers hand out postgres:// URLs, which SQLAlchemy no longer accepts
+if settings.DATABASE_URL.startswith("postgres://"):
+    settings.DATABASE_URL = settings.DATABASE_URL.replace("postgres://", "postgresql://", 1)
+
 if not os.path.exists(settings.UPLOAD_DIR):
     os.makedirs(settings.UPLOAD_DIR)
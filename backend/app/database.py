@@ -1,18 +1,153 @@
-from sqlalchemy import create_engine
+import inspect
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from starlette.concurrency import run_in_threadpool
 from .config import settings
 
-engine = create_engine(
-    settings.DATABASE_URL, connect_args={"check_same_thread": False}
-)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+def _is_sqlite(url: str) -> bool:
+    return url.startswith("sqlite")
+
+def _is_postgres(url: str) -> bool:
+    return url.startswith("postgresql")
+
+def _production_sqlite() -> bool:
+    return settings.DB_PROFILE == "production" and _is_sqlite(settings.DATABASE_URL)
+
+def _engine_options() -> dict:
+    options = {}
+    if _is_sqlite(settings.DATABASE_URL):
+        options["connect_args"] = {"check_same_thread": False}
+    if _production_sqlite() or _is_postgres(settings.DATABASE_URL):
+        # One pool per worker process: DB_POOL_SIZE connections kept open, plus overflow under bursts
+        options.update(pool_size=settings.DB_POOL_SIZE, max_overflow=settings.DB_MAX_OVERFLOW, pool_timeout=30)
+    if _is_postgres(settings.DATABASE_URL):
+        # Drop connections the server or a proxy closed in the meantime, instead of failing the request
+        options.update(pool_pre_ping=True, pool_recycle=settings.DB_POOL_RECYCLE)
+        # A runaway query is cancelled by the server rather than holding a connection forever.
+        # Sessions run in UTC, like the naive UTC timestamps SQLite stores, so day buckets match.
+        options["connect_args"] = {"options": f"-c statement_timeout={settings.DB_STATEMENT_TIMEOUT_MS} -c timezone=UTC"}
+    return options
+
+def _apply_sqlite_pragmas(sync_engine, read_only: bool = False):
+    """
+    Production SQLite profile, applied to every new connection: WAL so readers
+    never wait for the writer (and the other way round), fewer fsyncs, a
+    bigger page cache, memory-mapped reads, waiting on locks instead of
+    failing, and temp tables in memory. Read-only connections also refuse writes.
+    """
+    @event.listens_for(sync_engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA cache_size=-{settings.SQLITE_CACHE_SIZE_KB}")
+        cursor.execute(f"PRAGMA mmap_size={settings.SQLITE_MMAP_SIZE}")
+        cursor.execute(f"PRAGMA busy_timeout={settings.SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        if read_only:
+            cursor.execute("PRAGMA query_only=ON")
+        cursor.close()
+
+engine = create_engine(settings.DATABASE_URL, **_engine_options())
+# Objects stay loaded after commit so responses can be serialized outside the session's thread
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+
+# Separate read-only pool for the heavy aggregate endpoints (leaderboards,
+# dashboard), so long reads never hold connections the writers need. Only
+# with the production profile; otherwise reads share the main pool.
+read_engine = None
+ReadSessionLocal = SessionLocal
+
+if _production_sqlite():
+    _apply_sqlite_pragmas(engine)
+    read_engine = create_engine(settings.DATABASE_URL, **_engine_options())
+    _apply_sqlite_pragmas(read_engine, read_only=True)
+    ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=read_engine)
 
 Base = declarative_base()
 
-def get_db():
+def get_sync_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+def get_sync_read_db():
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+# Optional asyncio engine, selected with DB_ASYNC=1. The sync engine above is
+# still used by startup tasks and maintenance scripts.
+async_engine = None
+AsyncSessionLocal = None
+async_read_engine = None
+AsyncReadSessionLocal = None
+
+def _async_url(url: str) -> str:
+    if url.startswith("sqlite://"):
+        return url.replace("sqlite://", "sqlite+aiosqlite://", 1)
+    if url.startswith("postgresql://"):
+        # psycopg 3 drives both the sync and the asyncio engine
+        return url.replace("postgresql://", "postgresql+psycopg://", 1)
+    return url
+
+if settings.DB_ASYNC:
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+    async_engine = create_async_engine(_async_url(settings.DATABASE_URL), **_engine_options())
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+    AsyncReadSessionLocal = AsyncSessionLocal
+    if _production_sqlite():
+        _apply_sqlite_pragmas(async_engine.sync_engine)
+        async_read_engine = create_async_engine(_async_url(settings.DATABASE_URL), **_engine_options())
+        _apply_sqlite_pragmas(async_read_engine.sync_engine, read_only=True)
+        AsyncReadSessionLocal = async_sessionmaker(async_read_engine, autoflush=False, expire_on_commit=False)
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+async def get_async_read_db():
+    async with AsyncReadSessionLocal() as db:
+        yield db
+
+get_db = get_async_db if settings.DB_ASYNC else get_sync_db
+# Read-only session for endpoints that only aggregate; same as get_db outside the production profile
+if _production_sqlite():
+    get_read_db = get_async_read_db if settings.DB_ASYNC else get_sync_read_db
+else:
+    get_read_db = get_db
+
+async def run_db(db, fn, *args, **kwargs):
+    """
+    Run fn(session, *args, **kwargs), ORM code written against a sync Session,
+    without blocking the event loop.
+
+    With the async engine the function runs through AsyncSession.run_sync, so
+    its queries are awaited on the loop. With the sync engine it runs in the
+    threadpool, as FastAPI does for plain `def` routes.
+    """
+    if AsyncSessionLocal is not None and hasattr(db, "run_sync"):
+        return await db.run_sync(lambda session: fn(session, *args, **kwargs))
+    return await run_in_threadpool(fn, db, *args, **kwargs)
+
+def db_endpoint(fn):
+    """
+    Turn a route written as a plain function taking `db: Session` into an async
+    endpoint whose body runs through run_db. FastAPI sees the original signature.
+    """
+    async def endpoint(**kwargs):
+        db = kwargs.pop("db")
+        return await run_db(db, lambda session: fn(db=session, **kwargs))
+
+    endpoint.__signature__ = inspect.signature(fn)
+    endpoint.__name__ = fn.__name__
+    endpoint.__qualname__ = fn.__qualname__
+    endpoint.__doc__ = fn.__doc__
+    endpoint.__module__ = fn.__module__
+    return endpoint
@@ -1,15 +1,59 @@
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 from starlette.middleware.sessions import SessionMiddleware
-from .routers import auth, rooms, tasks, submissions, dashboard
-from .database import engine, Base
+from .routers import auth, rooms, tasks, submissions, dashboard, files, metrics, activity as activity_router
+from .database import engine, read_engine, async_engine, async_read_engine, SessionLocal
 from .config import settings
+from .utils import xp_ledger, xp_events, rank_index, passwords, activity, leaderboard_feed
+from .utils.migrations import upgrade_database
+from .utils.pagination import NEXT_CURSOR_HEADER
+from .utils.log import RequestIdMiddleware, REQUEST_ID_HEADER, setup_logging, stop_logging
+from .utils.metrics import MetricsMiddleware, instrument_engine, track_route
 
-# Create DB tables
-Base.metadata.create_all(bind=engine)
+# Per-request SQL statement counts and DB time
+for instrumented in (engine, read_engine):
+    if instrumented is not None:
+        instrument_engine(instrumented)
+for instrumented in (async_engine, async_read_engine):
+    if instrumented is not None:
+        instrument_engine(instrumented.sync_engine)
 
-app = FastAPI(title=settings.PROJECT_NAME, version=settings.PROJECT_VERSION)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    setup_logging()
+    # Create or upgrade the schema (versioned migrations in backend/migrations)
+    upgrade_database()
+    # Backfill the XP ledger for databases created before it existed
+    db = SessionLocal()
+    try:
+        xp_ledger.ensure_ledger(db)
+        # Warm the in-memory global ranking
+        rank_index.warm(db)
+    finally:
+        db.close()
+    # Pick up XP changed by other workers
+    resync = None
+    if settings.RANK_INDEX_RESYNC_SECONDS > 0:
+        resync = asyncio.ensure_future(xp_events.resync_periodically(settings.RANK_INDEX_RESYNC_SECONDS))
+    # Deliver live activity events on this loop
+    activity.bus.bind(asyncio.get_running_loop())
+    yield
+    if resync is not None:
+        resync.cancel()
+    # End the open activity streams
+    activity.bus.close()
+    leaderboard_feed.feed.close()
+    # Stop the password hashing workers
+    passwords.shutdown_pool()
+    # Flush queued log records
+    stop_logging()
+
+app = FastAPI(
+    title=settings.PROJECT_NAME, version=settings.PROJECT_VERSION, lifespan=lifespan,
+    dependencies=[Depends(track_route)]
+)
 
 # Middleware
 app.add_middleware(
@@ -18,8 +62,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, REQUEST_ID_HEADER],
 )
 app.add_middleware(SessionMiddleware, secret_key="secret-key-replace-me") # Simple session secret
+app.add_middleware(MetricsMiddleware)
+# Outermost, so everything logged for a request (metrics' N+1 warnings too) has its id
+app.add_middleware(RequestIdMiddleware)
 
 # Routers
 app.include_router(auth.router)
@@ -27,9 +75,10 @@ app.include_router(rooms.router)
 app.include_router(tasks.router)
 app.include_router(submissions.router)
 app.include_router(dashboard.router)
-
-# Static files
-app.mount("/uploads", StaticFiles(directory=settings.UPLOAD_DIR), name="uploads")
+app.include_router(activity_router.router)
+# Uploaded files (replaces the plain StaticFiles mount at /uploads)
+app.include_router(files.router)
+app.include_router(metrics.router)
 
 @app.get("/")
 def read_root():
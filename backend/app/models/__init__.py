@@ -1 +1 @@
-from .all import User, Room, RoomMember, Task, Submission, TaskType
+from .all import User, Room, RoomMember, Task, Submission, TaskType, XPLedger, Blob
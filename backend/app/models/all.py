@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Enum, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, Date, ForeignKey, Enum, Boolean, UniqueConstraint, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 import enum
@@ -46,6 +46,11 @@ class Room(Base):
 
 class RoomMember(Base):
     __tablename__ = "room_members"
+    __table_args__ = (
+        # Membership/admin checks (user, room) and member lists (room)
+        Index("ix_room_members_user_room", "user_id", "room_id"),
+        Index("ix_room_members_room_user", "room_id", "user_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
@@ -58,6 +63,10 @@ class RoomMember(Base):
 
 class Task(Base):
     __tablename__ = "tasks"
+    __table_args__ = (
+        # A room's tasks, in deadline order
+        Index("ix_tasks_room_deadline", "room_id", "deadline"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     room_id = Column(Integer, ForeignKey("rooms.id"))
@@ -75,14 +84,50 @@ class Task(Base):
 
 class Submission(Base):
     __tablename__ = "submissions"
+    __table_args__ = (
+        # At most one submission per user and task; also serves lookups by task
+        Index("ix_submissions_task_user", "task_id", "user_id", unique=True),
+        # A user's submissions, newest first (dashboard, daily XP)
+        Index("ix_submissions_user_timestamp", "user_id", "timestamp"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     task_id = Column(Integer, ForeignKey("tasks.id"))
     user_id = Column(Integer, ForeignKey("users.id"))
-    file_path = Column(String)
+    file_path = Column(String, index=True)
     timestamp = Column(DateTime(timezone=True), server_default=func.now())
     xp_awarded = Column(Integer, default=0)
     status = Column(String, default="pending") # "pending", "verified", "rejected"
 
     task = relationship("Task", back_populates="submissions")
     user = relationship("User", back_populates="submissions")
+
+class Blob(Base):
+    """Content-addressed upload, stored once however many submissions use it."""
+    __tablename__ = "blobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    sha256 = Column(String(64), unique=True, index=True)
+    # Relative to UPLOAD_DIR, e.g. "blobs/ab/cd/abcd...ef.pdf"
+    path = Column(String, unique=True, index=True)
+    size = Column(Integer)
+    ref_count = Column(Integer, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class XPLedger(Base):
+    """Per (user, room, day) running totals of base XP and submission count.
+
+    Maintained alongside every Submission write so leaderboards never have to
+    rescan the submissions table. The daily multiplier is applied on read.
+    """
+    __tablename__ = "xp_ledger"
+    __table_args__ = (
+        UniqueConstraint("user_id", "room_id", "day", name="uq_xp_ledger_user_room_day"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
+    room_id = Column(Integer, ForeignKey("rooms.id"), index=True)
+    day = Column(Date)
+    base_xp = Column(Integer, default=0)
+    submission_count = Column(Integer, default=0)
@@ -0,0 +1,179 @@
+import json
+from typing import Awaitable, Callable, List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from ..config import settings
+from ..database import get_db, run_db
+from ..models import Room, RoomMember
+from ..utils.auth import get_current_identity, Identity
+from ..utils import activity
+from ..utils.leaderboard_feed import feed as leaderboard_feed, board_topic
+
+# Live activity feeds, so clients don't poll /dashboard: a user's own
+# submissions and their reviews, or everything happening in one room. And
+# live leaderboards, so they don't poll the leaderboard endpoints: a
+# snapshot, then deltas (see utils/leaderboard_feed.py). Server-Sent Events
+# (reconnect with Last-Event-ID to get what was missed), or the same events
+# over a WebSocket. See utils/activity.py.
+
+router = APIRouter(prefix="/activity", tags=["activity"])
+
+# Tell EventSource clients how long to wait before reconnecting (ms)
+RETRY_MS = 3000
+
+class EventStream(StreamingResponse):
+    media_type = "text/event-stream"
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            # A failed send (client gone) leaves the generator suspended; close it
+            # now so its subscription goes away instead of waiting for the GC
+            await self.body_iterator.aclose()
+
+def _member_room_id(db: Session, code: str, user_id: int) -> int:
+    room_id = db.query(Room.id).filter(Room.code == code.strip().upper()).scalar()
+    if room_id is None:
+        raise HTTPException(status_code=404, detail="Room not found")
+    is_member = db.query(RoomMember.id).filter(RoomMember.user_id == user_id, RoomMember.room_id == room_id).first()
+    # Give the connection back now: the stream may stay open for hours
+    db.rollback()
+    if not is_member:
+        raise HTTPException(status_code=403, detail="Not a member of this room")
+    return room_id
+
+def _room_id(db: Session, code: str) -> int:
+    room_id = db.query(Room.id).filter(Room.code == code.strip().upper()).scalar()
+    db.rollback()
+    if room_id is None:
+        raise HTTPException(status_code=404, detail="Room not found")
+    return room_id
+
+def _last_event_id(request: Request, last_event_id: Optional[str]) -> Optional[int]:
+    value = request.headers.get("last-event-id") or last_event_id
+    try:
+        return int(value) if value else None
+    except ValueError:
+        return None
+
+Snapshot = Optional[Callable[[], Awaitable[activity.Event]]]
+
+def _leaderboard_snapshot(room_id: Optional[int]) -> Snapshot:
+    async def snapshot():
+        data = await leaderboard_feed.snapshot(room_id)
+        # Resuming from its id replays the deltas sent after it
+        return activity.Event((), "leaderboard.snapshot", json.dumps(data, separators=(",", ":")), id=activity.bus.last_id)
+    return snapshot
+
+def _subscribe(topics: List[str], last_event_id: Optional[int], snapshot: Snapshot):
+    if snapshot is not None:
+        # Pick up from the buffered deltas when possible, else start over from a snapshot
+        if last_event_id is not None and activity.bus.can_resume(last_event_id):
+            snapshot = None
+        else:
+            last_event_id = None
+    return activity.bus.subscribe(topics, last_event_id), snapshot
+
+async def _sse(request: Request, topics: List[str], last_event_id: Optional[int], snapshot: Snapshot):
+    subscription, snapshot = _subscribe(topics, last_event_id, snapshot)
+    try:
+        yield f"retry: {RETRY_MS}\n\n"
+        if snapshot is not None:
+            yield (await snapshot()).to_sse()
+        while not subscription.closed:
+            event = await subscription.get(settings.EVENTS_HEARTBEAT_SECONDS)
+            if event is None and subscription.closed:
+                break
+            if event is not None:
+                yield event.to_sse()
+            elif await request.is_disconnected():
+                break
+            else:
+                # Keeps proxies from closing an idle stream
+                yield ": heartbeat\n\n"
+    finally:
+        activity.bus.unsubscribe(subscription)
+
+def _stream(request: Request, topics: List[str], last_event_id: Optional[str], snapshot: Snapshot = None) -> EventStream:
+    return EventStream(
+        _sse(request, topics, _last_event_id(request, last_event_id), snapshot),
+        # X-Accel-Buffering: nginx would otherwise hold events back
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+async def _socket(websocket: WebSocket, topics: List[str], last_event_id: Optional[int], snapshot: Snapshot = None):
+    await websocket.accept()
+    subscription, snapshot = _subscribe(topics, last_event_id, snapshot)
+    try:
+        if snapshot is not None:
+            await websocket.send_text((await snapshot()).to_json())
+        while not subscription.closed:
+            event = await subscription.get(settings.EVENTS_HEARTBEAT_SECONDS)
+            if event is None and subscription.closed:
+                break
+            await websocket.send_text(event.to_json() if event is not None else '{"event": "heartbeat"}')
+    except WebSocketDisconnect:
+        pass
+    finally:
+        activity.bus.unsubscribe(subscription)
+    if subscription.closed:
+        # Server shutting down
+        await websocket.close(code=1001)
+
+@router.get("/stream")
+async def my_activity(request: Request, last_event_id: Optional[str] = Query(None), user: Identity = Depends(get_current_identity)):
+    """Events for the caller's own submissions, in every room."""
+    return _stream(request, [activity.user_topic(user.id)], last_event_id)
+
+@router.get("/rooms/{code}/stream")
+async def room_activity(code: str, request: Request, last_event_id: Optional[str] = Query(None), user: Identity = Depends(get_current_identity), db: Session = Depends(get_db)):
+    """Events for every submission in the room (members only)."""
+    room_id = await run_db(db, _member_room_id, code, user.id)
+    return _stream(request, [activity.room_topic(room_id)], last_event_id)
+
+@router.websocket("/ws")
+async def activity_socket(websocket: WebSocket, room: Optional[str] = None, last_event_id: Optional[int] = None, db: Session = Depends(get_db)):
+    """
+    The same events as JSON messages ({"id", "event", "data"}): the caller's
+    own, or those of ?room=<code>. Pings with {"event": "heartbeat"}.
+    """
+    user_id = websocket.session.get("user_id")
+    if not user_id:
+        await websocket.close(code=1008, reason="Not authenticated")
+        return
+    if room is not None:
+        try:
+            topics = [activity.room_topic(await run_db(db, _member_room_id, room, user_id))]
+        except HTTPException as e:
+            await websocket.close(code=1008, reason=e.detail)
+            return
+    else:
+        topics = [activity.user_topic(user_id)]
+    await _socket(websocket, topics, last_event_id)
+
+# Leaderboards are public, like GET /rooms/global/leaderboard and /rooms/{code}/leaderboard
+
+@router.get("/leaderboard/stream")
+async def global_leaderboard(request: Request, last_event_id: Optional[str] = Query(None)):
+    """The global top entries: a leaderboard.snapshot, then leaderboard.delta events."""
+    return _stream(request, [board_topic(None)], last_event_id, _leaderboard_snapshot(None))
+
+@router.get("/rooms/{code}/leaderboard/stream")
+async def room_leaderboard(code: str, request: Request, last_event_id: Optional[str] = Query(None), db: Session = Depends(get_db)):
+    """The room's top entries: a leaderboard.snapshot, then leaderboard.delta events."""
+    room_id = await run_db(db, _room_id, code)
+    return _stream(request, [board_topic(room_id)], last_event_id, _leaderboard_snapshot(room_id))
+
+@router.websocket("/leaderboard/ws")
+async def leaderboard_socket(websocket: WebSocket, room: Optional[str] = None, last_event_id: Optional[int] = None, db: Session = Depends(get_db)):
+    """The global leaderboard, or that of ?room=<code>, as JSON messages."""
+    room_id = None
+    if room is not None:
+        try:
+            room_id = await run_db(db, _room_id, room)
+        except HTTPException as e:
+            await websocket.close(code=1008, reason=e.detail)
+            return
+    await _socket(websocket, [board_topic(room_id)], last_event_id, _leaderboard_snapshot(room_id))
@@ -1,16 +1,25 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Request, UploadFile, File
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from typing import Optional
-from ..database import get_db
+import os
+import uuid
+from ..database import get_db, run_db
 from ..models import User
 from ..schemas import UserCreate, UserResponse, UserLogin, UserUpdate, FirebaseLogin
-from ..utils.auth import get_current_user, get_password_hash, verify_password
+from ..utils.auth import get_current_user, hash_password, check_password, check_password_and_rehash, cache_user, forget_user
 from ..utils.firebase import verify_firebase_token
+from ..utils.dashboard_cache import dashboard_cache
+from ..utils.log import get_logger
+from ..utils.uploads import stage_upload, upload_limit, safe_filename
+from ..config import settings
 
 router = APIRouter(prefix="/auth", tags=["auth"])
+logger = get_logger(__name__)
 
-@router.post("/signup", response_model=UserResponse)
-def signup(user_in: UserCreate, request: Request, db: Session = Depends(get_db)):
+PROFILE_PICTURE_DIR = os.path.join(settings.UPLOAD_DIR, "profile_pictures")
+
+def _check_user_available(db: Session, user_in: UserCreate):
     # Check if user already exists
     user = db.query(User).filter(
         (User.username == user_in.username) | 
@@ -21,60 +30,64 @@ def signup(user_in: UserCreate, request: Request, db: Session = Depends(get_db))
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="User with this username or email already exists"
         )
-    
+
+def _create_user(db: Session, user_in: UserCreate, hashed_password: str):
     new_user = User(
         username=user_in.username,
         email=user_in.email,
         student_id=user_in.student_id,
-        hashed_password=get_password_hash(user_in.password)
+        hashed_password=hashed_password
     )
     db.add(new_user)
     db.commit()
     db.refresh(new_user)
+    return new_user
+
+def _find_login_user(db: Session, identifier: str):
+    return db.query(User).filter(
+        (User.username == identifier) | 
+        (User.email == identifier)
+    ).first()
+
+# bcrypt is CPU bound, so hashing runs in the password worker processes and DB work through run_db
+
+@router.post("/signup", response_model=UserResponse)
+async def signup(user_in: UserCreate, request: Request, db: Session = Depends(get_db)):
+    await run_db(db, _check_user_available, user_in)
+    hashed_password = await hash_password(user_in.password)
+    new_user = await run_db(db, _create_user, user_in, hashed_password)
     request.session["user_id"] = new_user.id
+    cache_user(new_user)
     return new_user
 
 @router.post("/login", response_model=UserResponse)
-def login(user_in: UserLogin, request: Request, db: Session = Depends(get_db)):
-    user = db.query(User).filter(
-        (User.username == user_in.identifier) | 
-        (User.email == user_in.identifier)
-    ).first()
+async def login(user_in: UserLogin, request: Request, db: Session = Depends(get_db)):
+    user = await run_db(db, _find_login_user, user_in.identifier)
     
-    if not user or not verify_password(user_in.password, user.hashed_password):
+    valid, new_hash = (False, None)
+    if user and user.hashed_password:
+        valid, new_hash = await check_password_and_rehash(user_in.password, user.hashed_password)
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username/email or password"
         )
+    if new_hash:
+        # Stored with an outdated cost (BCRYPT_ROUNDS changed): upgrade it now that we know the password
+        user.hashed_password = new_hash
+        await run_db(db, _save_user, user)
     
     request.session["user_id"] = user.id
+    cache_user(user)
     return user
 
-@router.post("/firebase-login", response_model=UserResponse)
-def firebase_login(login_in: FirebaseLogin, request: Request, db: Session = Depends(get_db)):
-    print(f"DEBUG: Attempting Firebase login with provider: {login_in.provider}")
-    # Verify token
-    try:
-        decoded_token = verify_firebase_token(login_in.id_token)
-    except HTTPException as e:
-        print(f"DEBUG: Verification failed: {e.detail}")
-        raise e
-    except Exception as e:
-        print(f"DEBUG: Unexpected verification error: {str(e)}")
-        raise HTTPException(status_code=401, detail=str(e))
-
+def _resolve_firebase_user(db: Session, decoded_token: dict, provider: str):
     email = decoded_token.get("email")
     uid = decoded_token.get("uid")
-    name = decoded_token.get("name") or decoded_token.get("email").split("@")[0]
-    print(f"DEBUG: Token verified for email: {email}, uid: {uid}, name: {name}")
-
-    if not email:
-        raise HTTPException(status_code=400, detail="Firebase token missing email")
 
     # 1. Existing user with this Firebase UID
     user = db.query(User).filter(User.firebase_uid == uid).first()
     if user:
-        request.session["user_id"] = user.id
         return user
 
     # 2. Existing user with this email (Link them)
@@ -84,14 +97,14 @@ def firebase_login(login_in: FirebaseLogin, request: Request, db: Session = Depe
         # If they use a social login, we can mark it as their primary provider
         # or just keep traditional if they had a password
         if user.provider == "traditional":
-             user.provider = login_in.provider
+             user.provider = provider
         db.commit()
         db.refresh(user)
-        request.session["user_id"] = user.id
         return user
 
     # 3. New user
     # Generate unique username if taken
+    name = decoded_token.get("name") or email.split("@")[0]
     base_username = name.replace(" ", "_").lower()
     username = base_username
     counter = 1
@@ -103,17 +116,46 @@ def firebase_login(login_in: FirebaseLogin, request: Request, db: Session = Depe
         username=username,
         email=email,
         firebase_uid=uid,
-        provider=login_in.provider,
+        provider=provider,
         hashed_password=None # No password for social-only users initially
     )
     db.add(new_user)
     db.commit()
     db.refresh(new_user)
-    request.session["user_id"] = new_user.id
     return new_user
 
+@router.post("/firebase-login", response_model=UserResponse)
+async def firebase_login(login_in: FirebaseLogin, request: Request, db: Session = Depends(get_db)):
+    logger.debug("Attempting Firebase login", extra={"provider": login_in.provider})
+    # Verify token (may fetch Google's certificates, keep it off the event loop)
+    try:
+        decoded_token = await run_in_threadpool(verify_firebase_token, login_in.id_token)
+    except HTTPException as e:
+        logger.info("Firebase token rejected: %s", e.detail)
+        raise e
+    except Exception as e:
+        logger.warning("Unexpected Firebase verification error", exc_info=True)
+        raise HTTPException(status_code=401, detail=str(e))
+
+    email = decoded_token.get("email")
+    uid = decoded_token.get("uid")
+    name = decoded_token.get("name") or (email or "").split("@")[0]
+    logger.debug("Firebase token verified", extra={"email": email, "uid": uid, "display_name": name})
+
+    if not email:
+        raise HTTPException(status_code=400, detail="Firebase token missing email")
+
+    user = await run_db(db, _resolve_firebase_user, decoded_token, login_in.provider)
+    request.session["user_id"] = user.id
+    # May have linked the Firebase uid/provider to an existing account
+    cache_user(user)
+    return user
+
 @router.post("/logout")
 def logout(request: Request):
+    user_id = request.session.get("user_id")
+    if user_id:
+        forget_user(user_id)
     request.session.clear()
     return {"message": "Logged out"}
 
@@ -121,6 +163,22 @@ def logout(request: Request):
 def get_me(user: User = Depends(get_current_user)):
     return user
 
+def _check_profile_fields(db: Session, current_user: User, username: Optional[str], email: Optional[str]):
+    if username:
+        # Check if username exists
+        existing_user = db.query(User).filter(User.username == username, User.id != current_user.id).first()
+        if existing_user:
+            raise HTTPException(status_code=400, detail="Username already taken")
+        
+    if email:
+        existing_user = db.query(User).filter(User.email == email, User.id != current_user.id).first()
+        if existing_user:
+            raise HTTPException(status_code=400, detail="Email already taken")
+
+def _save_user(db: Session, user: User):
+    db.commit()
+    db.refresh(user)
+
 @router.put("/me", response_model=UserResponse)
 async def update_me(
     username: Optional[str] = None,
@@ -133,21 +191,10 @@ async def update_me(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    import os
-    import uuid
-    from pathlib import Path
-    
+    await run_db(db, _check_profile_fields, current_user, username, email)
     if username:
-        # Check if username exists
-        existing_user = db.query(User).filter(User.username == username, User.id != current_user.id).first()
-        if existing_user:
-            raise HTTPException(status_code=400, detail="Username already taken")
         current_user.username = username
-        
     if email:
-        existing_user = db.query(User).filter(User.email == email, User.id != current_user.id).first()
-        if existing_user:
-            raise HTTPException(status_code=400, detail="Email already taken")
         current_user.email = email
         
     if student_id is not None:
@@ -158,33 +205,33 @@ async def update_me(
         if current_user.hashed_password:
             if not old_password:
                 raise HTTPException(status_code=400, detail="Old password is required to set a new password")
-            if not verify_password(old_password, current_user.hashed_password):
+            if not await check_password(old_password, current_user.hashed_password):
                 raise HTTPException(status_code=400, detail="Incorrect old password")
         
         if password != confirm_password:
             raise HTTPException(status_code=400, detail="New passwords do not match")
             
-        current_user.hashed_password = get_password_hash(password)
+        current_user.hashed_password = await hash_password(password)
         
     # Handle profile picture upload
+    upload = None
     if profile_picture:
-        # Create uploads directory if it doesn't exist
-        upload_dir = Path("uploads/profile_pictures")
-        upload_dir.mkdir(parents=True, exist_ok=True)
-        
         # Generate unique filename
-        file_extension = os.path.splitext(profile_picture.filename)[1]
-        unique_filename = f"{uuid.uuid4()}{file_extension}"
-        file_path = upload_dir / unique_filename
-        
-        # Save the file
-        with open(file_path, "wb") as buffer:
-            content = await profile_picture.read()
-            buffer.write(content)
-        
+        file_extension = os.path.splitext(safe_filename(profile_picture.filename))[1]
+        upload = await stage_upload(profile_picture, f"{uuid.uuid4()}{file_extension}", upload_limit("profile_picture"))
         # Store relative path in database
-        current_user.profile_picture = f"/uploads/profile_pictures/{unique_filename}"
+        current_user.profile_picture = f"/uploads/profile_pictures/{upload.filename}"
         
-    db.commit()
-    db.refresh(current_user)
+    try:
+        await run_db(db, _save_user, current_user)
+    except BaseException:
+        if upload:
+            await upload.discard()
+        raise
+    cache_user(current_user)
+    if upload:
+        await upload.commit(os.path.join(PROFILE_PICTURE_DIR, upload.filename))
+    if username or email:
+        # Usernames and emails are shown in the cached top adventurers
+        dashboard_cache.invalidate_top()
     return current_user
@@ -1,82 +1,50 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request, Response
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 from datetime import datetime, timedelta
 from collections import defaultdict
-from ..database import get_db
+from ..database import get_read_db, db_endpoint
 from ..models import User, Submission, Task, Room
 from ..schemas import DashboardResponse, ActivityEntry, DailyXP, LeaderboardEntry, RoomXP
-from ..utils.auth import get_current_user
-from ..utils.game_logic import get_daily_multiplier
+from ..utils.auth import get_current_identity, Identity
+from ..utils.game_logic import apply_daily_multiplier
+from ..utils import xp_ledger, rank_index
+from ..utils.loaders import BatchLoader, get_read_loader
+from ..utils.dashboard_cache import dashboard_cache
 
 router = APIRouter(prefix="/dashboard", tags=["dashboard"])
 
-@router.get("", response_model=DashboardResponse)
-def get_dashboard(user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    """
-    Aggregate dashboard statistics for the current user.
-    Returns total XP, level, streak, completed quests, daily XP breakdown,
-    room XP, recent activities, and global leaderboard.
-    """
-    
-    # Fetch all user submissions
-    user_submissions = db.query(Submission).filter(
-        Submission.user_id == user.id
-    ).order_by(Submission.timestamp).all()
-    
+def _build_user_section(user_id: int, today, db: Session, loader: BatchLoader) -> dict:
+    # Everything on the dashboard that only depends on this user's submissions
+    # Per (room, day) XP buckets for this user, maintained by the XP ledger
+    ledger_rows = xp_ledger.user_rows(db, user_id)
+
     # Calculate XP by room FIRST (this is the source of truth for multipliers)
+    room_xp_map = defaultdict(int)
+    xp_by_day_dict = defaultdict(int)
+    for row in ledger_rows:
+        # Calculate room XP with daily multipliers (Per Room Rule)
+        final_daily_room_xp = apply_daily_multiplier(row.base_xp, row.submission_count)
+        room_xp_map[row.room_id] += final_daily_room_xp
+        # Daily breakdown for chart: sum of the Room-XP contributions for that day
+        xp_by_day_dict[row.day] += final_daily_room_xp
+
+    rooms_by_id = loader.load_many(Room, room_xp_map.keys())
+
     xp_by_room_data = []
-    submissions_by_room = defaultdict(list)
-    
-    for submission in user_submissions:
-        task = db.query(Task).filter(Task.id == submission.task_id).first()
-        if task:
-            submissions_by_room[task.room_id].append(submission)
-            
     total_xp = 0 # This will be the sum of room XPs
-    
-    for room_id, room_subs in submissions_by_room.items():
-        room = db.query(Room).filter(Room.id == room_id).first()
-        if room:
-            # Calculate room XP with daily multipliers (Per Room Rule)
-            room_subs_by_day = defaultdict(list)
-            for sub in room_subs:
-                day = sub.timestamp.date()
-                room_subs_by_day[day].append(sub)
-            
-            room_xp = 0
-            for day, subs in room_subs_by_day.items():
-                daily_base = sum(s.xp_awarded for s in subs)
-                multiplier = get_daily_multiplier(len(subs))
-                room_xp += int(daily_base * multiplier)
-            
-            # Add to GLOBAL TOTAL
-            total_xp += room_xp
-            
-            xp_by_room_data.append(RoomXP(
-                room_id=room.id,
-                room_name=room.name,
-                room_code=room.code,
-                xp=room_xp
-            ))
-            
-    # Calculate daily breakdown for chart (Visualization only)
-    # We can still show "XP earned on Day X", but we should probably sum the Room-XP-contributions for that day?
-    # Or just show raw daily base * multiplier logic?
-    # To be consistent with total_xp, we really should sum "XP earned in Room A on Day X" + "XP earned in Room B on Day X".
-    
-    xp_by_day_dict = defaultdict(int)
-    for room_id, room_subs in submissions_by_room.items():
-         room_subs_by_day = defaultdict(list)
-         for sub in room_subs:
-             day = sub.timestamp.date()
-             room_subs_by_day[day].append(sub)
-         
-         for day, subs in room_subs_by_day.items():
-             daily_base = sum(s.xp_awarded for s in subs)
-             multiplier = get_daily_multiplier(len(subs))
-             final_daily_room_xp = int(daily_base * multiplier)
-             xp_by_day_dict[day] += final_daily_room_xp
+    for room_id in room_xp_map:
+        room = rooms_by_id.get(room_id)
+        if not room:
+            continue
+        # Add to GLOBAL TOTAL
+        total_xp += room_xp_map[room.id]
+        xp_by_room_data.append(RoomXP(
+            room_id=room.id,
+            room_name=room.name,
+            room_code=room.code,
+            xp=room_xp_map[room.id]
+        ))
 
     xp_by_day_data = [DailyXP(date=d.isoformat(), xp=xp) for d, xp in sorted(xp_by_day_dict.items())]
 
@@ -86,10 +54,9 @@ def get_dashboard(user: User = Depends(get_current_user), db: Session = Depends(
     # Calculate streak (consecutive days with submissions)
     # Streak logic is loose (just checking for any submission)
     current_streak = 0
-    if user_submissions:
+    if xp_by_day_dict:
         # Group ANY submission by day for streak check
-        streak_days = sorted(list(set(s.timestamp.date() for s in user_submissions)), reverse=True)
-        today = datetime.now().date()
+        streak_days = sorted(xp_by_day_dict.keys(), reverse=True)
                
         # Check if there's activity today or yesterday
         if streak_days[0] >= today - timedelta(days=1):
@@ -104,15 +71,19 @@ def get_dashboard(user: User = Depends(get_current_user), db: Session = Depends(
                     break
     
     # Quests completed
-    quests_completed = len(user_submissions)
+    quests_completed = sum(row.submission_count for row in ledger_rows)
     
     # Recent activities
     recent_activities = []
-    recent_subs = user_submissions[-5:][::-1]  # Last 5, reversed
+    recent_subs = db.query(Submission).filter(
+        Submission.user_id == user_id
+    ).order_by(Submission.timestamp.desc(), Submission.id.desc()).limit(5).all()
     
+    tasks_by_id = loader.load_many(Task, [s.task_id for s in recent_subs])
+    loader.load_many(Room, [t.room_id for t in tasks_by_id.values()])
     for submission in recent_subs:
-        task = db.query(Task).filter(Task.id == submission.task_id).first()
-        room = db.query(Room).filter(Room.id == task.room_id).first() if task else None
+        task = tasks_by_id.get(submission.task_id)
+        room = loader.load(Room, task.room_id) if task else None
         
         if task and room:
             recent_activities.append(ActivityEntry(
@@ -121,69 +92,92 @@ def get_dashboard(user: User = Depends(get_current_user), db: Session = Depends(
                 xp_earned=submission.xp_awarded,
                 timestamp=submission.timestamp
             ))
+
+    return {
+        "total_xp": total_xp,
+        "level": level,
+        "current_streak": current_streak,
+        "quests_completed": quests_completed,
+        "xp_by_day": xp_by_day_data[-30:],  # Last 30 days
+        "xp_by_room": xp_by_room_data,
+        "recent_activities": recent_activities,
+    }
+
+def _build_top_adventurers(loader: BatchLoader):
+    # Global Leaderboard (Top 10)
+    # Ranks come from the in-memory ranked index, kept in sync with the XP ledger
+    top_ranked = rank_index.leaderboard_index.top(10)
     
-    # Optimized Global Leaderboard (Top 10)
-    # Must use SAME aggregation logic: Sum of Room XPs
-    
-    # 1. Get all submissions join Task to get Room ID
-    all_subs_query = db.query(Submission, Task.room_id).join(Task, Submission.task_id == Task.id).all()
-    
-    # 2. Build map: User -> Room -> Day -> List[Sub]
-    # user_room_day_map[uid][rid][date] = [subs...]
-    user_room_day_map = defaultdict(lambda: defaultdict(lambda: defaultdict(list)))
-    
-    for sub, rid in all_subs_query:
-        d = sub.timestamp.date()
-        user_room_day_map[sub.user_id][rid][d].append(sub)
-        
-    # 3. Calculate Scores
-    user_xp_map = defaultdict(int)
-    for uid, rooms in user_room_day_map.items():
-        user_total = 0
-        for rid, days in rooms.items():
-            for d, subs in days.items():
-                base = sum((s.xp_awarded or 0) for s in subs)
-                mult = get_daily_multiplier(len(subs))
-                user_total += int(base * mult)
-        user_xp_map[uid] = user_total
-
-    # Get user details for the top XP earners
-    sorted_user_ids = sorted(user_xp_map.keys(), key=lambda uid: user_xp_map[uid], reverse=True)
-    top_u_ids = sorted_user_ids[:10]
-    
-    top_users = db.query(User).filter(User.id.in_(top_u_ids)).all()
-    user_info = {u.id: {"username": u.username, "email": u.email} for u in top_users}
+    top_users = loader.load_many(User, [uid for _, uid, _ in top_ranked])
+    user_info = {u.id: {"username": u.username, "email": u.email} for u in top_users.values()}
     
     top_adventurers = []
-    for idx, uid in enumerate(top_u_ids):
+    for rank, uid, xp in top_ranked:
         if uid in user_info:
             top_adventurers.append(LeaderboardEntry(
                 user_id=uid,
                 username=user_info[uid]["username"],
                 email=user_info[uid]["email"],
-                total_xp=user_xp_map[uid],
-                rank=idx + 1
+                total_xp=xp,
+                rank=rank
             ))
-            
+
+    return top_adventurers
+
+@router.get("", response_model=DashboardResponse)
+@db_endpoint
+def get_dashboard(
+    request: Request,
+    response: Response,
+    user: Identity = Depends(get_current_identity),
+    db: Session = Depends(get_read_db),
+    loader: BatchLoader = Depends(get_read_loader)
+):
+    """
+    Aggregate dashboard statistics for the current user.
+    Returns total XP, level, streak, completed quests, daily XP breakdown,
+    room XP, recent activities, and global leaderboard.
+
+    Sections are served from the dashboard cache when nothing changed, and
+    an unchanged dashboard answers If-None-Match with 304 without touching the DB.
+    """
+    today = datetime.now().date()
+    token = dashboard_cache.token(user.id)
+    index = rank_index.leaderboard_index
+
     # Calculate current user's global rank
-    global_rank = None
-    if user.id in user_xp_map:
-        # Find index in sorted list
-        global_rank = sorted_user_ids.index(user.id) + 1
-    else:
-        # If user has no submissions/XP, check if they exist in sorted list (no)
+    global_rank = index.rank(user.id)
+    if global_rank is None:
+        # If user has no submissions/XP they are not ranked
         # Rank is effectively "Last"
-        global_rank = len(sorted_user_ids) + 1
-    
+        global_rank = len(index) + 1
+    
+    cached_user = dashboard_cache.get_user(user.id, today)
+    cached_top = dashboard_cache.get_top()
+    if cached_user and cached_top:
+        etag = dashboard_cache.etag(cached_user[0], cached_top[0], global_rank)
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "private, no-cache"})
+
+    if cached_user:
+        user_stamp, user_section = cached_user
+    else:
+        user_section = _build_user_section(user.id, today, db, loader)
+        user_stamp = dashboard_cache.set_user(user.id, today, user_section, token)
+
+    if cached_top:
+        top_stamp, top_adventurers = cached_top
+    else:
+        top_adventurers = _build_top_adventurers(loader)
+        top_stamp = dashboard_cache.set_top(top_adventurers, token)
+
+    # Only hand out an ETag for fully cached responses
+    if user_stamp and top_stamp:
+        response.headers["ETag"] = dashboard_cache.etag(user_stamp, top_stamp, global_rank)
+    response.headers["Cache-Control"] = "private, no-cache"
+
     return DashboardResponse(
-        total_xp=total_xp,
-        level=level,
-        current_streak=current_streak,
-        quests_completed=quests_completed,
-        xp_by_day=xp_by_day_data[-30:],  # Last 30 days
-        xp_by_room=xp_by_room_data,
-        recent_activities=recent_activities,
+        **user_section,
         top_adventurers=top_adventurers,
         global_rank=global_rank
     )
-
@@ -0,0 +1,88 @@
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.responses import FileResponse
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+from email.utils import formatdate, parsedate_to_datetime
+import os
+from ..database import get_db, db_endpoint
+from ..models import Submission, Task, RoomMember
+from ..utils.auth import get_current_identity, Identity
+from ..utils import blobs
+
+# Serves everything under UPLOAD_DIR at the paths the old StaticFiles mount
+# used. FileResponse already handles Range/If-Range and hands the file to
+# the server (ASGI pathsend) when it supports zero-copy sends; this module
+# adds the access rules, strong ETags, conditional 304s and cache headers.
+
+router = APIRouter(prefix="/uploads", tags=["files"])
+
+# Content-addressed blobs and random profile picture names never change
+IMMUTABLE = "max-age=31536000, immutable"
+
+def _local_path(file_path: str) -> str:
+    parts = file_path.split("/")
+    # No traversal and nothing hidden (e.g. the upload pipeline's .tmp dir)
+    if "\\" in file_path or any(not p or p.startswith(".") for p in parts):
+        raise HTTPException(status_code=404, detail="File not found")
+    path = blobs.resolve(file_path)
+    if not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="File not found")
+    return path
+
+def _etag(file_path: str, stat: os.stat_result) -> str:
+    if file_path.startswith(blobs.BLOB_DIR + "/"):
+        # The name is the SHA-256 of the content
+        return f'"{os.path.splitext(os.path.basename(file_path))[0]}"'
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+def _not_modified(request: Request, etag: str, stat: os.stat_result) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags or f"W/{etag}" in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(stat.st_mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+def _serve(request: Request, file_path: str, cache_control: str) -> Response:
+    path = _local_path(file_path)
+    stat = os.stat(path)
+    headers = {
+        "etag": _etag(file_path, stat),
+        "last-modified": formatdate(stat.st_mtime, usegmt=True),
+        "cache-control": cache_control,
+    }
+    if _not_modified(request, headers["etag"], stat):
+        return Response(status_code=304, headers=headers)
+    return FileResponse(path, headers=headers, stat_result=stat)
+
+def _can_read(db: Session, file_path: str, user_id: int) -> bool:
+    """Submitters can read their own files, room admins every file of their rooms."""
+    admin_rooms = db.query(RoomMember.room_id).filter(RoomMember.user_id == user_id, RoomMember.is_admin == True)
+    allowed = db.query(Submission.id).join(Task, Submission.task_id == Task.id).filter(
+        Submission.file_path == file_path,
+        or_(Submission.user_id == user_id, Task.room_id.in_(admin_rooms))
+    ).first()
+    return allowed is not None
+
+@router.api_route("/profile_pictures/{name}", methods=["GET", "HEAD"])
+def get_profile_picture(name: str, request: Request):
+    # Profile pictures are shown to everyone
+    return _serve(request, f"profile_pictures/{name}", f"public, {IMMUTABLE}")
+
+@router.api_route("/{file_path:path}", methods=["GET", "HEAD"])
+@db_endpoint
+def get_submission_file(file_path: str, request: Request, user: Identity = Depends(get_current_identity), db: Session = Depends(get_db)):
+    if not _can_read(db, file_path, user.id):
+        if db.query(Submission.id).filter(Submission.file_path == file_path).first() is None:
+            raise HTTPException(status_code=404, detail="File not found")
+        raise HTTPException(status_code=403, detail="Only the submitter or a room admin can view this file")
+
+    if file_path.startswith(blobs.BLOB_DIR + "/"):
+        return _serve(request, file_path, f"private, {IMMUTABLE}")
+    # Legacy "{uuid}_{filename}" uploads: revalidate with the ETag
+    return _serve(request, file_path, "private, no-cache")
@@ -0,0 +1,24 @@
+import hmac
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import PlainTextResponse
+from ..config import settings
+from ..utils import metrics
+
+router = APIRouter(tags=["metrics"])
+
+LOCAL_HOSTS = ("127.0.0.1", "::1", "localhost")
+
+def _check_access(request: Request):
+    # Route names, traffic and query counts are internal: with METRICS_TOKEN set the
+    # scraper sends it as a bearer token, without one only this machine may ask
+    if settings.METRICS_TOKEN:
+        if not hmac.compare_digest(request.headers.get("authorization", ""), f"Bearer {settings.METRICS_TOKEN}"):
+            raise HTTPException(status_code=401, detail="Invalid metrics token", headers={"WWW-Authenticate": "Bearer"})
+    elif request.client is None or request.client.host not in LOCAL_HOSTS or "x-forwarded-for" in request.headers:
+        # A reverse proxy on the same machine connects from loopback too, but adds X-Forwarded-For
+        raise HTTPException(status_code=403, detail="Metrics are only served locally (set METRICS_TOKEN to scrape remotely)")
+
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+def get_metrics(request: Request):
+    _check_access(request)
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -1,20 +1,26 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response, UploadFile, File
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
+import os
 import uuid
-from ..database import get_db
-from ..models import Room, RoomMember, User, Submission, Task
+from ..database import get_db, get_read_db, db_endpoint, run_db
+from ..models import Room, RoomMember, User
 from ..schemas import RoomCreate, RoomResponse, LeaderboardEntry
-from ..utils.auth import get_current_user
-from ..utils.game_logic import get_daily_multiplier
-from sqlalchemy import func
-from itertools import groupby
-from collections import defaultdict
+from ..utils.auth import get_current_user, get_current_identity, Identity, admin_room
+from ..utils import xp_ledger, xp_events, rank_index, blobs, roster
+from ..utils.loaders import BatchLoader, get_loader
+from ..utils.dashboard_cache import dashboard_cache
+from ..utils.pagination import encode_cursor, decode_cursor, set_next_cursor
+from ..utils.uploads import stage_upload, upload_limit, safe_filename
+from sqlalchemy import func, or_, and_
 
 router = APIRouter(prefix="/rooms", tags=["rooms"])
 
 @router.post("/", response_model=RoomResponse)
-def create_room(room_in: RoomCreate, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+@db_endpoint
+def create_room(room_in: RoomCreate, user: Identity = Depends(get_current_identity), db: Session = Depends(get_db)):
     code = str(uuid.uuid4())[:8].upper()
     room = Room(
         name=room_in.name, 
@@ -37,7 +43,8 @@ def create_room(room_in: RoomCreate, user: User = Depends(get_current_user), db:
 from ..schemas import RoomUpdate, RoomMemberResponse, RoomMemberUpdate
 
 @router.patch("/{code}", response_model=RoomResponse)
-def update_room(code: str, room_in: RoomUpdate, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+@db_endpoint
+def update_room(code: str, room_in: RoomUpdate, user: Identity = Depends(get_current_identity), db: Session = Depends(get_db)):
     code = code.strip().upper()
     room = db.query(Room).filter(Room.code == code).first()
     if not room:
@@ -57,10 +64,14 @@ def update_room(code: str, room_in: RoomUpdate, user: User = Depends(get_current
         
     db.commit()
     db.refresh(room)
+    if room_in.name is not None:
+        # Room names are shown on cached dashboards
+        dashboard_cache.clear()
     return room
 
 @router.delete("/{code}")
-def delete_room(code: str, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+@db_endpoint
+def delete_room(code: str, user: Identity = Depends(get_current_identity), db: Session = Depends(get_db)):
     code = code.strip().upper()
     room = db.query(Room).filter(Room.code == code).first()
     if not room:
@@ -71,33 +82,43 @@ def delete_room(code: str, user: User = Depends(get_current_user), db: Session =
     if not member or not member.is_admin:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Only admins can delete the room")
     
+    affected_users = xp_ledger.remove_room(db, room.id)
+    unused_files = blobs.release_room(db, room.id)
     db.delete(room)
-    db.commit()
+    with blobs.removing_files(unused_files):
+        db.commit()
+    xp_events.xp_changed(db, affected_users, [room.id])
     return {"message": "Room deleted successfully"}
 
 @router.get("/{code}/members", response_model=List[RoomMemberResponse])
-def get_room_members(code: str, db: Session = Depends(get_db)):
+@db_endpoint
+def get_room_members(code: str, db: Session = Depends(get_db), loader: BatchLoader = Depends(get_loader)):
     code = code.strip().upper()
     room = db.query(Room).filter(Room.code == code).first()
     if not room:
         raise HTTPException(status_code=404, detail="Room not found")
     
     members = db.query(RoomMember).filter(RoomMember.room_id == room.id).all()
+    users = loader.load_many(User, [m.user_id for m in members])
     
     res = []
     for m in members:
+        member_user = users.get(m.user_id)
+        if not member_user:
+            continue
         res.append({
             "id": m.id,
             "user_id": m.user_id,
             "room_id": m.room_id,
             "is_admin": m.is_admin,
-            "username": m.user.username,
-            "email": m.user.email
+            "username": member_user.username,
+            "email": member_user.email
         })
     return res
 
 @router.patch("/{code}/members/{user_id}/role", response_model=RoomMemberResponse)
-def update_member_role(code: str, user_id: int, role_in: RoomMemberUpdate, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+@db_endpoint
+def update_member_role(code: str, user_id: int, role_in: RoomMemberUpdate, user: Identity = Depends(get_current_identity), db: Session = Depends(get_db)):
     code = code.strip().upper()
     room = db.query(Room).filter(Room.code == code).first()
     if not room:
@@ -127,7 +148,8 @@ def update_member_role(code: str, user_id: int, role_in: RoomMemberUpdate, user:
     }
 
 @router.post("/join")
-def join_room(code: str, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+@db_endpoint
+def join_room(code: str, user: Identity = Depends(get_current_identity), db: Session = Depends(get_db)):
     code = code.strip().upper()
     room = db.query(Room).filter(Room.code == code).first()
     if not room:
@@ -140,10 +162,45 @@ def join_room(code: str, user: User = Depends(get_current_user), db: Session = D
     member = RoomMember(user_id=user.id, room_id=room.id, is_admin=False)
     db.add(member)
     db.commit()
+    xp_events.members_changed(room.id)
     return {"message": "Joined successfully", "room_id": room.id}
 
+def _open_roster(path: str, fmt: str):
+    f = open(path, encoding="utf-8-sig", errors="replace", newline="")
+    try:
+        return f, roster.read_rows(f, fmt)
+    except BaseException:
+        f.close()
+        raise
+
+@router.post("/{code}/roster")
+async def import_roster(code: str, file: UploadFile = File(...), user: Identity = Depends(get_current_identity), db: Session = Depends(get_db)):
+    """
+    Add every student of a CSV (header row) or JSONL roster to the room, creating
+    accounts for unknown emails. Streams one NDJSON result per record, then a summary.
+    """
+    room = await run_db(db, admin_room, code, user.id, "Only admins can import a roster")
+    fmt = roster.roster_format(file.filename, file.content_type)
+    if not fmt:
+        raise HTTPException(status_code=400, detail="Roster must be a .csv or .jsonl file")
+
+    upload = await stage_upload(file, safe_filename(file.filename), upload_limit("roster"))
+    try:
+        f, rows = await run_in_threadpool(_open_roster, upload.temp_path, fmt)
+    except ValueError as e:
+        await upload.discard()
+        raise HTTPException(status_code=400, detail=str(e))
+
+    def cleanup():
+        f.close()
+        os.remove(upload.temp_path)
+
+    # The import runs while the report streams, in its own session (the request's closes with the endpoint)
+    return StreamingResponse(roster.report(rows, room.id, cleanup), media_type="application/x-ndjson")
+
 @router.post("/{code}/leave")
-def leave_room(code: str, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+@db_endpoint
+def leave_room(code: str, user: Identity = Depends(get_current_identity), db: Session = Depends(get_db)):
     code = code.strip().upper()
     room = db.query(Room).filter(Room.code == code).first()
     if not room:
@@ -155,96 +212,58 @@ def leave_room(code: str, user: User = Depends(get_current_user), db: Session =
         
     db.delete(member)
     db.commit()
+    xp_events.members_changed(room.id)
     return {"message": "Left room successfully"}
 
 @router.get("/my", response_model=List[RoomResponse])
+@db_endpoint
 def get_my_rooms(user: User = Depends(get_current_user), db: Session = Depends(get_db)):
     return [member.room for member in user.room_memberships]
 
-@router.get("/{code}/leaderboard", response_model=List[LeaderboardEntry])
-def get_leaderboard(code: str, db: Session = Depends(get_db)):
-    code = code.strip().upper()
-    room = db.query(Room).filter(Room.code == code).first()
-    if not room:
-        raise HTTPException(status_code=404, detail="Room not found")
-    
-    # Fetch all submissions for tasks in this room
-    room_submissions = db.query(Submission).join(Task).filter(Task.room_id == room.id).all()
-    
-    user_xp_map = defaultdict(int)
-    user_subs_by_day = defaultdict(lambda: defaultdict(list))
-    
-    for sub in room_submissions:
-        day = sub.timestamp.date()
-        user_subs_by_day[sub.user_id][day].append(sub)
-        
-    for user_id, days_map in user_subs_by_day.items():
-        total_u_xp = 0
-        for day, subs in days_map.items():
-            daily_base = sum((s.xp_awarded or 0) for s in subs)
-            multiplier = get_daily_multiplier(len(subs))
-            total_u_xp += int(daily_base * multiplier)
-        user_xp_map[user_id] = total_u_xp
-
-    # Also include room members who have 0 XP
-    members = db.query(User).join(RoomMember).filter(RoomMember.room_id == room.id).all()
-    
-    leaderboard = []
-    for member in members:
-        leaderboard.append(LeaderboardEntry(
-            user_id=member.id,
-            username=member.username,
-            email=member.email or "",
-            total_xp=user_xp_map[member.id],
-            rank=0
-        ))
-        
-    leaderboard.sort(key=lambda x: x.total_xp, reverse=True)
-    for i, entry in enumerate(leaderboard):
-        entry.rank = i + 1
-        
-    return leaderboard
+# Leaderboards are ordered by (total_xp desc, user_id) and paginated by keyset:
+# pass the X-Next-Cursor header of a page as ?cursor= to get the next one.
+# ?around_user=<id> returns `window` entries above and below that user instead.
+# Ranks are always positions in the full leaderboard.
 
 @router.get("/global/leaderboard", response_model=List[LeaderboardEntry])
-def get_global_leaderboard(db: Session = Depends(get_db)):
+@db_endpoint
+def get_global_leaderboard(
+    response: Response,
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = None,
+    around_user: Optional[int] = None,
+    window: int = Query(5, ge=1, le=100),
+    db: Session = Depends(get_read_db)
+):
     # Aggregate XP across all rooms
     # Must use SAME aggregation logic: Sum of Room XPs
-    
-    # 1. Get all submissions join Task to get Room ID
-    all_subs_query = db.query(Submission, Task.room_id).join(Task, Submission.task_id == Task.id).all()
-    
-    # 2. Build map: User -> Room -> Day -> List[Sub]
-    # user_room_day_map[uid][rid][date] = [subs...]
-    user_room_day_map = defaultdict(lambda: defaultdict(lambda: defaultdict(list)))
-    
-    for sub, rid in all_subs_query:
-        d = sub.timestamp.date()
-        user_room_day_map[sub.user_id][rid][d].append(sub)
-        
-    # 3. Calculate Scores
-    user_xp_map = defaultdict(int)
-    users_info = {} # quick lookup map
-    
-    # Get all user objects first to avoid N+1 if possible, or just query as needed
-    # Better: get distinct user IDs first
-    all_uids = list(user_room_day_map.keys())
-    if all_uids:
-        users = db.query(User).filter(User.id.in_(all_uids)).all()
-        for u in users:
-            users_info[u.id] = u
-    
-    for uid, rooms in user_room_day_map.items():
-        user_total = 0
-        for rid, days in rooms.items():
-            for d, subs in days.items():
-                base = sum((s.xp_awarded or 0) for s in subs)
-                mult = get_daily_multiplier(len(subs))
-                user_total += int(base * mult)
-        user_xp_map[uid] = user_total
+    # Order and ranks come from the in-memory ranked index (kept in sync with the XP ledger)
+    index = rank_index.leaderboard_index
+    if around_user is not None:
+        ranked = index.around(around_user, window)
+        if not ranked:
+            raise HTTPException(status_code=404, detail="User is not on the leaderboard")
+        has_more = ranked[-1][0] < len(index)
+    else:
+        if cursor:
+            after_xp, after_user_id = decode_cursor(cursor, int, int)
+            ranked = index.after(after_xp, after_user_id, limit + 1)
+        else:
+            ranked = index.top(limit + 1)
+        has_more = len(ranked) > limit
+        ranked = ranked[:limit]
+
+    if has_more:
+        _, last_uid, last_xp = ranked[-1]
+        set_next_cursor(response, encode_cursor(last_xp, last_uid))
+
+    users_info = {}
+    if ranked:
+        users = db.query(User).filter(User.id.in_([uid for _, uid, _ in ranked])).all()
+        users_info = {u.id: u for u in users}
 
     leaderboard = []
-    
-    for uid, total_xp in user_xp_map.items():
+    for rank, uid, total_xp in ranked:
         if uid in users_info:
             user = users_info[uid]
             leaderboard.append(LeaderboardEntry(
@@ -252,16 +271,84 @@ def get_global_leaderboard(db: Session = Depends(get_db)):
                 username=user.username,
                 email=user.email or "",
                 total_xp=total_xp,
-                rank=0
+                rank=rank
             ))
-        
-    leaderboard.sort(key=lambda x: x.total_xp, reverse=True)
-    for i, entry in enumerate(leaderboard):
-        entry.rank = i + 1
-        
     return leaderboard
 
+@router.get("/{code}/leaderboard", response_model=List[LeaderboardEntry])
+@db_endpoint
+def get_leaderboard(
+    code: str,
+    response: Response,
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = None,
+    around_user: Optional[int] = None,
+    window: int = Query(5, ge=1, le=100),
+    db: Session = Depends(get_read_db)
+):
+    code = code.strip().upper()
+    room = db.query(Room).filter(Room.code == code).first()
+    if not room:
+        raise HTTPException(status_code=404, detail="Room not found")
+
+    # Room members LEFT JOIN their room XP, so members with 0 XP are included
+    totals = xp_ledger.totals_subquery(db, room.id)
+    total_xp = func.coalesce(totals.c.total_xp, 0)
+    members = db.query(User.id, User.username, User.email, total_xp).join(
+        RoomMember, RoomMember.user_id == User.id
+    ).outerjoin(
+        totals, totals.c.user_id == User.id
+    ).filter(RoomMember.room_id == room.id)
+
+    def ahead_of(xp, user_id):
+        # Entries ranked before the (xp, user_id) key
+        return or_(total_xp > xp, and_(total_xp == xp, User.id < user_id))
+
+    def behind(xp, user_id):
+        return or_(total_xp < xp, and_(total_xp == xp, User.id > user_id))
+
+    if around_user is not None:
+        target = members.filter(User.id == around_user).first()
+        if not target:
+            raise HTTPException(status_code=404, detail="User is not a member of this room")
+        target_xp = target[3]
+        above = members.filter(ahead_of(target_xp, around_user)).order_by(
+            total_xp.asc(), User.id.desc()
+        ).limit(window).all()[::-1]
+        rows = above + members.filter(or_(behind(target_xp, around_user), User.id == around_user)).order_by(
+            total_xp.desc(), User.id
+        ).limit(window + 2).all()
+        has_more = len(rows) > len(above) + window + 1
+        rows = rows[:len(above) + window + 1]
+        first_rank = members.filter(ahead_of(target_xp, around_user)).count() - len(above) + 1
+    else:
+        page = members
+        first_rank = 1
+        if cursor:
+            after_xp, after_user_id = decode_cursor(cursor, int, int)
+            page = members.filter(behind(after_xp, after_user_id))
+            first_rank = members.filter(or_(ahead_of(after_xp, after_user_id), and_(total_xp == after_xp, User.id == after_user_id))).count() + 1
+        rows = page.order_by(total_xp.desc(), User.id).limit(limit + 1).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+    if has_more:
+        last_uid, _, _, last_xp = rows[-1]
+        set_next_cursor(response, encode_cursor(int(last_xp), last_uid))
+
+    return [
+        LeaderboardEntry(
+            user_id=uid,
+            username=username,
+            email=email or "",
+            total_xp=int(xp),
+            rank=first_rank + i
+        )
+        for i, (uid, username, email, xp) in enumerate(rows)
+    ]
+
 @router.get("/{code}", response_model=RoomResponse)
+@db_endpoint
 def get_room_details(code: str, db: Session = Depends(get_db)):
     code = code.strip().upper()
     room = db.query(Room).filter(Room.code == code).first()
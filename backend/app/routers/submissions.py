@@ -1,66 +1,71 @@
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
 from sqlalchemy.orm import Session
+from sqlalchemy.exc import IntegrityError
 from datetime import datetime
-import shutil
-import os
-import uuid
-from ..database import get_db
-from ..models import Submission, Task, User
+from ..database import get_db, run_db
+from ..models import Submission, Task
 from ..schemas import SubmissionResponse
-from ..utils.auth import get_current_user
-from ..config import settings
+from ..utils.auth import get_current_identity, Identity
+from ..utils import xp_ledger, xp_events, blobs, activity
+from ..utils.log import get_logger
+from ..utils.uploads import StagedUpload, stage_upload, upload_limit, safe_filename
 
 router = APIRouter(prefix="/submissions", tags=["submissions"])
+logger = get_logger(__name__)
 
-@router.post("/{task_id}", response_model=SubmissionResponse)
-async def submit_task(
-    task_id: int,
-    file: UploadFile = File(...),
-    user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
-):
+def _open_task_for_submission(db: Session, task_id: int):
     task = db.query(Task).filter(Task.id == task_id).first()
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
         
-    # Check if already submitted
-    existing = db.query(Submission).filter(Submission.task_id == task_id, Submission.user_id == user.id).first()
-    if existing:
-        raise HTTPException(status_code=409, detail="Already submitted")
-
     # Check expiration
     if task.deadline:
         now = datetime.now(task.deadline.tzinfo) if task.deadline.tzinfo else datetime.utcnow()
         if task.deadline < now:
             raise HTTPException(status_code=403, detail="Mission expired")
+    return task
 
-    # Save file
-    filename = f"{uuid.uuid4()}_{file.filename}"
-    file_path = os.path.join(settings.UPLOAD_DIR, filename)
-    
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-        
-    # Enforce XP values based on task type
+def _create_submission(db: Session, task: Task, user_id: int, upload: StagedUpload):
     # Enforce XP values based on task type
     # Use the dynamic value from the task itself, which honors the 100/75 rule set at creation
-    with open("debug_xp.log", "a") as log:
-        log.write(f"DEBUG: Task ID: {task.id}, Task XP: {task.xp_value}, Type: {task.type}\n")
-    
     xp_awarded = task.xp_value if task.xp_value is not None else (100 if task.type == "lecture" else 75)
-    
-    with open("debug_xp.log", "a") as log:
-        log.write(f"DEBUG: XP Awarded: {xp_awarded}\n")
+    logger.debug("XP awarded", extra={"task_id": task.id, "task_xp": task.xp_value, "task_type": task.type, "xp_awarded": xp_awarded})
     
     submission = Submission(
-        task_id=task_id,
-        user_id=user.id,
-        file_path=filename,
+        task_id=task.id,
+        user_id=user_id,
+        file_path=blobs.acquire(db, upload).path,
         xp_awarded=xp_awarded
     )
     
     db.add(submission)
+    try:
+        # One submission per user and task: the unique (task_id, user_id) index decides, also between concurrent requests
+        db.flush()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Already submitted")
+    xp_ledger.record_submission(db, submission, task.room_id)
     db.commit()
     db.refresh(submission)
+    xp_events.xp_changed(db, [user_id], [task.room_id])
+    activity.submissions_changed(db, [submission.id], "submission.created")
     
     return submission
+
+@router.post("/{task_id}", response_model=SubmissionResponse)
+async def submit_task(
+    task_id: int,
+    file: UploadFile = File(...),
+    user: Identity = Depends(get_current_identity),
+    db: Session = Depends(get_db)
+):
+    task = await run_db(db, _open_task_for_submission, task_id)
+    upload = await stage_upload(file, safe_filename(file.filename), upload_limit(task.type))
+    try:
+        submission = await run_db(db, _create_submission, task, user.id, upload)
+    except BaseException:
+        await upload.discard()
+        raise
+    await blobs.store(upload, submission.file_path)
+    return submission
@@ -1,80 +1,166 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Query, Response
+from sqlalchemy import and_, or_, func, insert, select, update
 from sqlalchemy.orm import Session
-from typing import List
-from datetime import datetime, timedelta
-import shutil
-import os
-import uuid
-from ..database import get_db
-from ..models import Task, Room, RoomMember, User, Submission
-from ..schemas import TaskCreate, TaskResponse, SubmissionResponse
-from ..utils.auth import get_current_user
+from sqlalchemy.exc import IntegrityError
+from typing import List, Literal, Optional
+from datetime import datetime, timedelta, timezone
 from ..config import settings
+from ..database import get_db, db_endpoint, run_db
+from ..models import Task, TaskType, Room, RoomMember, Submission
+from ..schemas import (
+    TaskCreate, TaskBatchCreate, TaskBatchItem, TaskResponse, SubmissionResponse,
+    SubmissionBatchVerify, SubmissionBatchResult,
+)
+from ..utils.auth import get_current_identity, Identity, admin_room
+from ..utils import xp_ledger, xp_events, blobs, activity
+from ..utils.log import get_logger
+from ..utils.uploads import StagedUpload, stage_upload, upload_limit, safe_filename
+from ..utils.pagination import encode_cursor, decode_cursor, set_next_cursor
 
 router = APIRouter(prefix="/rooms/{code}/tasks", tags=["tasks"])
+logger = get_logger(__name__)
+
+# Timezone Fix: task times are stored shifted by the UTC+2 offset (users reported
+# times appearing 2 hours earlier), and expiry is checked against now + the offset
+TIME_OFFSET = timedelta(hours=2)
+TIME_FIELDS = ("deadline", "start_time", "end_time")
+WEEKDAYS = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+
+def task_xp_value(task_type: str) -> int:
+    return 100 if task_type == "lecture" else 75
+
+def _task_values(task_data: dict, room_id: int) -> dict:
+    """Column values for a new task: times shifted by the offset, XP by type."""
+    for field in TIME_FIELDS:
+        # Be robust against None values
+        if task_data.get(field):
+            task_data[field] = task_data[field] + TIME_OFFSET
+    task_data["xp_value"] = task_xp_value(task_data["type"])
+    task_data["room_id"] = room_id
+    return task_data
 
 @router.post("/", response_model=TaskResponse)
-def create_task(code: str, task_in: TaskCreate, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    room = db.query(Room).filter(Room.code == code).first()
-    if not room:
-        raise HTTPException(status_code=404, detail="Room not found")
-        
-    member = db.query(RoomMember).filter(RoomMember.user_id == user.id, RoomMember.room_id == room.id).first()
-    if not member or not member.is_admin:
-        raise HTTPException(status_code=403, detail="Only admins can create tasks")
-        
-    # Timezone Fix: Adjust times to compensate for UTC+2 offset (User reports times appear 2 hours earlier)
-    # Be robust against None values
-    from datetime import timedelta
-    
-    offset = timedelta(hours=2)
-    
-    if task_in.deadline:
-        task_in.deadline = task_in.deadline + offset
-    if task_in.start_time:
-        task_in.start_time = task_in.start_time + offset
-    if task_in.end_time:
-        task_in.end_time = task_in.end_time + offset
-        
-    xp_value = 100 if task_in.type == "lecture" else 75
-    
-    task_data = task_in.dict()
-    task_data['xp_value'] = xp_value
-    
-    task = Task(**task_data, room_id=room.id)
+@db_endpoint
+def create_task(code: str, task_in: TaskCreate, user: Identity = Depends(get_current_identity), db: Session = Depends(get_db)):
+    room = admin_room(db, code, user.id, "Only admins can create tasks")
+    task = Task(**_task_values(task_in.dict(), room.id))
     db.add(task)
     db.commit()
     db.refresh(task)
     return task
 
+def _occurrences(item: TaskBatchItem):
+    """The task dicts an item stands for: itself, or one per date of its recurrence."""
+    task_data = item.dict(exclude={"recurrence"})
+    rule = item.recurrence
+    if rule is None:
+        yield task_data
+        return
+    # Times of day (and the gaps between them) come from the item; dates from the rule
+    anchor = task_data["start_time"] or task_data["deadline"] or task_data["end_time"]
+    if anchor is None:
+        raise HTTPException(status_code=400, detail=f"Recurring task {item.title!r} needs a start_time, deadline or end_time")
+    if rule.end_date < rule.start_date:
+        raise HTTPException(status_code=400, detail=f"Recurrence of {item.title!r} ends before it starts")
+    weekdays = {WEEKDAYS.index(day) for day in rule.weekdays}
+    first_monday = rule.start_date - timedelta(days=rule.start_date.weekday())
+    day, n = rule.start_date, 0
+    while day <= rule.end_date:
+        if day.weekday() in weekdays and ((day - first_monday).days // 7) % rule.every_weeks == 0:
+            n += 1
+            shift = timedelta(days=(day - anchor.date()).days)
+            occurrence = {**task_data, "title": item.title.replace("{n}", str(n)).replace("{date}", day.isoformat())}
+            for field in TIME_FIELDS:
+                if occurrence[field]:
+                    occurrence[field] = occurrence[field] + shift
+            yield occurrence
+        day += timedelta(days=1)
+
+@router.post("/batch", response_model=List[TaskResponse])
+@db_endpoint
+def create_tasks(code: str, batch: TaskBatchCreate, user: Identity = Depends(get_current_identity), db: Session = Depends(get_db)):
+    """
+    Create many tasks at once. Items with a recurrence are expanded to one task
+    per matching date; "{n}" and "{date}" in their title become the occurrence
+    number and date. All or nothing, in one transaction.
+    """
+    room = admin_room(db, code, user.id, "Only admins can create tasks")
+    rows = []
+    for item in batch.tasks:
+        for task_data in _occurrences(item):
+            rows.append(_task_values(task_data, room.id))
+            if len(rows) > settings.TASK_BATCH_MAX:
+                raise HTTPException(status_code=400, detail=f"A batch can create at most {settings.TASK_BATCH_MAX} tasks")
+    if not rows:
+        return []
+
+    tasks = db.scalars(insert(Task).returning(Task, sort_by_parameter_order=True), rows).all()
+    db.commit()
+    logger.info("Tasks created in batch", extra={"room_id": room.id, "count": len(tasks)})
+    return tasks
+
+def _expiry_cutoff(db: Session) -> datetime:
+    """Deadlines before this are expired: one "now" (plus the offset) for a whole query."""
+    if db.get_bind().dialect.name == "sqlite":
+        # SQLite keeps the naive UTC times as written, compare like with like
+        return datetime.utcnow() + TIME_OFFSET
+    return datetime.now(timezone.utc) + TIME_OFFSET
+
+# The task list is ordered by (deadline, id), tasks without a deadline last,
+# and paginated by keyset on the (room_id, deadline) index when a limit is given:
+# pass the X-Next-Cursor header of a page as ?cursor= to get the next one.
+
 @router.get("", response_model=List[TaskResponse])
-def list_tasks(code: str, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    room = db.query(Room).filter(Room.code == code).first()
-    if not room:
+@db_endpoint
+def list_tasks(
+    code: str,
+    response: Response,
+    state: Optional[Literal["upcoming", "expired"]] = None,
+    submitted: Optional[bool] = None,
+    type: Optional[TaskType] = None,
+    order: Literal["asc", "desc"] = "asc",
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    cursor: Optional[str] = None,
+    user: Identity = Depends(get_current_identity),
+    db: Session = Depends(get_db)
+):
+    code = code.strip().upper()
+    # One query: the room's tasks with only the caller's submission LEFT JOINed
+    cutoff = _expiry_cutoff(db)
+    is_expired = and_(Task.deadline.isnot(None), Task.deadline < cutoff)
+    query = db.query(Task, Submission.id, Submission.status, is_expired.label("is_expired")).outerjoin(
+        Submission, and_(Submission.task_id == Task.id, Submission.user_id == user.id)
+    ).filter(Task.room_id == select(Room.id).where(Room.code == code).scalar_subquery())
+
+    if state == "expired":
+        query = query.filter(is_expired)
+    elif state == "upcoming":
+        query = query.filter(~is_expired)
+    if submitted is not None:
+        query = query.filter(Submission.id.isnot(None) if submitted else Submission.id.is_(None))
+    if type is not None:
+        query = query.filter(Task.type == type.value)
+
+    if cursor:
+        after_deadline, after_id = decode_cursor(cursor, datetime.fromisoformat, int)
+        if after_deadline is None:
+            query = query.filter(Task.deadline.is_(None), Task.id > after_id)
+        else:
+            beyond = Task.deadline > after_deadline if order == "asc" else Task.deadline < after_deadline
+            query = query.filter(or_(beyond, and_(Task.deadline == after_deadline, Task.id > after_id), Task.deadline.is_(None)))
+    deadline_order = Task.deadline.asc() if order == "asc" else Task.deadline.desc()
+    query = query.order_by(deadline_order.nulls_last(), Task.id)
+    rows = query.limit(limit + 1).all() if limit else query.all()
+
+    if not rows and not cursor and not db.query(Room.id).filter(Room.code == code).first():
         raise HTTPException(status_code=404, detail="Room not found")
-        
-    tasks = room.tasks
-    
-    # Annotate tasks
-    results = []
-    for task in tasks:
-        # Get user's submission for this task
-        submission = next((s for s in task.submissions if s.user_id == user.id), None)
-        is_submitted = submission is not None
-        submission_status = submission.status if submission else None
-        
-        # Check expiration (safe timezone comparison)
-        is_expired = False
-        if task.deadline:
-            # tasks.deadline is timezone aware (DateTime(timezone=True))
-            # Compare with current UTC time
-            # Compare with current UTC time adjusted for the 2-hour offset applied at creation
-            now = datetime.now(task.deadline.tzinfo) if task.deadline.tzinfo else datetime.utcnow()
-            if task.deadline < (now + timedelta(hours=2)):
-                is_expired = True
-
-        # Create response object explictly to include annotated fields
-        results.append(TaskResponse(
+    if limit and len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1][0]
+        set_next_cursor(response, encode_cursor(last.deadline, last.id))
+
+    return [
+        TaskResponse(
             id=task.id,
             room_id=task.room_id,
             title=task.title,
@@ -85,22 +171,16 @@ def list_tasks(code: str, user: User = Depends(get_current_user), db: Session =
             start_time=task.start_time,
             end_time=task.end_time,
             created_at=task.created_at,
-            is_submitted=is_submitted,
+            is_submitted=submission_id is not None,
             submission_status=submission_status,
-            is_expired=is_expired,
-            completed=is_submitted
-        ))
-        
-    return results
+            is_expired=bool(expired),
+            completed=submission_id is not None
+        )
+        for task, submission_id, submission_status, expired in rows
+    ]
 
-@router.post("/{task_id}/submit/", response_model=SubmissionResponse)
-async def submit_task_nested(
-    code: str,
-    task_id: int,
-    file: UploadFile = File(...),
-    user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
-):
+def _open_task_for_submission(db: Session, code: str, task_id: int):
+    code = code.strip().upper()
     room = db.query(Room).filter(Room.code == code).first()
     if not room:
         raise HTTPException(status_code=404, detail="Room not found")
@@ -109,46 +189,63 @@ async def submit_task_nested(
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
         
-    # Check if already submitted
-    existing = db.query(Submission).filter(Submission.task_id == task_id, Submission.user_id == user.id).first()
-    if existing:
-        raise HTTPException(status_code=409, detail="Already submitted")
-
     # Check expiration
     if task.deadline:
         now = datetime.now(task.deadline.tzinfo) if task.deadline.tzinfo else datetime.utcnow()
-        if task.deadline < (now + timedelta(hours=2)):
+        if task.deadline < (now + TIME_OFFSET):
             raise HTTPException(status_code=403, detail="Mission expired")
+    return task
 
-    # Save file
-    if not os.path.exists(settings.UPLOAD_DIR):
-        os.makedirs(settings.UPLOAD_DIR)
-        
-    filename = f"{uuid.uuid4()}_{file.filename}"
-    file_path = os.path.join(settings.UPLOAD_DIR, filename)
-    
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-        
+def _create_submission(db: Session, task: Task, user_id: int, upload: StagedUpload):
     # FIX: Use task XP value!
     xp_awarded = task.xp_value if task.xp_value is not None else (100 if task.type == "lecture" else 75)
+    logger.debug("XP awarded", extra={"task_id": task.id, "task_xp": task.xp_value, "task_type": task.type, "xp_awarded": xp_awarded})
         
     submission = Submission(
-        task_id=task_id,
-        user_id=user.id,
-        file_path=filename,
+        task_id=task.id,
+        user_id=user_id,
+        file_path=blobs.acquire(db, upload).path,
         xp_awarded=xp_awarded,
         status="pending"
     )
     
     db.add(submission)
+    try:
+        # One submission per user and task: the unique (task_id, user_id) index decides, also between concurrent requests
+        db.flush()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Already submitted")
+    xp_ledger.record_submission(db, submission, task.room_id)
     db.commit()
     db.refresh(submission)
+    xp_events.xp_changed(db, [user_id], [task.room_id])
+    activity.submissions_changed(db, [submission.id], "submission.created")
     
     return submission
 
+@router.post("/{task_id}/submit/", response_model=SubmissionResponse)
+async def submit_task_nested(
+    code: str,
+    task_id: int,
+    file: UploadFile = File(...),
+    user: Identity = Depends(get_current_identity),
+    db: Session = Depends(get_db)
+):
+    task = await run_db(db, _open_task_for_submission, code, task_id)
+    upload = await stage_upload(file, safe_filename(file.filename), upload_limit(task.type))
+    try:
+        submission = await run_db(db, _create_submission, task, user.id, upload)
+    except BaseException:
+        await upload.discard()
+        raise
+    await blobs.store(upload, submission.file_path)
+    return submission
+
 @router.get("/{task_id}/submissions", response_model=List[SubmissionResponse])
-def list_task_submissions(code: str, task_id: int, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+@db_endpoint
+def list_task_submissions(code: str, task_id: int, user: Identity = Depends(get_current_identity), db: Session = Depends(get_db)):
+    code = code.strip().upper()
     room = db.query(Room).filter(Room.code == code).first()
     if not room:
         raise HTTPException(status_code=404, detail="Room not found")
@@ -161,7 +258,9 @@ def list_task_submissions(code: str, task_id: int, user: User = Depends(get_curr
     return submissions
 
 @router.post("/{task_id}/submissions/{submission_id}/verify", response_model=SubmissionResponse)
-def verify_submission(code: str, task_id: int, submission_id: int, status: str = "verified", user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+@db_endpoint
+def verify_submission(code: str, task_id: int, submission_id: int, status: str = "verified", user: Identity = Depends(get_current_identity), db: Session = Depends(get_db)):
+    code = code.strip().upper()
     room = db.query(Room).filter(Room.code == code).first()
     if not room:
         raise HTTPException(status_code=404, detail="Room not found")
@@ -170,6 +269,10 @@ def verify_submission(code: str, task_id: int, submission_id: int, status: str =
     if not member or not member.is_admin:
         raise HTTPException(status_code=403, detail="Only admins can verify submissions")
         
+    task = db.query(Task).filter(Task.id == task_id, Task.room_id == room.id).first()
+    if not task:
+        raise HTTPException(status_code=404, detail="Task not found")
+
     submission = db.query(Submission).filter(Submission.id == submission_id, Submission.task_id == task_id).first()
     if not submission:
         raise HTTPException(status_code=404, detail="Submission not found")
@@ -177,20 +280,86 @@ def verify_submission(code: str, task_id: int, submission_id: int, status: str =
     if status not in ["verified", "rejected"]:
         raise HTTPException(status_code=400, detail="Invalid status")
         
+    old_xp = submission.xp_awarded
     submission.status = status
     if status == "verified":
         # Award the XP specified in the task
-        task = db.query(Task).filter(Task.id == task_id).first()
         submission.xp_awarded = task.xp_value or 0
     else:
         submission.xp_awarded = 0
-        
+
+    xp_ledger.record_xp_change(db, submission, room.id, old_xp)
     db.commit()
     db.refresh(submission)
+    xp_events.xp_changed(db, [submission.user_id], [room.id])
+    activity.submissions_changed(db, [submission.id], f"submission.{status}")
     return submission
 
+@router.post("/submissions/verify", response_model=List[SubmissionBatchResult])
+@db_endpoint
+def verify_submissions(code: str, batch: SubmissionBatchVerify, user: Identity = Depends(get_current_identity), db: Session = Depends(get_db)):
+    """
+    Verify or reject many submissions of the room at once: the listed
+    submission_ids, or every submission matching task_id and/or current_status.
+    One UPDATE for all of them; the XP ledger of the affected users is
+    recomputed once at the end. Reports an outcome per submission.
+    """
+    room = admin_room(db, code, user.id, "Only admins can verify submissions")
+    if batch.submission_ids is None and batch.task_id is None and batch.current_status is None:
+        raise HTTPException(status_code=400, detail="Give submission_ids or a filter (task_id, current_status)")
+
+    conditions = [Submission.task_id.in_(select(Task.id).where(Task.room_id == room.id))]
+    if batch.submission_ids is not None:
+        conditions.append(Submission.id.in_(batch.submission_ids))
+    if batch.task_id is not None:
+        conditions.append(Submission.task_id == batch.task_id)
+    if batch.current_status is not None:
+        conditions.append(Submission.status == batch.current_status)
+
+    # Verified submissions get their task's XP, rejected ones none (as verify_submission)
+    task_xp = func.coalesce(select(Task.xp_value).where(Task.id == Submission.task_id).scalar_subquery(), 0)
+    rows = db.query(Submission.id, Submission.user_id, Submission.status, Submission.xp_awarded, task_xp.label("task_xp")) \
+        .filter(*conditions).with_for_update(of=Submission).all()
+    found = {row.id: row for row in rows}
+    if found:
+        # Only the rows just read: re-running the filter could catch submissions
+        # inserted since (FOR UPDATE is a no-op on SQLite) that the ledger refresh misses
+        db.execute(update(Submission).where(Submission.id.in_(list(found)))
+                   .values(status=batch.status, xp_awarded=task_xp if batch.status == "verified" else 0)
+                   .execution_options(synchronize_session=False))
+
+    results, changed_users = [], set()
+    requested = dict.fromkeys(batch.submission_ids) if batch.submission_ids is not None else sorted(found)
+    for submission_id in requested:
+        row = found.get(submission_id)
+        if row is None:
+            results.append(SubmissionBatchResult(submission_id=submission_id, outcome="not_found"))
+            continue
+        xp_awarded = row.task_xp if batch.status == "verified" else 0
+        unchanged = row.status == batch.status and (row.xp_awarded or 0) == xp_awarded
+        if (row.xp_awarded or 0) != xp_awarded:
+            changed_users.add(row.user_id)
+        results.append(SubmissionBatchResult(
+            submission_id=submission_id,
+            outcome="unchanged" if unchanged else "updated",
+            user_id=row.user_id,
+            status=batch.status,
+            xp_awarded=xp_awarded,
+        ))
+
+    xp_ledger.refresh_room_users(db, room.id, changed_users)
+    db.commit()
+    xp_events.xp_changed(db, changed_users, [room.id])
+    activity.submissions_changed(db, (r.submission_id for r in results if r.outcome == "updated"), f"submission.{batch.status}")
+    logger.info("Submissions reviewed in batch", extra={
+        "room_id": room.id, "status": batch.status, "count": len(found), "users": len(changed_users)
+    })
+    return results
+
 @router.delete("/{task_id}")
-def delete_task(code: str, task_id: int, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+@db_endpoint
+def delete_task(code: str, task_id: int, user: Identity = Depends(get_current_identity), db: Session = Depends(get_db)):
+    code = code.strip().upper()
     room = db.query(Room).filter(Room.code == code).first()
     if not room:
         raise HTTPException(status_code=404, detail="Room not found")
@@ -203,6 +372,10 @@ def delete_task(code: str, task_id: int, user: User = Depends(get_current_user),
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
         
+    affected_users = xp_ledger.remove_task(db, task)
+    unused_files = blobs.release_task(db, task.id)
     db.delete(task)
-    db.commit()
+    with blobs.removing_files(unused_files):
+        db.commit()
+    xp_events.xp_changed(db, affected_users, [room.id])
     return {"message": "Task deleted successfully"}
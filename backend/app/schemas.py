@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field, validator
-from typing import Optional, List
-from datetime import datetime
+from typing import Optional, List, Literal
+from datetime import date, datetime
 from .models import TaskType
 
 class UserBase(BaseModel):
@@ -89,6 +89,22 @@ class TaskCreate(TaskBase):
     start_time: Optional[datetime] = None
     end_time: Optional[datetime] = None
 
+Weekday = Literal["mon", "tue", "wed", "thu", "fri", "sat", "sun"]
+
+class TaskRecurrence(BaseModel):
+    # One task on each of these weekdays, every `every_weeks` weeks, from start_date to end_date (inclusive)
+    weekdays: List[Weekday] = Field(min_length=1)
+    start_date: date
+    end_date: date
+    every_weeks: int = Field(default=1, ge=1, le=52)
+
+class TaskBatchItem(TaskCreate):
+    # Without a recurrence the item is created once, as by POST /rooms/{code}/tasks/
+    recurrence: Optional[TaskRecurrence] = None
+
+class TaskBatchCreate(BaseModel):
+    tasks: List[TaskBatchItem] = Field(min_length=1)
+
 class TaskResponse(TaskBase):
     id: int
     room_id: int
@@ -149,3 +165,17 @@ class DashboardResponse(BaseModel):
     recent_activities: List[ActivityEntry]
     top_adventurers: List[LeaderboardEntry]
     global_rank: Optional[int] = None
+
+class SubmissionBatchVerify(BaseModel):
+    status: Literal["verified", "rejected"] = "verified"
+    # Either these submissions, or the room's submissions matching the filter (task and/or current status)
+    submission_ids: Optional[List[int]] = Field(default=None, min_length=1, max_length=5000)
+    task_id: Optional[int] = None
+    current_status: Optional[Literal["pending", "verified", "rejected"]] = None
+
+class SubmissionBatchResult(BaseModel):
+    submission_id: int
+    outcome: Literal["updated", "unchanged", "not_found"]
+    user_id: Optional[int] = None
+    status: Optional[str] = None
+    xp_awarded: Optional[int] = None
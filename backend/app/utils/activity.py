@@ -0,0 +1,192 @@
+import asyncio
+import json
+from collections import defaultdict, deque
+from typing import Iterable, List, Optional
+from sqlalchemy.orm import Session
+from ..config import settings
+from ..models import Room, Submission, Task, User
+
+# In-process publish/subscribe for the live activity feeds.
+#
+# Write paths call submissions_changed() after their commit, from whatever
+# thread they run on; the event is handed to the event loop with
+# call_soon_threadsafe, where it gets the next id, goes into a ring buffer of
+# the last EVENTS_BUFFER_SIZE events and into the queue of every subscriber
+# of its topics ("room:<id>", "user:<id>"). Subscriber queues hold at most
+# EVENTS_QUEUE_SIZE events and drop the oldest when a client falls behind;
+# such a client, or one resuming from an id no longer buffered, gets a
+# "reset" event telling it to reload instead.
+#
+# The bus lives in one process: with several workers, a stream only sees
+# the events of the worker serving it.
+
+class Event:
+    __slots__ = ("id", "topics", "type", "data")
+
+    def __init__(self, topics, type: str, data: str, id: Optional[int] = None):
+        self.id = id
+        self.topics = topics
+        self.type = type
+        self.data = data
+
+    def to_sse(self) -> str:
+        lines = [f"id: {self.id}"] if self.id is not None else []
+        lines += [f"event: {self.type}", f"data: {self.data}"]
+        return "\n".join(lines) + "\n\n"
+
+    def to_json(self) -> str:
+        return json.dumps({"id": self.id, "event": self.type, "data": json.loads(self.data)})
+
+def _reset_event(reason: str) -> Event:
+    return Event((), "reset", json.dumps({"reason": reason}))
+
+class Subscription:
+    def __init__(self, topics, max_queue: int):
+        self.topics = topics
+        self.closed = False
+        self._queue = deque()
+        self._max_queue = max_queue
+        self._ready = asyncio.Event()
+        self._overflowed = False
+
+    def _put(self, event: Event):
+        if len(self._queue) >= self._max_queue:
+            self._queue.popleft()
+            self._overflowed = True
+        self._queue.append(event)
+        self._ready.set()
+
+    def _close(self):
+        self.closed = True
+        self._ready.set()
+
+    async def get(self, timeout: float) -> Optional[Event]:
+        """The next event, or None after `timeout` seconds without one (or once closed)."""
+        if self._overflowed:
+            self._overflowed = False
+            return _reset_event("overflow")
+        if not self._queue and not self.closed:
+            self._ready.clear()
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return None
+        return self._queue.popleft() if self._queue else None
+
+class ActivityBus:
+    def __init__(self, buffer_size: int, queue_size: int):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._buffer = deque(maxlen=buffer_size)
+        self._queue_size = queue_size
+        self._last_id = 0
+        self._subscribers = defaultdict(set)
+
+    def bind(self, loop: asyncio.AbstractEventLoop):
+        """Start delivering events on this loop (at app startup)."""
+        self._loop = loop
+
+    @property
+    def active(self) -> bool:
+        return self._loop is not None and not self._loop.is_closed()
+
+    @property
+    def last_id(self) -> int:
+        return self._last_id
+
+    def call_soon(self, callback, *args):
+        """Run callback(*args) on the bound loop, from any thread. Does nothing while no loop is bound."""
+        if not self.active:
+            return
+        try:
+            self._loop.call_soon_threadsafe(callback, *args)
+        except RuntimeError:
+            # Loop closed in between: shutting down
+            pass
+
+    def publish(self, topics: Iterable[str], type: str, data: dict):
+        """Thread-safe. Does nothing while no loop is bound (scripts, tests)."""
+        if self.active:
+            self.call_soon(self._dispatch, Event(tuple(topics), type, json.dumps(data, default=str, separators=(",", ":"))))
+
+    def _dispatch(self, event: Event):
+        self._last_id += 1
+        event.id = self._last_id
+        self._buffer.append(event)
+        for topic in event.topics:
+            for subscription in self._subscribers.get(topic, ()):
+                subscription._put(event)
+
+    def subscribe(self, topics: List[str], last_event_id: Optional[int] = None) -> Subscription:
+        """Must be called on the bound loop. Replays buffered events after last_event_id."""
+        subscription = Subscription(frozenset(topics), self._queue_size)
+        if last_event_id is not None:
+            if not self.can_resume(last_event_id):
+                # Missed events are gone (or the id is from before a restart)
+                subscription._put(_reset_event("resume"))
+            else:
+                for event in self._buffer:
+                    if event.id > last_event_id and subscription.topics.intersection(event.topics):
+                        subscription._put(event)
+        for topic in subscription.topics:
+            self._subscribers[topic].add(subscription)
+        return subscription
+
+    def can_resume(self, last_event_id: int) -> bool:
+        """Whether every event after last_event_id is still buffered."""
+        oldest = self._buffer[0].id if self._buffer else self._last_id + 1
+        return oldest - 1 <= last_event_id <= self._last_id
+
+    def has_subscribers(self, topic: str) -> bool:
+        return topic in self._subscribers
+
+    def unsubscribe(self, subscription: Subscription):
+        for topic in subscription.topics:
+            subscribers = self._subscribers.get(topic)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[topic]
+
+    def close(self):
+        """End every stream (at app shutdown)."""
+        for subscribers in list(self._subscribers.values()):
+            for subscription in subscribers:
+                subscription._close()
+        self._loop = None
+
+bus = ActivityBus(settings.EVENTS_BUFFER_SIZE, settings.EVENTS_QUEUE_SIZE)
+
+def room_topic(room_id: int) -> str:
+    return f"room:{room_id}"
+
+def user_topic(user_id: int) -> str:
+    return f"user:{user_id}"
+
+def submissions_changed(db: Session, submission_ids: Iterable[int], type: str):
+    """
+    Publish "submission.created/verified/rejected" for these submissions to
+    their room's and their author's feeds. Call after the commit.
+    """
+    submission_ids = list(submission_ids)
+    if not submission_ids or not bus.active:
+        return
+    rows = db.query(
+        Submission.id, Submission.user_id, Submission.task_id, Submission.status, Submission.xp_awarded,
+        Submission.timestamp, Task.title, Task.room_id, Room.name, User.username
+    ).join(Task, Task.id == Submission.task_id).join(Room, Room.id == Task.room_id).join(
+        User, User.id == Submission.user_id
+    ).filter(Submission.id.in_(submission_ids)).all()
+    for row in rows:
+        # quest_title/room_name/xp_earned/timestamp as in the dashboard's recent_activities
+        bus.publish((room_topic(row.room_id), user_topic(row.user_id)), type, {
+            "submission_id": row.id,
+            "task_id": row.task_id,
+            "room_id": row.room_id,
+            "user_id": row.user_id,
+            "username": row.username,
+            "status": row.status,
+            "quest_title": row.title,
+            "room_name": row.name,
+            "xp_earned": row.xp_awarded,
+            "timestamp": row.timestamp.isoformat() if row.timestamp else None,
+        })
@@ -1,21 +1,75 @@
+from typing import NamedTuple
 from fastapi import Depends, HTTPException, status, Request
-from sqlalchemy.orm import Session
-from passlib.context import CryptContext
-from ..database import get_db
-from ..models import User
+from sqlalchemy import and_, inspect
+from sqlalchemy.orm import Session, make_transient_to_detached
+from ..config import settings
+from ..database import get_db, run_db
+from ..models import Room, RoomMember, User
+from .cache import LRUCache
+# Password helpers live with the hashing worker pool
+from .passwords import pwd_context, verify_password, get_password_hash, hash_password, check_password, check_password_and_rehash
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Identity cache: user_id -> column values of the user's row, so resolving
+# the session's user doesn't cost a SELECT per request. Plain values, never
+# ORM objects (those belong to one session); get_current_user rebuilds a
+# User from them and attaches it to the request's session. Entries are
+# replaced or dropped wherever this process changes a user and expire after
+# USER_CACHE_TTL, which bounds staleness for changes made elsewhere.
+_user_cache = LRUCache(settings.USER_CACHE_SIZE, ttl=settings.USER_CACHE_TTL)
+_USER_COLUMNS = [attr.key for attr in inspect(User).column_attrs]
 
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+def cache_user(user: User):
+    """Remember a freshly loaded or saved user (call after commit)."""
+    _user_cache.set(user.id, {key: getattr(user, key) for key in _USER_COLUMNS})
 
-def get_password_hash(password):
-    return pwd_context.hash(password)
-def get_current_user(request: Request, db: Session = Depends(get_db)):
+def forget_user(user_id: int):
+    _user_cache.pop(user_id)
+
+class Identity(NamedTuple):
+    """The logged-in user as the session knows it: id and session claims, no DB row."""
+    id: int
+    claims: dict
+
+def _session_user_id(request: Request) -> int:
     user_id = request.session.get("user_id")
     if not user_id:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated")
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
-    return user
+    return user_id
+
+async def get_current_identity(request: Request) -> Identity:
+    """For routes that only need the user's id: no database access at all."""
+    return Identity(_session_user_id(request), dict(request.session))
+
+def _load_user(db: Session, user_id: int):
+    return db.query(User).filter(User.id == user_id).first()
+
+async def get_current_user(request: Request, db: Session = Depends(get_db)):
+    user_id = _session_user_id(request)
+    values = _user_cache.get(user_id)
+    if values is None:
+        user = await run_db(db, _load_user, user_id)
+        if not user:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
+        cache_user(user)
+        return user
+
+    # Attach a copy to this request's session as if it had been loaded (merge
+    # with load=False emits no SQL), so relationships and updates still work
+    user = User(**values)
+    make_transient_to_detached(user)
+    if hasattr(db, "run_sync"):
+        return await db.merge(user, load=False)
+    return db.merge(user, load=False)
+
+def admin_room(db: Session, code: str, user_id: int, detail: str) -> Room:
+    """The room with this code if user_id is one of its admins; 404, or 403 with `detail`, otherwise."""
+    # Room and the caller's membership in one query
+    row = db.query(Room, RoomMember.is_admin).outerjoin(
+        RoomMember, and_(RoomMember.room_id == Room.id, RoomMember.user_id == user_id)
+    ).filter(Room.code == code.strip().upper()).first()
+    if not row:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Room not found")
+    room, is_admin = row
+    if not is_admin:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=detail)
+    return room
@@ -0,0 +1,116 @@
+import os
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from typing import Iterable, List
+import aiofiles.os
+from sqlalchemy import func
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from ..config import settings
+from ..models import Blob, Submission, Task
+from .uploads import StagedUpload
+
+# Content-addressed store for submission files.
+#
+# A file lives once under UPLOAD_DIR/blobs/<aa>/<bb>/<sha256><ext>, however
+# many submissions point at it (Submission.file_path holds that relative
+# path, so the /uploads mount serves it like any older "{uuid}_{name}" file).
+# Blob.ref_count counts those submissions: acquire() bumps it inside the
+# submission's transaction, the release_* helpers drop it before deletes and
+# hand back the paths of blobs nobody uses anymore, whose files the caller
+# removes by committing inside removing_files().
+#
+# Many students upload the same file at once, so acquire() creates-or-bumps
+# the row with one INSERT ... ON CONFLICT (sha256) DO UPDATE. A release locks
+# the rows it drops until its commit, and removing_files() takes the files
+# away before that commit: an upload of the same content meanwhile waits for
+# the lock, then creates the row again and store() finds no file to reuse.
+
+BLOB_DIR = "blobs"
+
+def blob_path(sha256: str, filename: str) -> str:
+    """Relative path of a blob, sharded by the first two bytes of its hash."""
+    ext = os.path.splitext(filename)[1].lower()
+    return "/".join((BLOB_DIR, sha256[:2], sha256[2:4], sha256 + ext))
+
+def resolve(file_path: str) -> str:
+    """Absolute location of a stored file path (blob or legacy upload)."""
+    return os.path.join(settings.UPLOAD_DIR, *file_path.split("/"))
+
+def acquire(db: Session, upload: StagedUpload) -> Blob:
+    """Reference the blob holding upload's content, creating it on first use."""
+    insert = sqlite.insert if db.get_bind().dialect.name == "sqlite" else postgresql.insert
+    stmt = insert(Blob).values(
+        sha256=upload.sha256, path=blob_path(upload.sha256, upload.filename), size=upload.size, ref_count=1
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Blob.sha256], set_={"ref_count": func.coalesce(Blob.ref_count, 0) + 1}
+    ).returning(Blob)
+    return db.scalars(stmt, execution_options={"populate_existing": True}).one()
+
+async def store(upload: StagedUpload, blob_file_path: str):
+    """Put the staged content in place, unless an identical copy is already there.
+
+    Call after the transaction that acquired the blob committed.
+    """
+    path = resolve(blob_file_path)
+    if await aiofiles.os.path.exists(path):
+        await upload.discard()
+    else:
+        await upload.commit(path)
+
+def _release_paths(db: Session, file_paths: Iterable[str]) -> List[str]:
+    refs = Counter(p for p in file_paths if p and p.startswith(BLOB_DIR + "/"))
+    if not refs:
+        return []
+    unused = []
+    for blob in db.query(Blob).filter(Blob.path.in_(list(refs))).with_for_update():
+        blob.ref_count = (blob.ref_count or 0) - refs[blob.path]
+        if blob.ref_count <= 0:
+            unused.append(blob.path)
+            db.delete(blob)
+    db.flush()
+    return unused
+
+def release_submission(db: Session, submission: Submission) -> List[str]:
+    """Drop a submission's blob reference. Call before deleting the submission."""
+    return _release_paths(db, [submission.file_path])
+
+def release_task(db: Session, task_id: int) -> List[str]:
+    """Drop the blob references of a task's submissions. Call before deleting the task."""
+    return _release_paths(db, [p for (p,) in db.query(Submission.file_path).filter(Submission.task_id == task_id)])
+
+def release_room(db: Session, room_id: int) -> List[str]:
+    """Drop the blob references of every submission in a room. Call before deleting the room."""
+    rows = db.query(Submission.file_path).join(Task, Submission.task_id == Task.id).filter(Task.room_id == room_id)
+    return _release_paths(db, [p for (p,) in rows])
+
+@contextmanager
+def removing_files(file_paths: Iterable[str]):
+    """Delete the files of released blobs with the commit run in this block.
+
+    Use it around the commit of the transaction that released them. The files
+    are moved aside first, then deleted once the commit went through, or put
+    back if it failed.
+    """
+    moved = []
+    try:
+        for file_path in file_paths:
+            path = resolve(file_path)
+            aside = f"{path}.{uuid.uuid4().hex}.deleted"
+            try:
+                os.replace(path, aside)
+            except FileNotFoundError:
+                continue
+            moved.append((path, aside))
+        yield
+    except BaseException:
+        for path, aside in moved:
+            os.replace(aside, path)
+        raise
+    for _, aside in moved:
+        try:
+            os.remove(aside)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,106 @@
+import itertools
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import date
+from typing import Iterable, Optional, Tuple
+from ..config import settings
+from .cache import LRUCache
+
+# Cache for the /dashboard response, in two parts:
+#   * a per-user section (totals, streak, charts, room XP, recent activities),
+#     dropped whenever that user's submissions change, LRU-bounded;
+#   * the shared "top adventurers" section, dropped whenever any XP changes.
+# global_rank is read from the ranked index on every request, so it is never
+# cached. Every stored section gets a stamp, and stamps make up the ETag.
+#
+# Invalidation only sees the writes this process handles; sections also
+# expire after DASHBOARD_CACHE_TTL seconds, which bounds how long changes
+# made through other workers (or directly in the database) go unseen.
+#
+# Sections are stored with the version token read before computing them; if
+# an invalidation happened in between, the store is skipped so a request
+# racing with a new submission can't cache stale data. User invalidations
+# are numbered; the number of the last one is kept for the DASHBOARD_CACHE_SIZE
+# users invalidated most recently, and for anyone older the highest number
+# forgotten stands in (at worst a store is skipped), so memory stays bounded.
+
+class DashboardCache:
+    def __init__(self, max_users: int, ttl: float):
+        self._ttl = ttl
+        self._max_users = max_users
+        self._users = LRUCache(max_users, ttl=ttl)
+        self._top = None
+        self._lock = threading.Lock()
+        self._stamps = itertools.count(1)
+        self._epoch = 0
+        # user_id -> number of their last invalidation, oldest first
+        self._invalidated = OrderedDict()
+        self._invalidations = 0
+        self._forgotten = 0
+        self._top_version = 0
+        # Distinguishes ETags issued by different processes/restarts
+        self._boot_id = uuid.uuid4().hex[:8]
+
+    def token(self, user_id: int) -> Tuple[int, int, int]:
+        """Version token to pass to set_user/set_top for data read after this call."""
+        with self._lock:
+            return (self._epoch, self._invalidations, self._top_version)
+
+    def get_user(self, user_id: int, day: date) -> Optional[Tuple[int, dict]]:
+        """(stamp, section) if cached for this user and day."""
+        entry = self._users.get(user_id)
+        if entry and entry[0] == day:
+            return entry[1], entry[2]
+        return None
+
+    def set_user(self, user_id: int, day: date, section: dict, token) -> Optional[int]:
+        with self._lock:
+            if token[0] != self._epoch or self._invalidated.get(user_id, self._forgotten) > token[1]:
+                return None
+            stamp = next(self._stamps)
+            self._users.set(user_id, (day, stamp, section))
+            return stamp
+
+    def get_top(self):
+        top = self._top
+        if top is None or top[2] <= time.monotonic():
+            return None
+        return top[:2]
+
+    def set_top(self, entries, token) -> Optional[int]:
+        with self._lock:
+            if (token[0], token[2]) != (self._epoch, self._top_version):
+                return None
+            stamp = next(self._stamps)
+            self._top = (stamp, entries, time.monotonic() + self._ttl)
+            return stamp
+
+    def invalidate_users(self, user_ids: Iterable[int]):
+        with self._lock:
+            for user_id in user_ids:
+                self._invalidations += 1
+                self._invalidated[user_id] = self._invalidations
+                self._invalidated.move_to_end(user_id)
+                self._users.pop(user_id)
+            while len(self._invalidated) > self._max_users:
+                _, self._forgotten = self._invalidated.popitem(last=False)
+
+    def invalidate_top(self):
+        with self._lock:
+            self._top_version += 1
+            self._top = None
+
+    def clear(self):
+        with self._lock:
+            self._epoch += 1
+            self._invalidated.clear()
+            self._top_version = 0
+            self._users.clear()
+            self._top = None
+
+    def etag(self, user_stamp: int, top_stamp: int, global_rank: int) -> str:
+        return f'"{self._boot_id}-{user_stamp}-{top_stamp}-{global_rank}"'
+
+dashboard_cache = DashboardCache(settings.DASHBOARD_CACHE_SIZE, settings.DASHBOARD_CACHE_TTL)
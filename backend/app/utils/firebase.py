@@ -1,38 +1,111 @@
+import hashlib
+import os
+import threading
+import time
 import firebase_admin
 from firebase_admin import auth, credentials
-import os
+from google.auth.transport import Response
 from fastapi import HTTPException
+from ..config import settings
+from .cache import LRUCache
+from .log import get_logger
+
+logger = get_logger(__name__)
+
+# Firebase ID token verification.
+#
+# Tokens are checked by the Admin SDK (signature, algorithm, kid, aud, iss,
+# sub, exp, iat, auth_time), which keeps Google's signing certificates for
+# as long as their Cache-Control allows. The SDK is initialized on first use
+# rather than at import, and every token that passed is remembered, by its
+# sha256, until it expires, so a client retrying a login costs a dictionary
+# lookup instead of a signature check.
+#
+# FIREBASE_KEYSET_PATH points at a local JSON file of {kid: PEM certificate
+# or public key} that the SDK is given instead of Google's certificates, to
+# test and benchmark without the network (see scripts/bench_firebase_login.py).
+
+DEFAULT_PROJECT_ID = "uniquest-6d420"
+
+_init_lock = threading.Lock()
+
+class _LocalCertificates:
+    """Transport answering the SDK's certificate fetch from a local key set file."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def __call__(self, url, method="GET", body=None, headers=None, timeout=None, **kwargs):
+        with open(self.path, "rb") as f:
+            return _LocalResponse(f.read())
+
+class _LocalResponse(Response):
+    def __init__(self, data: bytes):
+        self._data = data
 
-# Initialize Firebase Admin
-# In production, you'd use a service account JSON file
-# For now, we'll try to initialize it with default credentials or skip if already initialized
-try:
-    if not firebase_admin._apps:
-        # 1. Check Env Var
-        cert_path = os.environ.get("FIREBASE_SERVICE_ACCOUNT_PATH")
-        
-        # 2. Check backend root directory if env var is empty
-        if not cert_path or not os.path.exists(cert_path):
-            # utils/firebase.py -> utils -> app -> backend
-            backend_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-            local_key = os.path.join(backend_root, "firebase-key.json")
-            if os.path.exists(local_key):
-                cert_path = local_key
+    @property
+    def status(self):
+        return 200
 
+    @property
+    def headers(self):
+        return {"content-type": "application/json"}
+
+    @property
+    def data(self):
+        return self._data
+
+def _use_local_keys(app, path: str):
+    # The SDK has no option for it: swap the transport its ID token verifier fetches certificates with
+    auth._get_client(app)._token_verifier.request = _LocalCertificates(path)
+    logger.info("Verifying Firebase ID tokens with the local key set at %s", path)
+
+def get_app():
+    """The Firebase Admin app, initialized on the first call."""
+    with _init_lock:
+        if firebase_admin._apps:
+            return firebase_admin.get_app()
+        app = _initialize_app()
+        if settings.FIREBASE_KEYSET_PATH:
+            _use_local_keys(app, settings.FIREBASE_KEYSET_PATH)
+        return app
+
+def _initialize_app():
+    # 1. Check Env Var
+    cert_path = os.environ.get("FIREBASE_SERVICE_ACCOUNT_PATH")
+
+    # 2. Check backend root directory if env var is empty
+    if not cert_path or not os.path.exists(cert_path):
+        # utils/firebase.py -> utils -> app -> backend
+        backend_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        local_key = os.path.join(backend_root, "firebase-key.json")
+        if os.path.exists(local_key):
+            cert_path = local_key
+
+    try:
         if cert_path and os.path.exists(cert_path):
-            print(f"DEBUG: Initializing Firebase with certificate at: {cert_path}")
-            cred = credentials.Certificate(cert_path)
-            firebase_admin.initialize_app(cred)
-        else:
-            print("DEBUG: Initializing Firebase with default options (No certificate found)")
-            firebase_admin.initialize_app(options={'projectId': 'uniquest-6d420'})
-except Exception as e:
-    print(f"Firebase Admin initialization warning: {e}")
-    # We'll handle the "app already exists" or "no credentials" cases gracefully
+            logger.info("Initializing Firebase with certificate at %s", cert_path)
+            return firebase_admin.initialize_app(credentials.Certificate(cert_path))
+    except Exception as e:
+        logger.warning("Firebase Admin initialization failed: %s", e)
+    logger.info("Initializing Firebase with default options (no certificate found)")
+    return firebase_admin.initialize_app(options={"projectId": DEFAULT_PROJECT_ID})
+
+def _project_id() -> str:
+    return get_app().project_id or DEFAULT_PROJECT_ID
+
+_verified_tokens = LRUCache(settings.FIREBASE_TOKEN_CACHE_SIZE)
 
 def verify_firebase_token(id_token: str):
+    key = hashlib.sha256(id_token.encode()).hexdigest()
+    cached = _verified_tokens.get(key)
+    if cached is not None and cached["exp"] > time.time():
+        return dict(cached)
     try:
-        decoded_token = auth.verify_id_token(id_token)
-        return decoded_token
+        decoded_token = auth.verify_id_token(id_token, app=get_app())
     except Exception as e:
         raise HTTPException(status_code=401, detail=f"Invalid Firebase token: {str(e)}")
+    ttl = decoded_token.get("exp", 0) - time.time()
+    if ttl > 0:
+        _verified_tokens.set(key, dict(decoded_token), ttl=ttl)
+    return decoded_token
@@ -1,5 +1,5 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import func, case
 from datetime import datetime, date
 from ..models import Submission, Task
 
@@ -37,3 +37,19 @@ def get_daily_multiplier(submission_count: int) -> float:
     if submission_count >= 4:
         return 1.5
     return 1.0
+
+def apply_daily_multiplier(base_xp: int, submission_count: int) -> int:
+    # Final XP for one (user, room, day) bucket
+    return int((base_xp or 0) * get_daily_multiplier(submission_count))
+
+def daily_xp_sql(base_xp, submission_count):
+    """SQL twin of apply_daily_multiplier for use inside aggregate queries.
+
+    Integer arithmetic keeps it identical to int(base * multiplier) for the
+    non-negative XP values we store: x * 1.5 -> (x * 3) // 2, x * 3.5 -> (x * 7) // 2.
+    """
+    return case(
+        (submission_count >= 7, (base_xp * 7) // 2),
+        (submission_count >= 4, (base_xp * 3) // 2),
+        else_=base_xp,
+    )
@@ -0,0 +1,152 @@
+import asyncio
+from typing import Dict, Iterable, List, Optional
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from ..config import settings
+from ..database import ReadSessionLocal
+from ..models import RoomMember, User
+from . import rank_index, xp_ledger
+from .activity import bus
+from .log import get_logger
+
+logger = get_logger(__name__)
+
+# Live leaderboards, pushed over the activity bus instead of polled.
+#
+# A board is the global leaderboard (None) or a room's (its id); streams get
+# its top LEADERBOARD_STREAM_SIZE entries as a snapshot, then deltas. Every
+# XP or membership change marks its boards dirty (see xp_events); once per
+# LEADERBOARD_COALESCE_SECONDS the dirty boards someone watches are
+# recomputed - the global one from the in-memory rank index, a room's with
+# one query - and compared with what was last sent. Entries new to the top
+# (whole) and those whose XP changed (user_id, total_xp, rank) go out as one
+# "leaderboard.delta" event per board, with the ids of entries that left the
+# top; the other entries keep their XP and their ranks follow from the order
+# (total_xp desc, user_id).
+#
+# The last standings sent are kept per watched board, so new streams get
+# their snapshot from memory. A dirty board nobody watches just forgets them.
+
+def board_topic(room_id: Optional[int]) -> str:
+    return "leaderboard:global" if room_id is None else f"leaderboard:room:{room_id}"
+
+def _entry(rank: int, user_id: int, username: str, email: Optional[str], total_xp: int) -> dict:
+    # Same fields as LeaderboardEntry
+    return {"user_id": user_id, "username": username, "email": email or "", "total_xp": int(total_xp), "rank": rank}
+
+def _changes(old: Optional[dict], entry: dict) -> dict:
+    # Entries new to the top go out whole, the others only with what changed
+    if old is None:
+        return entry
+    changes = {"user_id": entry["user_id"], "total_xp": entry["total_xp"], "rank": entry["rank"]}
+    if old["username"] != entry["username"]:
+        changes["username"] = entry["username"]
+    return changes
+
+def _global_standings(db: Session, size: int) -> List[dict]:
+    ranked = rank_index.leaderboard_index.top(size)
+    users = {u.id: u for u in db.query(User.id, User.username, User.email).filter(User.id.in_([uid for _, uid, _ in ranked]))}
+    return [_entry(rank, uid, users[uid].username, users[uid].email, xp) for rank, uid, xp in ranked if uid in users]
+
+def _room_standings(db: Session, room_id: int, size: int) -> List[dict]:
+    # As GET /rooms/{code}/leaderboard: members LEFT JOIN their room XP
+    totals = xp_ledger.totals_subquery(db, room_id)
+    total_xp = func.coalesce(totals.c.total_xp, 0)
+    rows = db.query(User.id, User.username, User.email, total_xp).join(
+        RoomMember, RoomMember.user_id == User.id
+    ).outerjoin(
+        totals, totals.c.user_id == User.id
+    ).filter(RoomMember.room_id == room_id).order_by(total_xp.desc(), User.id).limit(size)
+    return [_entry(rank, *row) for rank, row in enumerate(rows, start=1)]
+
+def _compute(boards: Iterable[Optional[int]], size: int) -> Dict[Optional[int], Dict[int, dict]]:
+    with ReadSessionLocal() as db:
+        return {
+            board: {e["user_id"]: e for e in (_global_standings(db, size) if board is None else _room_standings(db, board, size))}
+            for board in boards
+        }
+
+class LeaderboardFeed:
+    def __init__(self, size: int, window: float):
+        self._size = size
+        self._window = window
+        self._standings: Dict[Optional[int], Dict[int, dict]] = {}
+        self._dirty = set()
+        self._timer = None
+        self._task = None
+        self._lock = None
+
+    def changed(self, room_ids: Iterable[int] = (), global_board: bool = True):
+        """Thread-safe: these rooms' boards (and the global one) may have changed. Call after the commit."""
+        boards = set(room_ids)
+        if global_board:
+            boards.add(None)
+        if boards:
+            bus.call_soon(self._mark, boards)
+
+    def _mark(self, boards):
+        self._dirty |= boards
+        if self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self._window, self._start_flush)
+
+    def _start_flush(self):
+        self._timer = None
+        # Keep a reference: the loop only holds tasks weakly
+        self._task = asyncio.ensure_future(self._flush())
+
+    def _get_lock(self) -> asyncio.Lock:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        return self._lock
+
+    async def _flush(self):
+        boards, self._dirty = self._dirty, set()
+        async with self._get_lock():
+            # Forget the standings of boards nobody watches any more
+            for board in list(self._standings):
+                if not bus.has_subscribers(board_topic(board)):
+                    del self._standings[board]
+            # A watched board without standings is getting its first snapshot, computed after this
+            watched = [board for board in boards if board in self._standings]
+            if not watched:
+                return
+            try:
+                fresh = await run_in_threadpool(_compute, watched, self._size)
+            except Exception:
+                logger.exception("Leaderboard update failed", extra={"boards": len(watched)})
+                # The next stream recomputes from scratch
+                for board in watched:
+                    self._standings.pop(board, None)
+                return
+            for board, standings in fresh.items():
+                old = self._standings.get(board, {})
+                self._standings[board] = standings
+                entries = [_changes(old.get(uid), e) for uid, e in standings.items()
+                           if uid not in old or (old[uid]["total_xp"], old[uid]["username"]) != (e["total_xp"], e["username"])]
+                removed = sorted(set(old) - set(standings))
+                if entries or removed:
+                    bus.publish([board_topic(board)], "leaderboard.delta", {
+                        "room_id": board,
+                        "entries": sorted(entries, key=lambda e: e["rank"]),
+                        "removed": removed,
+                    })
+
+    async def snapshot(self, room_id: Optional[int]) -> dict:
+        """The board's current top entries. Subscribe to its topic first, so no delta is missed."""
+        async with self._get_lock():
+            standings = self._standings.get(room_id)
+            if standings is None:
+                standings = (await run_in_threadpool(_compute, [room_id], self._size))[room_id]
+                if bus.has_subscribers(board_topic(room_id)):
+                    self._standings[room_id] = standings
+        return {"room_id": room_id, "entries": sorted(standings.values(), key=lambda e: e["rank"])}
+
+    def close(self):
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer, self._task, self._lock = None, None, None
+        self._dirty.clear()
+        self._standings.clear()
+
+feed = LeaderboardFeed(settings.LEADERBOARD_STREAM_SIZE, settings.LEADERBOARD_COALESCE_SECONDS)
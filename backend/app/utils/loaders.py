@@ -0,0 +1,62 @@
+from fastapi import Depends
+from sqlalchemy.orm import Session
+from collections import defaultdict
+from typing import Dict, Iterable, List
+from ..database import get_db, get_read_db
+
+# Keeps IN lists well below SQLite's bound parameter limit
+CHUNK_SIZE = 500
+
+def _chunks(values: List, size: int = CHUNK_SIZE):
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+class BatchLoader:
+    """
+    Per-request batch loader.
+
+    Routes collect the ids they need first and resolve them with one IN query
+    per model instead of one query per row. Loaded objects are memoized for the
+    rest of the request, so asking for the same id twice costs nothing.
+    """
+
+    def __init__(self, db: Session):
+        # With the async engine, routes run on the AsyncSession's sync session
+        self.db = getattr(db, "sync_session", db)
+        self._cache = defaultdict(dict)
+
+    def load_many(self, model, ids: Iterable[int]) -> Dict[int, object]:
+        """id -> object for every id that exists."""
+        ids = {i for i in ids if i is not None}
+        cache = self._cache[model]
+        missing = [i for i in ids if i not in cache]
+        for chunk in _chunks(missing):
+            for obj in self.db.query(model).filter(model.id.in_(chunk)):
+                cache[obj.id] = obj
+        for i in missing:
+            cache.setdefault(i, None)
+        return {i: cache[i] for i in ids if cache[i] is not None}
+
+    def load(self, model, id: int):
+        return self.load_many(model, [id]).get(id)
+
+    def load_by(self, column, values: Iterable, *criteria) -> Dict[object, List[object]]:
+        """
+        Group the rows of column's model by column value, e.g.
+        load_by(Submission.task_id, task_ids, Submission.user_id == user.id).
+        """
+        model = column.class_
+        values = list({v for v in values if v is not None})
+        grouped = defaultdict(list)
+        for chunk in _chunks(values):
+            for obj in self.db.query(model).filter(column.in_(chunk), *criteria):
+                self._cache[model][obj.id] = obj
+                grouped[getattr(obj, column.key)].append(obj)
+        return grouped
+
+def get_loader(db: Session = Depends(get_db)) -> BatchLoader:
+    return BatchLoader(db)
+
+def get_read_loader(db: Session = Depends(get_read_db)) -> BatchLoader:
+    """Loader on the read-only session, for routes that use get_read_db."""
+    return BatchLoader(db)
@@ -0,0 +1,192 @@
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from contextvars import ContextVar
+from typing import Optional
+from sqlalchemy import event
+from starlette.requests import HTTPConnection
+from ..config import settings
+from .log import get_logger
+
+# Request and SQL instrumentation.
+#
+# MetricsMiddleware times every request per route template (so /rooms/{code}
+# is one series, not one per room) and counts responses by status. The
+# track_route app dependency runs once routing picked the route and counts
+# the request as in flight for that route until it finishes. SQLAlchemy
+# cursor events add the number of statements and the DB time to the request
+# currently running (found through a contextvar, which also follows the
+# request into threadpool workers and run_sync).
+# Everything is exposed in Prometheus text format by render(). Values are
+# per process; with several workers, scrape each one.
+
+logger = get_logger(__name__)
+
+# Latency histogram buckets, in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+UNMATCHED_ROUTE = "<unmatched>"
+
+class RequestStats:
+    __slots__ = ("route", "count", "seconds", "statements")
+
+    def __init__(self):
+        # Route template, once known
+        self.route = None
+        # SQL statements run, time spent in them, and how often each one ran
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = Counter()
+
+_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self.latency_buckets = defaultdict(lambda: [0] * (len(BUCKETS) + 1))
+            self.latency_sum = defaultdict(float)
+            self.latency_count = defaultdict(int)
+            self.responses = defaultdict(int)
+            self.in_flight = defaultdict(int)
+            self.db_queries = defaultdict(int)
+            self.db_seconds = defaultdict(float)
+            self.n_plus_one = defaultdict(int)
+
+    def start(self, key):
+        with self._lock:
+            self.in_flight[key] += 1
+
+    def finish(self, key, status: int, seconds: float, stats: RequestStats, suspected_n_plus_one: bool):
+        with self._lock:
+            if stats.route is not None:
+                self.in_flight[key] -= 1
+            self.latency_buckets[key][bisect_left(BUCKETS, seconds)] += 1
+            self.latency_sum[key] += seconds
+            self.latency_count[key] += 1
+            self.responses[key + (str(status),)] += 1
+            self.db_queries[key] += stats.count
+            self.db_seconds[key] += stats.seconds
+            if suspected_n_plus_one:
+                self.n_plus_one[key] += 1
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+
+        def family(name, kind, help_text, samples):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                lines.append(f"{name}{_labels(labels)} {value}")
+
+        with self._lock:
+            lines.append("# HELP uniquest_http_request_duration_seconds Request latency per route template.")
+            lines.append("# TYPE uniquest_http_request_duration_seconds histogram")
+            for key, counts in sorted(self.latency_buckets.items()):
+                labels = _route_labels(key)
+                cumulative = 0
+                for bound, count in zip(BUCKETS + ("+Inf",), counts):
+                    cumulative += count
+                    lines.append(f"uniquest_http_request_duration_seconds_bucket{_labels(labels + [('le', bound)])} {cumulative}")
+                lines.append(f"uniquest_http_request_duration_seconds_sum{_labels(labels)} {round(self.latency_sum[key], 6)}")
+                lines.append(f"uniquest_http_request_duration_seconds_count{_labels(labels)} {self.latency_count[key]}")
+
+            family("uniquest_http_requests_total", "counter", "Responses per route template and status code.",
+                   [(_route_labels(key[:2]) + [("status", key[2])], v) for key, v in sorted(self.responses.items())])
+            family("uniquest_http_requests_in_progress", "gauge", "Requests currently being handled.",
+                   [(_route_labels(key), v) for key, v in sorted(self.in_flight.items())])
+            family("uniquest_db_queries_total", "counter", "SQL statements executed while handling requests.",
+                   [(_route_labels(key), v) for key, v in sorted(self.db_queries.items())])
+            family("uniquest_db_query_seconds_total", "counter", "Time spent executing SQL statements.",
+                   [(_route_labels(key), round(v, 6)) for key, v in sorted(self.db_seconds.items())])
+            family("uniquest_db_n_plus_one_total", "counter", "Requests that repeated one statement more than the N+1 threshold.",
+                   [(_route_labels(key), v) for key, v in sorted(self.n_plus_one.items())])
+        return "\n".join(lines) + "\n"
+
+def _route_labels(key):
+    method, route = key
+    return [("method", method), ("route", route)]
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels(pairs) -> str:
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+registry = Registry()
+
+def render() -> str:
+    return registry.render()
+
+# SQLAlchemy hooks
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._metrics_started = time.perf_counter()
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.count += 1
+        stats.seconds += time.perf_counter() - context._metrics_started
+        stats.statements[statement] += 1
+
+def instrument_engine(engine):
+    """Count statements and DB time of an engine (sync Engine, or AsyncEngine.sync_engine)."""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+# Middleware
+
+async def track_route(connection: HTTPConnection):
+    """App-wide dependency: marks the request in flight for its route template (WebSockets aren't tracked)."""
+    stats = _request_stats.get()
+    route = connection.scope.get("route")
+    if stats is not None and stats.route is None and route is not None:
+        stats.route = route.path
+        registry.start((connection.scope["method"], stats.route))
+
+class MetricsMiddleware:
+    """Per-route latency/status/in-flight metrics, per-request query counts, N+1 warnings."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        status = 500
+        started = time.perf_counter()
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if settings.SERVER_TIMING:
+                    elapsed_ms = (time.perf_counter() - started) * 1000
+                    value = f'db;dur={stats.seconds * 1000:.1f};desc="{stats.count} queries", app;dur={elapsed_ms:.1f}'
+                    message["headers"] = list(message.get("headers", [])) + [(b"server-timing", value.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_stats.reset(token)
+            route = scope.get("route")
+            key = (scope["method"], stats.route or getattr(route, "path", None) or UNMATCHED_ROUTE)
+            statement, repeats = stats.statements.most_common(1)[0] if stats.statements else ("", 0)
+            suspected = repeats > settings.N_PLUS_ONE_THRESHOLD
+            if suspected:
+                logger.warning(
+                    "Possible N+1 query: statement repeated %d times in one request", repeats,
+                    extra={"method": key[0], "route": key[1], "statement": statement, "total_queries": stats.count}
+                )
+            registry.finish(key, status, time.perf_counter() - started, stats, suspected)
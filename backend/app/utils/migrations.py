@@ -0,0 +1,24 @@
+import os
+from alembic import command
+from alembic.config import Config
+from ..database import engine
+
+# Versioned schema migrations (backend/migrations, managed with Alembic).
+# The app upgrades its database to the latest revision on startup; run
+# `alembic upgrade head` from backend/ to do it by hand, and
+# `alembic revision --autogenerate -m "..."` after changing a model.
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def alembic_config() -> Config:
+    """Alembic config pointing at backend/migrations, whatever the working directory."""
+    config = Config(os.path.join(BACKEND_DIR, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(BACKEND_DIR, "migrations"))
+    return config
+
+def upgrade_database(revision: str = "head"):
+    """Bring the configured database up to `revision`, creating it from scratch if empty."""
+    config = alembic_config()
+    with engine.begin() as connection:
+        config.attributes["connection"] = connection
+        command.upgrade(config, revision)
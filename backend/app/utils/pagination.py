@@ -0,0 +1,30 @@
+import base64
+import binascii
+import json
+from typing import Any, Callable, List, Optional
+from fastapi import HTTPException, Response
+
+# Keyset pagination helpers. A cursor is the sort key of the last entry of a
+# page, encoded as an opaque url-safe string. List endpoints keep returning a
+# plain JSON array and hand out the next cursor in a response header.
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def encode_cursor(*values: Any) -> str:
+    raw = json.dumps(values, separators=(",", ":"), default=str)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str, *types: Callable[[Any], Any]) -> List[Any]:
+    """Decode a cursor and convert each value with the matching type (e.g. int)."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, list) or len(values) != len(types):
+            raise ValueError("wrong cursor size")
+        return [value if value is None else convert(value) for convert, value in zip(types, values)]
+    except (ValueError, TypeError, binascii.Error):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def set_next_cursor(response: Response, cursor: Optional[str]):
+    if cursor:
+        response.headers[NEXT_CURSOR_HEADER] = cursor
@@ -0,0 +1,67 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional, Tuple
+from passlib.context import CryptContext
+from starlette.concurrency import run_in_threadpool
+from ..config import settings
+
+# Password hashing off the request path.
+#
+# bcrypt costs tens of milliseconds of CPU per hash or check. Run inline (or
+# in Starlette's threadpool) a burst of logins occupies the threads every
+# other sync endpoint needs, so the async helpers below send the work to a
+# small pool of worker processes instead (PASSWORD_WORKERS; 0 keeps the
+# threadpool). The workers only import this module and the config.
+#
+# Hashes are made with BCRYPT_ROUNDS. Stored hashes made with another cost
+# are upgraded on the next successful login (verify_and_update).
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.BCRYPT_ROUNDS)
+
+def verify_password(plain_password, hashed_password):
+    return pwd_context.verify(plain_password, hashed_password)
+
+def get_password_hash(password):
+    return pwd_context.hash(password)
+
+def _verify_and_update(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # spawn, not fork: the server process has threads (logging, DB pools) that
+        # a forked child would inherit in whatever state they were in
+        _pool = ProcessPoolExecutor(max_workers=settings.PASSWORD_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+async def _run(fn, *args):
+    if settings.PASSWORD_WORKERS <= 0:
+        return await run_in_threadpool(fn, *args)
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(_get_pool(), fn, *args)
+    except BrokenProcessPool:
+        # A worker died (e.g. killed by the OS); start a fresh pool and try once more
+        shutdown_pool(wait=False)
+        return await loop.run_in_executor(_get_pool(), fn, *args)
+
+async def hash_password(password: str) -> str:
+    return await _run(get_password_hash, password)
+
+async def check_password(plain_password: str, hashed_password: str) -> bool:
+    return await _run(verify_password, plain_password, hashed_password)
+
+async def check_password_and_rehash(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """(valid, new_hash): new_hash is set when the stored hash should be replaced."""
+    return await _run(_verify_and_update, plain_password, hashed_password)
+
+def shutdown_pool(wait: bool = True):
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=wait, cancel_futures=not wait)
+        _pool = None
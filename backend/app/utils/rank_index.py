@@ -0,0 +1,229 @@
+import random
+import threading
+from math import inf
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy.orm import Session
+from . import xp_ledger
+
+# Process-local ranked view of the global leaderboard.
+#
+# An indexable skip list ordered by (-total_xp, user_id): every link stores how
+# many entries it skips, so "rank of user", "entry at rank r" and inserts or
+# removals are all O(log n). It is warmed from the XP ledger at startup and
+# refreshed after every commit that changes someone's XP. Each worker process
+# keeps its own copy, refreshed by the writes that worker handles and
+# reloaded from the ledger every RANK_INDEX_RESYNC_SECONDS (see
+# xp_events.resync_periodically), which bounds how long the writes of other
+# workers and maintenance scripts take to show up.
+
+MAX_LEVEL = 32
+
+class _Node:
+    __slots__ = ("key", "next", "width")
+
+    def __init__(self, key, level):
+        self.key = key
+        self.next = [None] * level
+        self.width = [1] * level
+
+_END = _Node((inf, inf), 0)
+
+class RankIndex:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._head = _Node(None, MAX_LEVEL)
+            self._head.next = [_END] * MAX_LEVEL
+            self._keys: Dict[int, Tuple[int, int]] = {}
+
+    def __len__(self):
+        return len(self._keys)
+
+    @staticmethod
+    def _key(user_id: int, total_xp: int):
+        return (-total_xp, user_id)
+
+    @staticmethod
+    def _random_level():
+        level = 1
+        while level < MAX_LEVEL and random.random() < 0.5:
+            level += 1
+        return level
+
+    def _insert(self, key):
+        chain = [None] * MAX_LEVEL
+        steps_at_level = [0] * MAX_LEVEL
+        node = self._head
+        for level in reversed(range(MAX_LEVEL)):
+            while node.next[level].key <= key:
+                steps_at_level[level] += node.width[level]
+                node = node.next[level]
+            chain[level] = node
+
+        height = self._random_level()
+        new_node = _Node(key, height)
+        steps = 0
+        for level in range(height):
+            prev = chain[level]
+            new_node.next[level] = prev.next[level]
+            prev.next[level] = new_node
+            new_node.width[level] = prev.width[level] - steps
+            prev.width[level] = steps + 1
+            steps += steps_at_level[level]
+        for level in range(height, MAX_LEVEL):
+            chain[level].width[level] += 1
+
+    def _remove(self, key):
+        chain = [None] * MAX_LEVEL
+        node = self._head
+        for level in reversed(range(MAX_LEVEL)):
+            while node.next[level].key < key:
+                node = node.next[level]
+            chain[level] = node
+
+        target = chain[0].next[0]
+        for level in range(len(target.next)):
+            prev = chain[level]
+            prev.width[level] += target.width[level] - 1
+            prev.next[level] = target.next[level]
+        for level in range(len(target.next), MAX_LEVEL):
+            chain[level].width[level] -= 1
+
+    def _position(self, key, inclusive=False) -> int:
+        # Number of entries strictly ahead of key (or ahead of and equal to it)
+        position = 0
+        node = self._head
+        for level in reversed(range(MAX_LEVEL)):
+            while node.next[level].key < key or (inclusive and node.next[level].key == key):
+                position += node.width[level]
+                node = node.next[level]
+        return position
+
+    def _node_at(self, position: int) -> _Node:
+        # 0-based position -> node
+        remaining = position + 1
+        node = self._head
+        for level in reversed(range(MAX_LEVEL)):
+            while node.width[level] <= remaining and node.next[level] is not _END:
+                remaining -= node.width[level]
+                node = node.next[level]
+        return node
+
+    def _walk(self, position: int, count: int) -> List[Tuple[int, int, int]]:
+        # (rank, user_id, total_xp) for count entries starting at position
+        entries = []
+        if position >= len(self._keys) or count <= 0:
+            return entries
+        node = self._node_at(position)
+        while node is not _END and len(entries) < count:
+            neg_xp, user_id = node.key
+            entries.append((position + len(entries) + 1, user_id, -neg_xp))
+            node = node.next[0]
+        return entries
+
+    # Public API
+
+    def set(self, user_id: int, total_xp: int):
+        key = self._key(user_id, total_xp)
+        with self._lock:
+            old = self._keys.get(user_id)
+            if old == key:
+                return
+            if old is not None:
+                self._remove(old)
+            self._insert(key)
+            self._keys[user_id] = key
+
+    def remove(self, user_id: int):
+        with self._lock:
+            old = self._keys.pop(user_id, None)
+            if old is not None:
+                self._remove(old)
+
+    def load(self, totals: Dict[int, int]) -> bool:
+        """Replace the whole index with user_id -> total_xp. Returns whether anything changed."""
+        # Built aside and swapped in, so readers aren't held up meanwhile
+        fresh = RankIndex()
+        for user_id, total_xp in totals.items():
+            fresh.set(user_id, total_xp)
+        with self._lock:
+            changed = fresh._keys != self._keys
+            self._head, self._keys = fresh._head, fresh._keys
+        return changed
+
+    def total_xp(self, user_id: int) -> Optional[int]:
+        key = self._keys.get(user_id)
+        return -key[0] if key else None
+
+    def rank(self, user_id: int) -> Optional[int]:
+        """1-based rank of a user, None if they have no submissions."""
+        with self._lock:
+            key = self._keys.get(user_id)
+            if key is None:
+                return None
+            return self._position(key) + 1
+
+    def top(self, k: int) -> List[Tuple[int, int, int]]:
+        """The k best entries as (rank, user_id, total_xp)."""
+        with self._lock:
+            return self._walk(0, k)
+
+    def after(self, total_xp: int, user_id: int, limit: int) -> List[Tuple[int, int, int]]:
+        """Keyset page: up to limit entries ranked below the (total_xp, user_id) key."""
+        with self._lock:
+            return self._walk(self._position(self._key(user_id, total_xp), inclusive=True), limit)
+
+    def around(self, user_id: int, n: int) -> List[Tuple[int, int, int]]:
+        """Up to n entries above and below a user, including the user."""
+        with self._lock:
+            key = self._keys.get(user_id)
+            if key is None:
+                return []
+            position = self._position(key)
+            start = max(0, position - n)
+            return self._walk(start, position - start + n + 1)
+
+# Shared instance used by the routers
+leaderboard_index = RankIndex()
+
+# Users refreshed while a resync is reading the ledger (None when none runs)
+_resync_lock = threading.Lock()
+_refreshed_during_resync: Optional[set] = None
+
+def warm(db: Session):
+    """Load every user's total XP from the XP ledger."""
+    leaderboard_index.load(xp_ledger.global_totals(db))
+
+def resync(db: Session) -> bool:
+    """Reload the index from the XP ledger. Returns whether anything changed."""
+    global _refreshed_during_resync
+    with _resync_lock:
+        _refreshed_during_resync = set()
+    try:
+        changed = leaderboard_index.load(xp_ledger.global_totals(db))
+    finally:
+        with _resync_lock:
+            refreshed, _refreshed_during_resync = _refreshed_during_resync, None
+    if refreshed:
+        # Their totals may be newer than what the reload read: read them again
+        db.rollback()
+        refresh_users(db, refreshed)
+    return changed
+
+def refresh_users(db: Session, user_ids: Iterable[int]):
+    """Re-read the totals of some users after their XP changed (call after commit)."""
+    user_ids = set(user_ids)
+    if not user_ids:
+        return
+    with _resync_lock:
+        if _refreshed_during_resync is not None:
+            _refreshed_during_resync.update(user_ids)
+    totals = xp_ledger.user_totals(db, user_ids)
+    for user_id in user_ids:
+        if user_id in totals:
+            leaderboard_index.set(user_id, totals[user_id])
+        else:
+            leaderboard_index.remove(user_id)
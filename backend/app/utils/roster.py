@@ -0,0 +1,207 @@
+import csv
+import json
+import os
+from itertools import islice
+from typing import Iterator, List, Optional, Tuple
+from sqlalchemy import insert, or_, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from ..config import settings
+from ..database import SessionLocal
+from ..models import RoomMember, User
+from . import xp_events
+from .log import get_logger
+
+logger = get_logger(__name__)
+
+# Bulk roster import for a room.
+#
+# The roster is a CSV file with a header row or a JSONL file of objects,
+# naming a username, email and/or student_id per student. It is read from
+# the staged upload one record at a time and imported ROSTER_BATCH_SIZE
+# records per transaction: existing users are looked up with one IN query
+# per batch (by email, then username, then student_id), missing accounts
+# (an email is required to create one) and memberships are added with bulk
+# inserts. A record whose username or email belongs to another account than
+# the one it matched is reported as a conflict and left out. report() yields
+# one result per record as it goes, so memory does not grow with the file.
+
+COLUMNS = ("username", "email", "student_id")
+FORMATS = {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl",
+           "text/csv": "csv", "application/jsonl": "jsonl", "application/x-ndjson": "jsonl"}
+
+def roster_format(filename: Optional[str], content_type: Optional[str]) -> Optional[str]:
+    """"csv" or "jsonl" from the file extension, else the content type."""
+    return FORMATS.get(os.path.splitext(filename or "")[1].lower()) or FORMATS.get((content_type or "").split(";")[0].strip())
+
+def _clean(record: dict) -> dict:
+    row = {}
+    for column in COLUMNS:
+        value = record.get(column)
+        row[column] = str(value).strip() or None if value is not None else None
+    return row
+
+def _csv_rows(reader, header) -> Iterator[Tuple[int, object]]:
+    for values in reader:
+        if not any(v.strip() for v in values):
+            continue
+        yield reader.line_num, _clean(dict(zip(header, values)))
+
+def _jsonl_rows(f) -> Iterator[Tuple[int, object]]:
+    for line_number, line in enumerate(f, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield line_number, f"Invalid JSON: {e}"
+            continue
+        if not isinstance(record, dict):
+            yield line_number, "Expected a JSON object"
+            continue
+        yield line_number, _clean(record)
+
+def read_rows(f, fmt: str) -> Iterator[Tuple[int, object]]:
+    """
+    (line number, row) for every record of an open roster file, where row is a
+    dict of COLUMNS or an error message. Raises ValueError for a CSV file whose
+    header names none of the columns.
+    """
+    if fmt == "jsonl":
+        return _jsonl_rows(f)
+    reader = csv.reader(f)
+    header = [h.strip().lower() for h in next(reader, [])]
+    if not set(header) & set(COLUMNS):
+        raise ValueError(f"CSV header must name at least one of: {', '.join(COLUMNS)}")
+    return _csv_rows(reader, header)
+
+def _username_for(row: dict) -> str:
+    return row["username"] or row["email"].split("@")[0]
+
+def _conflict(row: dict, user) -> Optional[str]:
+    """Why the row's username or email contradicts the existing user it matched, if it does."""
+    if row["username"] and row["username"] != user.username:
+        matched_by = "Email" if row["email"] else "Student ID"
+        return f"{matched_by} belongs to user {user.username!r}, not {row['username']!r}"
+    if row["email"] and user.email and row["email"] != user.email:
+        return f"User {user.username!r} has a different email"
+    return None
+
+def _import_batch(db: Session, room_id: int, batch: List[Tuple[int, object]]) -> List[dict]:
+    rows = [row for _, row in batch if isinstance(row, dict)]
+    emails = {r["email"] for r in rows if r["email"]}
+    usernames = {r["username"] for r in rows if r["username"]} | {_username_for(r) for r in rows if r["email"]}
+    student_ids = {r["student_id"] for r in rows if r["student_id"]}
+
+    by_email, by_username, by_student_id = {}, {}, {}
+    conditions = [column.in_(values) for column, values in
+                  ((User.email, emails), (User.username, usernames), (User.student_id, student_ids)) if values]
+    if conditions:
+        for user in db.execute(select(User.id, User.username, User.email, User.student_id).where(or_(*conditions))):
+            if user.email:
+                by_email[user.email] = user
+            by_username[user.username] = user
+            if user.student_id:
+                by_student_id.setdefault(user.student_id, []).append(user)
+
+    # First pass: match every row to an existing user or to an account to create
+    matched = []  # (line, result, existing user id, index into new_users)
+    new_users, new_by_email, new_usernames = [], {}, set()
+    for line, row in batch:
+        if not isinstance(row, dict):
+            matched.append((line, {"status": "error", "detail": row}, None, None))
+            continue
+        if not any(row.values()):
+            matched.append((line, {"status": "error", "detail": "No username, email or student_id"}, None, None))
+            continue
+        if row["email"] in new_by_email:
+            # Listed again in this batch: the account created for the first listing
+            index = new_by_email[row["email"]]
+            username = new_users[index]["username"]
+            if row["username"] and row["username"] != username:
+                matched.append((line, {"status": "conflict", "detail": f"Email belongs to user {username!r}, not {row['username']!r}"}, None, None))
+            else:
+                matched.append((line, {"username": username}, None, index))
+            continue
+        user = (row["email"] and by_email.get(row["email"])) or (row["username"] and by_username.get(row["username"]))
+        if not user and row["student_id"] and not row["email"]:
+            candidates = by_student_id.get(row["student_id"], [])
+            if len(candidates) > 1:
+                matched.append((line, {"status": "error", "detail": "Several users have this student_id"}, None, None))
+                continue
+            user = candidates[0] if candidates else None
+        if user:
+            conflict = _conflict(row, user)
+            if conflict:
+                matched.append((line, {"status": "conflict", "detail": conflict}, None, None))
+            else:
+                matched.append((line, {"username": user.username}, user.id, None))
+        elif not row["email"]:
+            matched.append((line, {"status": "error", "detail": "No such user (an email is needed to create one)"}, None, None))
+        else:
+            username = _username_for(row)
+            if username in by_username or username in new_usernames:
+                matched.append((line, {"status": "error", "detail": f"Username {username!r} is taken"}, None, None))
+                continue
+            new_by_email[row["email"]] = len(new_users)
+            new_usernames.add(username)
+            new_users.append({"username": username, "email": row["email"], "student_id": row["student_id"]})
+            matched.append((line, {"status": "created", "username": username}, None, len(new_users) - 1))
+
+    new_ids = []
+    if new_users:
+        new_ids = list(db.scalars(insert(User).returning(User.id, sort_by_parameter_order=True), new_users))
+
+    user_ids = {user_id for _, _, user_id, _ in matched if user_id is not None}
+    members = set(db.scalars(select(RoomMember.user_id).where(
+        RoomMember.room_id == room_id, RoomMember.user_id.in_(user_ids)
+    ))) if user_ids else set()
+    results, to_add = [], []
+    for line, result, user_id, index in matched:
+        if index is not None:
+            user_id = new_ids[index]
+        if user_id is not None:
+            result["user_id"] = user_id
+            if user_id in members:
+                result.setdefault("status", "already_member")
+            else:
+                result.setdefault("status", "added")
+                members.add(user_id)
+                to_add.append({"user_id": user_id, "room_id": room_id, "is_admin": False})
+        results.append({"line": line, "status": result.pop("status"), **result})
+
+    if to_add:
+        db.execute(insert(RoomMember), to_add)
+    db.commit()
+    return results
+
+def report(rows: Iterator[Tuple[int, object]], room_id: int, cleanup=None) -> Iterator[str]:
+    """Import rows into the room, yielding an NDJSON result line per record and a summary."""
+    summary = {"created": 0, "added": 0, "already_member": 0, "conflict": 0, "error": 0}
+    try:
+        with SessionLocal() as db:
+            while batch := list(islice(rows, settings.ROSTER_BATCH_SIZE)):
+                try:
+                    results = _import_batch(db, room_id, batch)
+                except IntegrityError:
+                    # A concurrent signup or import took one of the names: retry, it is found this time
+                    db.rollback()
+                    try:
+                        results = _import_batch(db, room_id, batch)
+                    except IntegrityError:
+                        # The response is already streaming: report the batch as failed and go on
+                        db.rollback()
+                        logger.warning("Roster batch failed twice", extra={"room_id": room_id, "records": len(batch)}, exc_info=True)
+                        results = [{"line": line, "status": "error", "detail": "Conflicting concurrent changes, import again"}
+                                   for line, _ in batch]
+                for result in results:
+                    summary[result["status"]] += 1
+                if any(result["status"] in ("created", "added") for result in results):
+                    xp_events.members_changed(room_id)
+                # One chunk per batch: every chunk is a trip through the threadpool
+                yield "".join(json.dumps(result) + "\n" for result in results)
+        logger.info("Roster imported", extra={"room_id": room_id, "summary": summary})
+        yield json.dumps({"summary": summary}) + "\n"
+    finally:
+        if cleanup:
+            cleanup()
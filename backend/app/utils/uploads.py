@@ -0,0 +1,75 @@
+import hashlib
+import os
+import uuid
+from typing import Optional
+import aiofiles
+import aiofiles.os
+from fastapi import HTTPException, UploadFile
+from ..config import settings
+
+# Shared upload pipeline.
+#
+# stage_upload streams the part to a temp file under UPLOAD_DIR/.tmp in
+# fixed-size chunks, so memory stays bounded and the event loop is never
+# blocked on disk I/O. The size limit is checked before the first byte is
+# copied (from the parsed part size) and again while streaming, and the
+# SHA-256 of the content is computed on the way. Callers promote the file
+# with commit() once their DB transaction committed, or discard() it.
+
+TEMP_DIR = os.path.join(settings.UPLOAD_DIR, ".tmp")
+
+def upload_limit(kind: str) -> int:
+    """Max size in bytes for an upload kind (a task type or "profile_picture")."""
+    return settings.UPLOAD_LIMITS.get(kind, settings.UPLOAD_LIMITS["default"])
+
+def _too_large(limit: int) -> HTTPException:
+    return HTTPException(status_code=413, detail=f"File too large (max {limit // (1024 * 1024)} MB)")
+
+class StagedUpload:
+    def __init__(self, temp_path: str, filename: str, size: int, sha256: str):
+        self.temp_path = temp_path
+        self.filename = filename
+        self.size = size
+        self.sha256 = sha256
+
+    async def commit(self, path: Optional[str] = None) -> str:
+        """Atomically move the file to path (default UPLOAD_DIR/filename) and return it."""
+        path = path or os.path.join(settings.UPLOAD_DIR, self.filename)
+        await aiofiles.os.makedirs(os.path.dirname(path), exist_ok=True)
+        await aiofiles.os.replace(self.temp_path, path)
+        return path
+
+    async def discard(self):
+        try:
+            await aiofiles.os.remove(self.temp_path)
+        except FileNotFoundError:
+            pass
+
+async def stage_upload(file: UploadFile, filename: str, max_bytes: int) -> StagedUpload:
+    """Stream an upload to a temp file. Raises 413 once it exceeds max_bytes."""
+    if file.size is not None and file.size > max_bytes:
+        raise _too_large(max_bytes)
+
+    await aiofiles.os.makedirs(TEMP_DIR, exist_ok=True)
+    temp_path = os.path.join(TEMP_DIR, f"{uuid.uuid4()}.part")
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        async with aiofiles.open(temp_path, "wb") as out:
+            while chunk := await file.read(settings.UPLOAD_CHUNK_SIZE):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise _too_large(max_bytes)
+                digest.update(chunk)
+                await out.write(chunk)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except FileNotFoundError:
+            pass
+        raise
+    return StagedUpload(temp_path, filename, size, digest.hexdigest())
+
+def safe_filename(name: str) -> str:
+    """Client file name without any directory part."""
+    return os.path.basename((name or "").replace("\\", "/")) or "upload"
@@ -0,0 +1,46 @@
+import asyncio
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from typing import Iterable
+from ..database import ReadSessionLocal
+from . import rank_index
+from .dashboard_cache import dashboard_cache
+from .leaderboard_feed import feed as leaderboard_feed
+from .log import get_logger
+
+logger = get_logger(__name__)
+
+# Single hook for "these users' submissions/XP changed". Call it after the
+# commit so every derived in-memory view is refreshed from committed data.
+
+def xp_changed(db: Session, user_ids: Iterable[int], room_ids: Iterable[int] = ()):
+    """room_ids: the rooms whose leaderboards changed with it."""
+    user_ids = set(user_ids)
+    if not user_ids:
+        return
+    rank_index.refresh_users(db, user_ids)
+    dashboard_cache.invalidate_users(user_ids)
+    dashboard_cache.invalidate_top()
+    leaderboard_feed.changed(room_ids)
+
+def members_changed(room_id: int):
+    """Someone joined or left the room: its leaderboard lists members only."""
+    leaderboard_feed.changed([room_id], global_board=False)
+
+def _resync() -> bool:
+    with ReadSessionLocal() as db:
+        return rank_index.resync(db)
+
+async def resync_periodically(interval: float):
+    """
+    Lifespan task: reload the rank index from the ledger every `interval`
+    seconds, so XP changed by other worker processes shows up here too.
+    """
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            if await run_in_threadpool(_resync):
+                dashboard_cache.invalidate_top()
+                leaderboard_feed.changed()
+        except Exception:
+            logger.exception("Rank index resync failed")
@@ -0,0 +1,159 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import func, cast, insert, Date
+from collections import defaultdict
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Set
+from ..models import Submission, Task, XPLedger
+from .game_logic import daily_xp_sql
+
+# The ledger keeps one row per (user, room, day) with the base XP and the
+# number of submissions made that day. Every write path that touches
+# Submission rows adjusts it inside the same transaction (callers commit),
+# so leaderboards read a handful of pre-grouped rows instead of every
+# submission ever made.
+
+def _submission_day(submission: Submission) -> date:
+    # Same bucketing as the original leaderboard code: timestamp.date()
+    return submission.timestamp.date()
+
+def _adjust(db: Session, user_id: int, room_id: int, day: date, xp_delta: int, count_delta: int):
+    row = db.query(XPLedger).filter(
+        XPLedger.user_id == user_id,
+        XPLedger.room_id == room_id,
+        XPLedger.day == day
+    ).first()
+    if row is None:
+        row = XPLedger(user_id=user_id, room_id=room_id, day=day, base_xp=0, submission_count=0)
+        db.add(row)
+
+    row.base_xp = (row.base_xp or 0) + xp_delta
+    row.submission_count = (row.submission_count or 0) + count_delta
+
+    if row.submission_count <= 0:
+        db.delete(row)
+    # autoflush is off, make the row visible to the next lookup in this transaction
+    db.flush()
+
+def record_submission(db: Session, submission: Submission, room_id: int):
+    """Add a freshly created submission to the ledger."""
+    # timestamp is a server default, flushing makes it loadable
+    db.flush()
+    _adjust(db, submission.user_id, room_id, _submission_day(submission), submission.xp_awarded or 0, 1)
+
+def record_xp_change(db: Session, submission: Submission, room_id: int, old_xp: int):
+    """Apply a change of xp_awarded (e.g. verify/reject) to the ledger."""
+    delta = (submission.xp_awarded or 0) - (old_xp or 0)
+    if delta:
+        _adjust(db, submission.user_id, room_id, _submission_day(submission), delta, 0)
+
+def remove_task(db: Session, task: Task) -> Set[int]:
+    """Remove every submission of a task from the ledger. Call before deleting the task.
+
+    Returns the ids of the users whose XP changed.
+    """
+    buckets = defaultdict(lambda: [0, 0])
+    rows = db.query(Submission.user_id, Submission.timestamp, Submission.xp_awarded).filter(
+        Submission.task_id == task.id
+    ).all()
+    for user_id, timestamp, xp in rows:
+        bucket = buckets[(user_id, timestamp.date())]
+        bucket[0] += xp or 0
+        bucket[1] += 1
+
+    for (user_id, day), (xp, count) in buckets.items():
+        _adjust(db, user_id, task.room_id, day, -xp, -count)
+    return {user_id for user_id, _ in buckets}
+
+def remove_room(db: Session, room_id: int) -> Set[int]:
+    """Drop all ledger rows of a room. Call before deleting the room.
+
+    Returns the ids of the users whose XP changed.
+    """
+    user_ids = {uid for (uid,) in db.query(XPLedger.user_id).filter(XPLedger.room_id == room_id).distinct()}
+    db.query(XPLedger).filter(XPLedger.room_id == room_id).delete(synchronize_session=False)
+    return user_ids
+
+def refresh_room_users(db: Session, room_id: int, user_ids: Iterable[int]):
+    """Recompute these users' ledger rows of one room from their submissions, set-based.
+
+    For bulk changes (e.g. verifying many submissions with one UPDATE), instead
+    of adjusting the ledger row by row.
+    """
+    user_ids = list(user_ids)
+    if not user_ids:
+        return
+    db.query(XPLedger).filter(XPLedger.room_id == room_id, XPLedger.user_id.in_(user_ids)).delete(synchronize_session=False)
+    buckets = submission_buckets_query(db).filter(Task.room_id == room_id, Submission.user_id.in_(user_ids)).subquery()
+    db.execute(insert(XPLedger).from_select(
+        ["user_id", "room_id", "day", "base_xp", "submission_count"],
+        db.query(buckets.c.user_id, buckets.c.room_id, buckets.c.day, buckets.c.base_xp, buckets.c.submission_count)
+    ))
+
+def submission_day_sql(db: Session, timestamp_col):
+    """SQL expression bucketing a timestamp by calendar day, like timestamp.date()."""
+    if db.get_bind().dialect.name == "sqlite":
+        # date() yields 'YYYY-MM-DD', which is how SQLite stores Date columns
+        return func.date(timestamp_col)
+    return cast(timestamp_col, Date)
+
+def submission_buckets_query(db: Session):
+    """GROUP BY (user, room, day) over the raw submissions -> base XP and count."""
+    day = submission_day_sql(db, Submission.timestamp)
+    return db.query(
+        Submission.user_id,
+        Task.room_id,
+        day.label("day"),
+        func.sum(func.coalesce(Submission.xp_awarded, 0)).label("base_xp"),
+        func.count(Submission.id).label("submission_count"),
+    ).join(Task, Submission.task_id == Task.id).group_by(Submission.user_id, Task.room_id, day)
+
+def rebuild_ledger(db: Session) -> int:
+    """Recompute the whole ledger from the submissions table. Returns the row count."""
+    db.query(XPLedger).delete(synchronize_session=False)
+    buckets = submission_buckets_query(db).subquery()
+    db.execute(insert(XPLedger).from_select(
+        ["user_id", "room_id", "day", "base_xp", "submission_count"],
+        db.query(buckets.c.user_id, buckets.c.room_id, buckets.c.day, buckets.c.base_xp, buckets.c.submission_count)
+    ))
+    db.commit()
+    return db.query(func.count(XPLedger.id)).scalar()
+
+def ensure_ledger(db: Session):
+    """Build the ledger once for databases that predate it."""
+    if db.query(XPLedger.id).first() is None and db.query(Submission.id).first() is not None:
+        rebuild_ledger(db)
+
+# Read helpers
+
+def user_rows(db: Session, user_id: int) -> List[XPLedger]:
+    return db.query(XPLedger).filter(XPLedger.user_id == user_id).order_by(XPLedger.day).all()
+
+def totals_subquery(db: Session, room_id: Optional[int] = None):
+    """user_id, total_xp with the daily multiplier tiers applied in SQL.
+
+    Each ledger row is already one (user, room, day) group, so the database
+    only sums CASE-adjusted rows and returns one row per user.
+    """
+    daily_xp = daily_xp_sql(XPLedger.base_xp, XPLedger.submission_count)
+    query = db.query(XPLedger.user_id.label("user_id"), func.sum(daily_xp).label("total_xp"))
+    if room_id is not None:
+        query = query.filter(XPLedger.room_id == room_id)
+    return query.group_by(XPLedger.user_id).subquery()
+
+def room_totals(db: Session, room_id: int) -> Dict[int, int]:
+    """user_id -> room XP (multiplier applied per day)."""
+    totals = totals_subquery(db, room_id)
+    return {uid: int(xp) for uid, xp in db.query(totals.c.user_id, totals.c.total_xp)}
+
+def user_totals(db: Session, user_ids: Iterable[int]) -> Dict[int, int]:
+    """user_id -> total XP for a few users. Users without submissions are absent."""
+    daily_xp = daily_xp_sql(XPLedger.base_xp, XPLedger.submission_count)
+    rows = db.query(XPLedger.user_id, func.sum(daily_xp)).filter(
+        XPLedger.user_id.in_(list(user_ids))
+    ).group_by(XPLedger.user_id)
+    return {uid: int(xp) for uid, xp in rows}
+
+def global_totals(db: Session) -> Dict[int, int]:
+    """user_id -> total XP, i.e. the sum of that user's room XPs."""
+    totals = totals_subquery(db)
+    return {uid: int(xp) for uid, xp in db.query(totals.c.user_id, totals.c.total_xp)}
@@ -0,0 +1,52 @@
+from logging.config import fileConfig
+from alembic import context
+from sqlalchemy import text
+from app.database import Base, engine
+import app.models  # noqa: F401 (registers the tables on Base.metadata)
+
+config = context.config
+
+# Only the alembic CLI configures logging; at app startup the app's own logging stays in place
+if config.config_file_name is not None and config.attributes.get("connection") is None:
+    fileConfig(config.config_file_name, disable_existing_loggers=False)
+
+target_metadata = Base.metadata
+
+# Any constant works; it only has to be the same for every process running migrations
+MIGRATION_LOCK_ID = 0x756E6971
+
+def _configure(**kwargs):
+    context.configure(
+        target_metadata=target_metadata,
+        # SQLite can't ALTER most things in place; batch mode rebuilds the table instead
+        render_as_batch=engine.dialect.name == "sqlite",
+        compare_type=True,
+        **kwargs
+    )
+
+def run_migrations_offline():
+    """Print the SQL instead of running it (alembic upgrade head --sql)."""
+    _configure(url=engine.url, literal_binds=True, dialect_opts={"paramstyle": "named"})
+    with context.begin_transaction():
+        context.run_migrations()
+
+def run_migrations(connection):
+    _configure(connection=connection)
+    with context.begin_transaction():
+        if connection.dialect.name == "postgresql":
+            # Several workers may start at once; the first one migrates, the others wait and find nothing to do
+            connection.execute(text("SELECT pg_advisory_xact_lock(:id)"), {"id": MIGRATION_LOCK_ID})
+        context.run_migrations()
+
+def run_migrations_online():
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        run_migrations(connection)
+        return
+    with engine.connect() as connection:
+        run_migrations(connection)
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,144 @@
+"""Baseline schema
+
+Creates every table on an empty database. Databases created before
+migrations existed (by Base.metadata.create_all and the old migrate_db.py)
+are adopted as they are: missing tables, columns and indexes are added and
+nothing else is touched, so running this on any earlier UniQuest database
+is safe.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+"""
+from alembic import context, op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+def _tables():
+    # Fresh column objects on every call: a Column can only belong to one table
+    return {
+        "users": [
+            sa.Column("id", sa.Integer, primary_key=True),
+            sa.Column("username", sa.String),
+            sa.Column("email", sa.String, nullable=True),
+            sa.Column("hashed_password", sa.String, nullable=True),
+            sa.Column("student_id", sa.String, nullable=True),
+            sa.Column("firebase_uid", sa.String, nullable=True),
+            sa.Column("provider", sa.String),
+            sa.Column("profile_picture", sa.String, nullable=True),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        ],
+        "rooms": [
+            sa.Column("id", sa.Integer, primary_key=True),
+            sa.Column("name", sa.String),
+            sa.Column("description", sa.String, nullable=True),
+            sa.Column("code", sa.String),
+            sa.Column("admin_id", sa.Integer, sa.ForeignKey("users.id")),
+            sa.Column("is_public", sa.Boolean),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        ],
+        "room_members": [
+            sa.Column("id", sa.Integer, primary_key=True),
+            sa.Column("user_id", sa.Integer, sa.ForeignKey("users.id")),
+            sa.Column("room_id", sa.Integer, sa.ForeignKey("rooms.id")),
+            sa.Column("is_admin", sa.Boolean),
+            sa.Column("joined_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        ],
+        "tasks": [
+            sa.Column("id", sa.Integer, primary_key=True),
+            sa.Column("room_id", sa.Integer, sa.ForeignKey("rooms.id")),
+            sa.Column("type", sa.String),
+            sa.Column("title", sa.String),
+            sa.Column("description", sa.String, nullable=True),
+            sa.Column("deadline", sa.DateTime(timezone=True), nullable=True),
+            sa.Column("start_time", sa.DateTime(timezone=True), nullable=True),
+            sa.Column("end_time", sa.DateTime(timezone=True), nullable=True),
+            sa.Column("xp_value", sa.Integer),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        ],
+        "submissions": [
+            sa.Column("id", sa.Integer, primary_key=True),
+            sa.Column("task_id", sa.Integer, sa.ForeignKey("tasks.id")),
+            sa.Column("user_id", sa.Integer, sa.ForeignKey("users.id")),
+            sa.Column("file_path", sa.String),
+            sa.Column("timestamp", sa.DateTime(timezone=True), server_default=sa.func.now()),
+            sa.Column("xp_awarded", sa.Integer),
+            sa.Column("status", sa.String),
+        ],
+        "blobs": [
+            sa.Column("id", sa.Integer, primary_key=True),
+            sa.Column("sha256", sa.String(64)),
+            sa.Column("path", sa.String),
+            sa.Column("size", sa.Integer),
+            sa.Column("ref_count", sa.Integer),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        ],
+        "xp_ledger": [
+            sa.Column("id", sa.Integer, primary_key=True),
+            sa.Column("user_id", sa.Integer, sa.ForeignKey("users.id")),
+            sa.Column("room_id", sa.Integer, sa.ForeignKey("rooms.id")),
+            sa.Column("day", sa.Date),
+            sa.Column("base_xp", sa.Integer),
+            sa.Column("submission_count", sa.Integer),
+            sa.UniqueConstraint("user_id", "room_id", "day", name="uq_xp_ledger_user_room_day"),
+        ],
+    }
+
+# (name, table, columns, unique)
+INDEXES = [
+    ("ix_users_id", "users", ["id"], False),
+    ("ix_users_username", "users", ["username"], True),
+    ("ix_users_email", "users", ["email"], True),
+    ("ix_users_student_id", "users", ["student_id"], False),
+    ("ix_users_firebase_uid", "users", ["firebase_uid"], True),
+    ("ix_rooms_id", "rooms", ["id"], False),
+    ("ix_rooms_code", "rooms", ["code"], True),
+    ("ix_room_members_id", "room_members", ["id"], False),
+    ("ix_tasks_id", "tasks", ["id"], False),
+    ("ix_submissions_id", "submissions", ["id"], False),
+    ("ix_submissions_file_path", "submissions", ["file_path"], False),
+    ("ix_blobs_id", "blobs", ["id"], False),
+    ("ix_blobs_sha256", "blobs", ["sha256"], True),
+    ("ix_blobs_path", "blobs", ["path"], True),
+    ("ix_xp_ledger_id", "xp_ledger", ["id"], False),
+    ("ix_xp_ledger_user_id", "xp_ledger", ["user_id"], False),
+    ("ix_xp_ledger_room_id", "xp_ledger", ["room_id"], False),
+]
+
+# Defaults the old migrate_db.py gave columns it added to existing rows
+LEGACY_DEFAULTS = {
+    ("tasks", "xp_value"): sa.text("0"),
+    ("submissions", "xp_awarded"): sa.text("0"),
+    ("submissions", "status"): sa.text("'pending'"),
+}
+
+def upgrade():
+    if context.is_offline_mode():
+        # No database to look at: emit the full schema
+        existing = {}
+        existing_indexes = set()
+    else:
+        inspector = sa.inspect(op.get_bind())
+        existing = {name: {c["name"] for c in inspector.get_columns(name)} for name in inspector.get_table_names()}
+        existing_indexes = {ix["name"] for name in existing for ix in inspector.get_indexes(name)}
+
+    for name, items in _tables().items():
+        if name not in existing:
+            op.create_table(name, *items)
+            continue
+        for column in items:
+            if isinstance(column, sa.Column) and column.name not in existing[name]:
+                op.add_column(name, sa.Column(column.name, column.type, nullable=True,
+                                              server_default=LEGACY_DEFAULTS.get((name, column.name))))
+
+    for index_name, table, columns, unique in INDEXES:
+        if index_name not in existing_indexes:
+            op.create_index(index_name, table, columns, unique=unique)
+
+def downgrade():
+    for name in reversed(list(_tables())):
+        op.drop_table(name)
@@ -0,0 +1,67 @@
+"""Composite indexes for hot lookups, one submission per user and task
+
+Adds a unique index on submissions (task_id, user_id), so duplicate
+submissions are refused by the insert itself, plus composite indexes for
+a user's submissions by time, membership checks in both directions and a
+room's tasks by deadline.
+
+Duplicate submissions that slipped in before (concurrent requests could
+both pass the old SELECT check) would make the unique index fail. This
+migration does not delete anything: it stops with the list of duplicated
+(task_id, user_id) pairs, and the operator removes them with
+scripts.dedupe_submissions before running it again.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+"""
+from alembic import context, op
+from alembic.util import CommandError
+import sqlalchemy as sa
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ("ix_submissions_task_user", "submissions", ["task_id", "user_id"], True),
+    ("ix_submissions_user_timestamp", "submissions", ["user_id", "timestamp"], False),
+    ("ix_room_members_user_room", "room_members", ["user_id", "room_id"], False),
+    ("ix_room_members_room_user", "room_members", ["room_id", "user_id"], False),
+    ("ix_tasks_room_deadline", "tasks", ["room_id", "deadline"], False),
+]
+
+# Pairs spelled out in the error; the dedupe script's dry run lists them all
+MAX_LISTED = 50
+
+submissions = sa.table("submissions", sa.column("id"), sa.column("task_id"), sa.column("user_id"))
+
+def _duplicated_pairs(bind) -> list:
+    return bind.execute(
+        sa.select(submissions.c.task_id, submissions.c.user_id)
+        .group_by(submissions.c.task_id, submissions.c.user_id)
+        .having(sa.func.count(submissions.c.id) > 1)
+        .order_by(submissions.c.task_id, submissions.c.user_id)
+    ).all()
+
+def upgrade():
+    if not context.is_offline_mode():
+        pairs = _duplicated_pairs(op.get_bind())
+        if pairs:
+            listed = ", ".join(f"({task_id}, {user_id})" for task_id, user_id in pairs[:MAX_LISTED])
+            if len(pairs) > MAX_LISTED:
+                listed += f" and {len(pairs) - MAX_LISTED} more"
+            raise CommandError(
+                f"{len(pairs)} (task_id, user_id) pairs have more than one submission: {listed}. "
+                "The unique index ix_submissions_task_user can't be created until they are removed. "
+                "Review them with `python -m scripts.dedupe_submissions`, remove them with "
+                "`python -m scripts.dedupe_submissions --apply` (from backend/), then start the API again."
+            )
+
+    for name, table, columns, unique in INDEXES:
+        op.create_index(name, table, columns, unique=unique)
+
+def downgrade():
+    for name, table, _, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,175 @@
+"""Benchmark every read endpoint in-process and save the results as JSON.
+
+Drives the app through httpx's ASGI transport (no network, no server)
+against the configured database, normally a world built with
+scripts.seed_world. Requests are spread over a pool of logged-in users and
+their rooms. For each endpoint it reports p50/p95/p99 latency, throughput
+and SQL statements per request (from the app's own metrics registry).
+
+Usage (same working directory as seed_world):
+    PYTHONPATH=/path/to/backend python -m scripts.bench_api \\
+        [--requests 200] [--concurrency 10] [--users 20] [--output bench.json] [--compare old.json]
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import time
+from datetime import datetime, timezone
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def percentile(sorted_values, q):
+    # Nearest-rank percentile
+    return sorted_values[max(0, math.ceil(q / 100 * len(sorted_values)) - 1)]
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+# name -> URL of one request, given a random generator and the user's room codes
+ENDPOINTS = {
+    "GET /auth/me": lambda rng, codes: "/auth/me",
+    "GET /dashboard": lambda rng, codes: "/dashboard",
+    "GET /rooms/my": lambda rng, codes: "/rooms/my",
+    "GET /rooms/global/leaderboard": lambda rng, codes: "/rooms/global/leaderboard",
+    "GET /rooms/{code}": lambda rng, codes: f"/rooms/{rng.choice(codes)}",
+    "GET /rooms/{code}/leaderboard": lambda rng, codes: f"/rooms/{rng.choice(codes)}/leaderboard",
+    "GET /rooms/{code}/members": lambda rng, codes: f"/rooms/{rng.choice(codes)}/members",
+    "GET /rooms/{code}/tasks": lambda rng, codes: f"/rooms/{rng.choice(codes)}/tasks",
+}
+
+async def run(args):
+    import httpx
+    from sqlalchemy import func
+    from app.main import app, lifespan
+    from app.database import SessionLocal
+    from app.models import User, Room, RoomMember, Task, Submission
+    from app.utils import metrics
+
+    db = SessionLocal()
+    try:
+        counts = {name: db.query(func.count(model.id)).scalar() for name, model in
+                  (("users", User), ("rooms", Room), ("tasks", Task), ("submissions", Submission))}
+        if not counts["users"]:
+            raise SystemExit("No users in the database, run scripts.seed_world first")
+        rng = random.Random(args.seed)
+        user_ids = [uid for (uid,) in db.query(User.id).filter(User.hashed_password.isnot(None)).order_by(User.id)]
+        sample = rng.sample(user_ids, min(args.users, len(user_ids)))
+        logins = {uid: name for uid, name in db.query(User.id, User.username).filter(User.id.in_(sample))}
+        rooms_by_user = {}
+        for user_id, code in db.query(RoomMember.user_id, Room.code).join(Room, Room.id == RoomMember.room_id).filter(RoomMember.user_id.in_(sample)):
+            rooms_by_user.setdefault(user_id, []).append(code)
+    finally:
+        db.close()
+
+    results = {}
+    async with lifespan(app):
+        transport = httpx.ASGITransport(app=app)
+        clients = []
+        for user_id, username in logins.items():
+            client = httpx.AsyncClient(transport=transport, base_url="http://bench")
+            response = await client.post("/auth/login", json={"identifier": username, "password": args.password})
+            response.raise_for_status()
+            clients.append((client, rooms_by_user.get(user_id) or ["NOROOM00"]))
+
+        for name, make_url in ENDPOINTS.items():
+            pool = itertools.cycle(clients)
+            latencies, errors = [], 0
+
+            async def one(timed: bool):
+                nonlocal errors
+                client, codes = next(pool)
+                url = make_url(rng, codes)
+                start = time.perf_counter()
+                response = await client.get(url)
+                if timed:
+                    latencies.append(time.perf_counter() - start)
+                    errors += response.status_code >= 400
+
+            async def worker(count: int, timed: bool):
+                for _ in range(count):
+                    await one(timed)
+
+            async def batch(total: int, timed: bool):
+                per_worker, extra = divmod(total, args.concurrency)
+                await asyncio.gather(*(worker(per_worker + (i < extra), timed) for i in range(args.concurrency)))
+
+            await batch(args.warmup, timed=False)
+            metrics.registry.clear()
+            started = time.perf_counter()
+            await batch(args.requests, timed=True)
+            elapsed = time.perf_counter() - started
+
+            served = sum(metrics.registry.latency_count.values())
+            queries = sum(metrics.registry.db_queries.values())
+            latencies.sort()
+            results[name] = {
+                "requests": len(latencies),
+                "errors": errors,
+                "throughput_rps": round(len(latencies) / elapsed, 1),
+                "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+                "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+                "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+                "max_ms": round(latencies[-1] * 1000, 2),
+                "queries_per_request": round(queries / served, 2) if served else None,
+            }
+            print(f"{name:<34}{results[name]['p50_ms']:>9}{results[name]['p95_ms']:>9}{results[name]['p99_ms']:>9}"
+                  f"{results[name]['throughput_rps']:>9}{results[name]['queries_per_request']:>8}{errors:>7}")
+
+        for client, _ in clients:
+            await client.aclose()
+
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "db_async": os.environ.get("DB_ASYNC", "0"),
+            "dataset": counts,
+            "settings": {k: getattr(args, k) for k in ("requests", "concurrency", "users", "warmup", "seed")},
+        },
+        "endpoints": results,
+    }
+
+def compare(current, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\nvs {baseline_path} ({baseline['meta'].get('commit')}): p95 change")
+    for name, result in current["endpoints"].items():
+        old = baseline["endpoints"].get(name)
+        if old and old.get("p95_ms"):
+            change = (result["p95_ms"] - old["p95_ms"]) / old["p95_ms"] * 100
+            print(f"{name:<34}{old['p95_ms']:>9} -> {result['p95_ms']:<9}{change:+.1f}%")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200, help="timed requests per endpoint")
+    parser.add_argument("--warmup", type=int, default=20, help="untimed requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--users", type=int, default=20, help="logged-in users to spread requests over")
+    parser.add_argument("--password", default="password", help="password of the seeded users")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default=None, help="JSON file to write (default bench-<timestamp>.json)")
+    parser.add_argument("--compare", default=None, help="earlier JSON result to compare against")
+    args = parser.parse_args()
+
+    print(f"{'endpoint':<34}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'req/s':>9}{'q/req':>8}{'errors':>7}")
+    result = asyncio.run(run(args))
+    output = args.output or f"bench-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    with open(output, "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"\nsaved {output}")
+    if args.compare:
+        compare(result, args.compare)
+
+if __name__ == "__main__":
+    main()
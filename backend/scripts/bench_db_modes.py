@@ -0,0 +1,111 @@
+"""Compare concurrent-request throughput of the sync and async DB modes.
+
+Every mode runs in its own subprocess (DB_ASYNC is read at import time)
+against a fresh temporary SQLite database, driving the app in-process
+through httpx's ASGI transport. The workload mixes dashboard, leaderboard
+and task-list reads with file submissions.
+
+Usage (from the backend/ directory):
+    python -m scripts.bench_db_modes [--clients 50] [--rounds 10]
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+async def _run_worker(clients: int, rounds: int) -> dict:
+    import httpx
+    from app.main import app, lifespan
+    from app.database import SessionLocal
+    from app.models import Room, RoomMember, Task, User
+    from app.utils.auth import get_password_hash
+    from app.utils.migrations import upgrade_database
+
+    upgrade_database()
+    # Seed one room with enough tasks for every client to submit each round
+    db = SessionLocal()
+    password = get_password_hash("bench")
+    admin = User(username="bench_admin", email="bench_admin@example.com", hashed_password=password)
+    db.add(admin)
+    db.flush()
+    room = Room(name="Bench", code="BENCH001", admin_id=admin.id)
+    db.add(room)
+    db.flush()
+    users = [User(username=f"bench_{i}", email=f"bench_{i}@example.com", hashed_password=password) for i in range(clients)]
+    db.add_all(users)
+    db.flush()
+    db.add_all([RoomMember(user_id=u.id, room_id=room.id) for u in users])
+    deadline = datetime.utcnow() + timedelta(days=30)
+    tasks = [Task(room_id=room.id, type="lecture", title=f"T{i}", xp_value=100, deadline=deadline) for i in range(rounds)]
+    db.add_all(tasks)
+    db.commit()
+    task_ids = [t.id for t in tasks]
+    db.close()
+
+    latencies = []
+
+    async def timed(call):
+        start = time.perf_counter()
+        response = await call
+        latencies.append(time.perf_counter() - start)
+        response.raise_for_status()
+
+    async def client(index: int):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+            await http.post("/auth/login", json={"identifier": f"bench_{index}", "password": "bench"})
+            for task_id in task_ids:
+                await timed(http.get("/dashboard"))
+                await timed(http.get("/rooms/BENCH001/leaderboard"))
+                await timed(http.get("/rooms/BENCH001/tasks"))
+                await timed(http.post(f"/submissions/{task_id}", files={"file": ("proof.txt", b"x" * 4096)}))
+
+    async with lifespan(app):
+        start = time.perf_counter()
+        await asyncio.gather(*(client(i) for i in range(clients)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000, 2),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95)] * 1000, 2),
+    }
+
+def run_mode(mode: str, clients: int, rounds: int) -> dict:
+    env = dict(os.environ, DB_ASYNC="1" if mode == "async" else "0")
+    env["PYTHONPATH"] = BACKEND_DIR + os.pathsep + env.get("PYTHONPATH", "")
+    with tempfile.TemporaryDirectory() as workdir:
+        out = subprocess.run(
+            [sys.executable, "-m", "scripts.bench_db_modes", "--worker", "--clients", str(clients), "--rounds", str(rounds)],
+            cwd=workdir, env=env, capture_output=True, text=True, check=True
+        )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=50, help="concurrent clients")
+    parser.add_argument("--rounds", type=int, default=10, help="request rounds per client")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(asyncio.run(_run_worker(args.clients, args.rounds))))
+        return
+
+    results = {mode: run_mode(mode, args.clients, args.rounds) for mode in ("sync", "async")}
+    print(f"{'mode':<8}{'requests':>10}{'seconds':>10}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    for mode, r in results.items():
+        print(f"{mode:<8}{r['requests']:>10}{r['seconds']:>10}{r['throughput_rps']:>10}{r['p50_ms']:>10}{r['p95_ms']:>10}")
+
+if __name__ == "__main__":
+    main()
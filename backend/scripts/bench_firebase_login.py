@@ -0,0 +1,120 @@
+"""Measure Firebase ID token verification and /auth/firebase-login without the network.
+
+Generates an RSA key, writes it as a local key set (FIREBASE_KEYSET_PATH)
+and mints ID tokens for the configured project the way Firebase would, then
+against a temporary database:
+
+  * checks that a good token is accepted and forged, expired and foreign
+    tokens are refused;
+  * times verify_firebase_token on distinct tokens (signature checked) and
+    on tokens seen before (served from the verified-token cache);
+  * runs concurrent /auth/firebase-login clients in-process through httpx's
+    ASGI transport and reports logins/s and p95.
+
+Usage (from the backend/ directory):
+    python -m scripts.bench_firebase_login [--tokens 500] [--clients 10] [--seconds 5]
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+def _p95_ms(values):
+    values = sorted(values)
+    return round(values[int(len(values) * 0.95)] * 1000, 3) if values else None
+
+def _write_keyset(workdir: str):
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    private_pem = key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                    serialization.NoEncryption()).decode()
+    public_pem = key.public_key().public_bytes(serialization.Encoding.PEM,
+                                               serialization.PublicFormat.SubjectPublicKeyInfo).decode()
+    path = os.path.join(workdir, "keyset.json")
+    with open(path, "w") as f:
+        json.dump({"bench-key": public_pem}, f)
+    return path, private_pem
+
+def _minter(private_pem: str, project_id: str, kid: str = "bench-key"):
+    from google.auth import crypt, jwt
+    signer = crypt.RSASigner.from_string(private_pem, key_id=kid)
+
+    def mint(uid: str, lifetime: int = 3600, **claims) -> str:
+        now = int(time.time())
+        payload = {"iss": f"https://securetoken.google.com/{project_id}", "aud": project_id, "sub": uid,
+                   "iat": now, "exp": now + lifetime, "auth_time": now,
+                   "email": f"{uid}@example.com", "name": uid, **claims}
+        return jwt.encode(signer, payload).decode()
+    return mint
+
+async def _run(args, workdir: str):
+    keyset_path, private_pem = _write_keyset(workdir)
+    os.environ["FIREBASE_KEYSET_PATH"] = keyset_path
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    import httpx
+    from fastapi import HTTPException
+    from app.config import settings
+    settings.UPLOAD_DIR = os.path.join(workdir, "uploads")
+    from app.main import app, lifespan
+    from app.utils import firebase
+    from app.utils.migrations import upgrade_database
+
+    upgrade_database()
+    project_id = firebase._project_id()
+    mint = _minter(private_pem, project_id)
+    _, other_pem = _write_keyset(tempfile.mkdtemp(dir=workdir))
+
+    def refused(token) -> bool:
+        try:
+            firebase.verify_firebase_token(token)
+        except HTTPException:
+            return True
+        return False
+
+    assert firebase.verify_firebase_token(mint("check"))["uid"] == "check", "valid token refused"
+    assert refused(_minter(other_pem, project_id)("forged")), "token signed with another key accepted"
+    assert refused(mint("expired", lifetime=-10)), "expired token accepted"
+    assert refused(_minter(private_pem, "some-other-project")("foreign")), "token for another project accepted"
+    print("valid token accepted; forged, expired and foreign tokens refused")
+
+    tokens = [mint(f"user{i}") for i in range(args.tokens)]
+    start = time.perf_counter()
+    for token in tokens:
+        firebase.verify_firebase_token(token)
+    cold = (time.perf_counter() - start) / len(tokens)
+    start = time.perf_counter()
+    for token in tokens:
+        firebase.verify_firebase_token(token)
+    warm = (time.perf_counter() - start) / len(tokens)
+    print(f"verify: {cold * 1e6:.0f} us per new token, {warm * 1e6:.1f} us per cached token")
+
+    latencies, errors = [], 0
+
+    async def client(i, end):
+        nonlocal errors
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as http:
+            while time.perf_counter() < end:
+                started = time.perf_counter()
+                response = await http.post("/auth/firebase-login", json={"id_token": tokens[i], "provider": "google"})
+                latencies.append(time.perf_counter() - started)
+                errors += response.status_code >= 400
+
+    async with lifespan(app):
+        end = time.perf_counter() + args.seconds
+        await asyncio.gather(*(client(i % len(tokens), end) for i in range(args.clients)))
+    print(f"firebase-login: {len(latencies) / args.seconds:.1f}/s, p95 {_p95_ms(latencies)} ms, {errors} errors")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tokens", type=int, default=500, help="distinct tokens to verify")
+    parser.add_argument("--clients", type=int, default=10, help="concurrent logging-in clients")
+    parser.add_argument("--seconds", type=float, default=5, help="duration of the login load")
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as workdir:
+        asyncio.run(_run(args, workdir))
+
+if __name__ == "__main__":
+    main()
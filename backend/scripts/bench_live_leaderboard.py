@@ -0,0 +1,135 @@
+"""Compare polling a room leaderboard with streaming its deltas during a check-in.
+
+Against a temporary database, --members students of one room submit
+--submissions times over --seconds (a lecture check-in) while --watchers
+screens follow the room's leaderboard, twice:
+
+  * polling: every watcher GETs /rooms/{code}/leaderboard every
+    --poll-interval seconds;
+  * streaming: every watcher is subscribed to the room's live leaderboard
+    (a snapshot, then the coalesced deltas).
+
+Reports messages and bytes sent to the watchers and the process CPU time of
+each run, and checks that snapshot + deltas end up equal to the polled
+leaderboard. Everything runs in-process through httpx's ASGI transport.
+
+Usage (from the backend/ directory):
+    python -m scripts.bench_live_leaderboard [--members 200] [--watchers 50] [--submissions 400] [--seconds 20] [--poll-interval 2]
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+async def _check_in(http, cookies, tasks, pending, seconds):
+    # pending: (member, task) pairs, submitted evenly over `seconds`
+    start = time.perf_counter()
+    for i, (member, task) in enumerate(pending):
+        await asyncio.sleep(max(0.0, start + i * seconds / len(pending) - time.perf_counter()))
+        response = await http.post(f"/submissions/{tasks[task]}", cookies=cookies[member],
+                                   files={"file": ("checkin.txt", io.BytesIO(b"%d-%d" % (member, task)))})
+        assert response.status_code == 200, response.text
+
+async def _poll(http, code, args, stop, stats):
+    while not stop.is_set():
+        response = await http.get(f"/rooms/{code}/leaderboard")
+        stats["messages"] += 1
+        stats["bytes"] += len(response.content)
+        try:
+            await asyncio.wait_for(stop.wait(), args.poll_interval)
+        except asyncio.TimeoutError:
+            pass
+
+async def _watch(room_id, stop, stats, state):
+    from app.utils import activity
+    from app.utils.leaderboard_feed import feed, board_topic
+    subscription = activity.bus.subscribe([board_topic(room_id)])
+    try:
+        snapshot = await feed.snapshot(room_id)
+        events = [activity.Event((), "leaderboard.snapshot", json.dumps(snapshot, separators=(",", ":")), id=activity.bus.last_id)]
+        while True:
+            for event in events:
+                stats["messages"] += 1
+                stats["bytes"] += len(event.to_sse())
+                data = json.loads(event.data)
+                for user_id in data.get("removed", []):
+                    state.pop(user_id, None)
+                state.update({e["user_id"]: e["total_xp"] for e in data["entries"]})
+            if stop.is_set():
+                break
+            event = await subscription.get(0.1)
+            events = [event] if event is not None else []
+    finally:
+        activity.bus.unsubscribe(subscription)
+
+async def _run(args, workdir: str):
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    # Cheap hashes: signing up the members is not what is measured
+    os.environ.setdefault("BCRYPT_ROUNDS", "4")
+    os.environ.setdefault("PASSWORD_WORKERS", "0")
+    import httpx
+    from app.config import settings
+    settings.UPLOAD_DIR = os.path.join(workdir, "uploads")
+    from app.main import app, lifespan
+
+    random.seed(1)
+    async with lifespan(app), httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as http:
+        cookies = []
+        for i in range(args.members + 1):
+            response = await http.post("/auth/signup", json={"username": f"student{i}", "email": f"student{i}@example.com", "password": "pw"})
+            assert response.status_code == 200, response.text
+            cookies.append(dict(response.cookies))
+            http.cookies.clear()
+        room = (await http.post("/rooms/", json={"name": "Lecture"}, cookies=cookies[0])).json()
+        code = room["code"]
+        task_count = 2 * args.submissions // args.members + 2
+        deadline = (datetime.utcnow() + timedelta(days=1)).isoformat()
+        tasks = [(await http.post(f"/rooms/{code}/tasks/", cookies=cookies[0], json={
+            "title": f"Check-in {t}", "type": "lecture", "deadline": deadline
+        })).json()["id"] for t in range(task_count)]
+        for member in range(1, args.members + 1):
+            await http.post("/rooms/join", params={"code": code}, cookies=cookies[member])
+        pairs = random.sample([(m, t) for m in range(1, args.members + 1) for t in range(task_count)], 2 * args.submissions)
+
+        results = {}
+        for mode, pending in (("polling", pairs[:args.submissions]), ("streaming", pairs[args.submissions:])):
+            stats, state, stop = {"messages": 0, "bytes": 0}, {}, asyncio.Event()
+            if mode == "polling":
+                watchers = [_poll(http, code, args, stop, stats) for _ in range(args.watchers)]
+            else:
+                watchers = [_watch(room["id"], stop, stats, state if i == 0 else {}) for i in range(args.watchers)]
+            cpu = time.process_time()
+            running = [asyncio.ensure_future(w) for w in watchers]
+            await _check_in(http, cookies, tasks, pending, args.seconds)
+            # Let the last coalesced update go out
+            await asyncio.sleep(settings.LEADERBOARD_COALESCE_SECONDS + 0.2)
+            stop.set()
+            await asyncio.gather(*running)
+            stats["cpu"] = time.process_time() - cpu
+            results[mode] = stats
+
+        polled = (await http.get(f"/rooms/{code}/leaderboard", params={"limit": settings.LEADERBOARD_STREAM_SIZE})).json()
+        assert state == {e["user_id"]: e["total_xp"] for e in polled}, "snapshot + deltas differ from the leaderboard"
+        print("snapshot + deltas match the polled leaderboard")
+
+    for mode, stats in results.items():
+        print(f"{mode:<10} {stats['messages']:>7} messages {stats['bytes'] / 1024:>10.1f} KiB {stats['cpu']:>7.2f} s CPU")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--members", type=int, default=200, help="students in the room")
+    parser.add_argument("--watchers", type=int, default=50, help="screens following the leaderboard")
+    parser.add_argument("--submissions", type=int, default=400, help="submissions per run")
+    parser.add_argument("--seconds", type=float, default=20, help="duration of the check-in")
+    parser.add_argument("--poll-interval", type=float, default=2, help="seconds between polls")
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as workdir:
+        asyncio.run(_run(args, workdir))
+
+if __name__ == "__main__":
+    main()
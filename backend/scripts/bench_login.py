@@ -0,0 +1,121 @@
+"""Compare login throughput and server responsiveness with bcrypt inline vs on worker processes.
+
+Every mode runs in its own subprocess (PASSWORD_WORKERS is read at import
+time) against a fresh temporary database with --users accounts. Login
+clients keep posting to /auth/login while a probe client polls GET /, all
+in-process through httpx's ASGI transport, for a fixed duration. "inline"
+checks passwords in the request threadpool (PASSWORD_WORKERS=0), "pool" on
+the worker processes. Reports logins/s, login p95 and probe p95: the probe
+is what every other request would feel during a burst of logins.
+
+Usage (from the backend/ directory):
+    python -m scripts.bench_login [--users 20] [--clients 20] [--seconds 10] [--workers 4]
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def _p95_ms(values):
+    values = sorted(values)
+    return round(values[int(len(values) * 0.95)] * 1000, 2) if values else None
+
+async def _run_worker(users: int, clients: int, seconds: float) -> dict:
+    import httpx
+    from app.config import settings
+    settings.UPLOAD_DIR = os.path.abspath("uploads")
+    from app.main import app, lifespan
+    from app.database import SessionLocal
+    from app.models import User
+    from app.utils.auth import get_password_hash
+    from app.utils.migrations import upgrade_database
+
+    upgrade_database()
+    password = get_password_hash("password")
+    db = SessionLocal()
+    db.add_all([User(username=f"user{i}", email=f"user{i}@example.com", hashed_password=password, provider="email")
+                for i in range(users)])
+    db.commit()
+    db.close()
+
+    login_latencies, probe_latencies, errors = [], [], Counter()
+
+    async def timed(latencies, call):
+        start = time.perf_counter()
+        try:
+            response = await call
+            if response.status_code >= 400:
+                errors[str(response.status_code)] += 1
+        except Exception as e:
+            errors[type(e).__name__] += 1
+        latencies.append(time.perf_counter() - start)
+
+    async def login_loop(http, username, end):
+        while time.perf_counter() < end:
+            await timed(login_latencies, http.post("/auth/login", json={"identifier": username, "password": "password"}))
+
+    async def probe_loop(http, end):
+        while time.perf_counter() < end:
+            await timed(probe_latencies, http.get("/"))
+            await asyncio.sleep(0.01)
+
+    async with lifespan(app):
+        transport = httpx.ASGITransport(app=app)
+        http_clients = [httpx.AsyncClient(transport=transport, base_url="http://bench") for _ in range(clients + 1)]
+        # Warm up: start the worker processes before the clock runs
+        await http_clients[0].post("/auth/login", json={"identifier": "user0", "password": "password"})
+        end = time.perf_counter() + seconds
+        await asyncio.gather(
+            probe_loop(http_clients[0], end),
+            *(login_loop(http, f"user{i % users}", end) for i, http in enumerate(http_clients[1:])),
+        )
+        for http in http_clients:
+            await http.aclose()
+
+    return {
+        "logins_per_s": round(len(login_latencies) / seconds, 1),
+        "login_p95_ms": _p95_ms(login_latencies),
+        "probe_p95_ms": _p95_ms(probe_latencies),
+        "errors": dict(errors),
+    }
+
+def run_mode(workers: int, args) -> dict:
+    env = dict(os.environ, PASSWORD_WORKERS=str(workers))
+    env["PYTHONPATH"] = BACKEND_DIR + os.pathsep + env.get("PYTHONPATH", "")
+    env.pop("DATABASE_URL", None)
+    with tempfile.TemporaryDirectory() as workdir:
+        out = subprocess.run(
+            [sys.executable, "-m", "scripts.bench_login", "--worker", "--users", str(args.users),
+             "--clients", str(args.clients), "--seconds", str(args.seconds)],
+            cwd=workdir, env=env, capture_output=True, text=True, check=True
+        )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20, help="accounts to log in as")
+    parser.add_argument("--clients", type=int, default=20, help="concurrent logging-in clients")
+    parser.add_argument("--seconds", type=float, default=10, help="duration of the login burst")
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1), help="worker processes for the pool mode")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        result = asyncio.run(_run_worker(args.users, args.clients, args.seconds))
+        print(json.dumps(result))
+        return
+
+    results = {"inline": run_mode(0, args), f"pool ({args.workers})": run_mode(args.workers, args)}
+    print(f"{'mode':<12}{'logins/s':>10}{'login p95':>11}{'probe p95':>11}  errors")
+    for mode, r in results.items():
+        print(f"{mode:<12}{r['logins_per_s']:>10}{r['login_p95_ms']:>11}{r['probe_p95_ms']:>11}  {sum(r['errors'].values())} {r['errors'] or ''}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""Compare mixed read/write throughput with and without the production SQLite profile.
+
+Every profile runs in its own subprocess (DB_PROFILE is read at import time)
+against a freshly seeded temporary database. Reader clients loop over the
+dashboard and the global and room leaderboards while writer clients keep
+submitting (distinct) files, all in-process through httpx's ASGI transport, for a
+fixed duration. Reports reads/s, writes/s, p95 latencies and errors
+(e.g. "database is locked").
+
+Usage (from the backend/ directory):
+    python -m scripts.bench_sqlite_profile [--readers 20] [--writers 5] [--seconds 15]
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def _p95_ms(values):
+    values = sorted(values)
+    return round(values[int(len(values) * 0.95)] * 1000, 2) if values else None
+
+async def _run_worker(readers: int, writers: int, seconds: float) -> dict:
+    import httpx
+    from app.config import settings
+    # Keep the uploaded files in the scratch directory, before any module derives paths from it
+    settings.UPLOAD_DIR = os.path.abspath("uploads")
+    from app.main import app, lifespan
+    from app.database import SessionLocal
+    from app.models import Room, RoomMember, Task, User
+    from app.utils.xp_ledger import rebuild_ledger
+    from app.utils.migrations import upgrade_database
+    from scripts.seed_world import seed
+
+    upgrade_database()
+    seed(users=3000, rooms=60, tasks=2000, submissions=60000, days=60, seed_value=7)
+    db = SessionLocal()
+    rebuild_ledger(db)
+    # Writers submit to their own room, which has more open tasks than they can get through
+    writer_ids = [uid for (uid,) in db.query(User.id).order_by(User.id).limit(writers)]
+    room = Room(name="Bench writes", code="BENCHW01", admin_id=writer_ids[0])
+    db.add(room)
+    db.flush()
+    db.add_all([RoomMember(user_id=uid, room_id=room.id, is_admin=uid == writer_ids[0]) for uid in writer_ids])
+    deadline = datetime.utcnow() + timedelta(days=30)
+    tasks = [Task(room_id=room.id, type="assignment", title=f"W{i}", xp_value=75, deadline=deadline) for i in range(5000)]
+    db.add_all(tasks)
+    db.commit()
+    task_ids = [t.id for t in tasks]
+    reader_rows = db.query(User.username, Room.code).join(RoomMember, RoomMember.user_id == User.id).join(
+        Room, Room.id == RoomMember.room_id).filter(User.id.notin_(writer_ids)).order_by(User.id).limit(readers * 3).all()
+    writer_names = [name for (name,) in db.query(User.username).filter(User.id.in_(writer_ids))]
+    db.close()
+
+    reader_rooms = {}
+    for username, code in reader_rows:
+        reader_rooms.setdefault(username, code)
+    read_latencies, write_latencies, errors = [], [], Counter()
+
+    async def login(username):
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench")
+        (await client.post("/auth/login", json={"identifier": username, "password": "password"})).raise_for_status()
+        return client
+
+    async def timed(latencies, call):
+        start = time.perf_counter()
+        try:
+            response = await call
+            if response.status_code >= 400:
+                errors[str(response.status_code)] += 1
+        except Exception as e:
+            errors[type(e).__name__] += 1
+        latencies.append(time.perf_counter() - start)
+
+    async def reader(http, code, end):
+        while time.perf_counter() < end:
+            await timed(read_latencies, http.get("/dashboard"))
+            await timed(read_latencies, http.get("/rooms/global/leaderboard"))
+            await timed(read_latencies, http.get(f"/rooms/{code}/leaderboard"))
+
+    async def writer(http, end):
+        for task_id in task_ids:
+            if time.perf_counter() >= end:
+                break
+            await timed(write_latencies, http.post(f"/submissions/{task_id}", files={"file": ("proof.txt", f"{task_id} {id(http)}".encode())}))
+
+    async with lifespan(app):
+        reader_clients = [(await login(name), code) for name, code in list(reader_rooms.items())[:readers]]
+        writer_clients = [await login(name) for name in writer_names]
+        end = time.perf_counter() + seconds
+        await asyncio.gather(
+            *(reader(http, code, end) for http, code in reader_clients),
+            *(writer(http, end) for http in writer_clients),
+        )
+        for http in writer_clients + [http for http, _ in reader_clients]:
+            await http.aclose()
+
+    return {
+        "reads_per_s": round(len(read_latencies) / seconds, 1),
+        "writes_per_s": round(len(write_latencies) / seconds, 1),
+        "read_p95_ms": _p95_ms(read_latencies),
+        "write_p95_ms": _p95_ms(write_latencies),
+        "errors": dict(errors),
+    }
+
+def run_profile(profile: str, args) -> dict:
+    env = dict(os.environ, DB_PROFILE=profile)
+    env["PYTHONPATH"] = BACKEND_DIR + os.pathsep + env.get("PYTHONPATH", "")
+    with tempfile.TemporaryDirectory() as workdir:
+        out = subprocess.run(
+            [sys.executable, "-m", "scripts.bench_sqlite_profile", "--worker", "--readers", str(args.readers),
+             "--writers", str(args.writers), "--seconds", str(args.seconds)],
+            cwd=workdir, env=env, capture_output=True, text=True, check=True
+        )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--readers", type=int, default=20, help="concurrent reading clients")
+    parser.add_argument("--writers", type=int, default=5, help="concurrent submitting clients")
+    parser.add_argument("--seconds", type=float, default=15, help="duration of the mixed load")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        result = asyncio.run(_run_worker(args.readers, args.writers, args.seconds))
+        print(json.dumps(result))
+        return
+
+    results = {profile: run_profile(profile, args) for profile in ("default", "production")}
+    print(f"{'profile':<12}{'reads/s':>10}{'writes/s':>10}{'read p95':>10}{'write p95':>11}  errors")
+    for profile, r in results.items():
+        print(f"{profile:<12}{r['reads_per_s']:>10}{r['writes_per_s']:>10}{r['read_p95_ms']:>10}{r['write_p95_ms']:>11}  {sum(r['errors'].values())} {r['errors'] or ''}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Fail if any hot query would scan a whole table instead of using an index.
+
+Runs EXPLAIN on the lookups the API does on nearly every request
+(membership/admin checks, a user's submissions, a room's tasks, the
+duplicate-submission check, ledger and blob lookups, ...) against the
+configured database and checks the plans: "SCAN <table>" on SQLite, any
+Seq Scan on PostgreSQL (with sequential scans disabled, so tiny test
+tables still show whether an index *could* be used). Exits non-zero
+listing the offenders, so a migration or model change that drops an
+index is caught before it reaches production.
+
+Usage (from the backend/ directory):
+    python -m scripts.check_query_plans [--upgrade] [--verbose]
+"""
+import argparse
+import re
+import sys
+from datetime import date, datetime
+from sqlalchemy import select, func, text
+from app.database import engine
+from app.models import Blob, Room, RoomMember, Submission, Task, User, XPLedger
+from app.utils.migrations import upgrade_database
+
+# name -> statement, with the parameter values the app would use
+HOT_QUERIES = {
+    "room by code": select(Room).where(Room.code == "ABCD1234"),
+    "user by id": select(User).where(User.id == 1),
+    "user by username": select(User).where(User.username == "someone"),
+    "user by email": select(User).where(User.email == "someone@example.com"),
+    "membership check": select(RoomMember).where(RoomMember.user_id == 1, RoomMember.room_id == 1),
+    "room members": select(RoomMember).where(RoomMember.room_id == 1),
+    "user's rooms": select(RoomMember.room_id).where(RoomMember.user_id == 1),
+    "room tasks by deadline": select(Task).where(Task.room_id == 1).order_by(Task.deadline),
+    "room tasks page after cursor": select(Task.id).where(Task.room_id == 1, Task.deadline > datetime(2030, 1, 1))
+        .order_by(Task.deadline.asc().nulls_last(), Task.id).limit(50),
+    "task in room": select(Task).where(Task.id == 1, Task.room_id == 1),
+    "submission for task and user": select(Submission).where(Submission.task_id == 1, Submission.user_id == 1),
+    "user's submissions for tasks": select(Submission).where(Submission.task_id.in_([1, 2, 3]), Submission.user_id == 1),
+    "task submissions": select(Submission).where(Submission.task_id == 1),
+    "recent submissions": select(Submission).where(Submission.user_id == 1)
+        .order_by(Submission.timestamp.desc(), Submission.id.desc()).limit(5),
+    "today's submissions": select(Submission).where(Submission.user_id == 1, func.date(Submission.timestamp) == date.today()),
+    "submission by file": select(Submission).where(Submission.file_path == "blobs/ab/cd/abcd.pdf"),
+    "ledger row": select(XPLedger).where(XPLedger.user_id == 1, XPLedger.room_id == 1, XPLedger.day == date.today()),
+    "user ledger": select(XPLedger).where(XPLedger.user_id == 1),
+    "room ledger": select(XPLedger).where(XPLedger.room_id == 1),
+    "blob by hash": select(Blob).where(Blob.sha256 == "0" * 64),
+    "blob by path": select(Blob).where(Blob.path == "blobs/ab/cd/abcd.pdf"),
+}
+
+_SQLITE_TABLE_SCAN = re.compile(r"^SCAN (\w+)$")
+
+def _sqlite_scans(connection, sql: str) -> tuple:
+    plan = [row[-1] for row in connection.exec_driver_sql("EXPLAIN QUERY PLAN " + sql)]
+    return plan, [m.group(1) for m in map(_SQLITE_TABLE_SCAN.match, plan) if m]
+
+def _postgres_scans(connection, sql: str) -> tuple:
+    (plan,), = connection.exec_driver_sql("EXPLAIN (FORMAT JSON) " + sql)
+    nodes, steps, scans = [plan[0]["Plan"]], [], []
+    while nodes:
+        node = nodes.pop()
+        steps.append(f"{node['Node Type']} {node.get('Relation Name', '')} {node.get('Index Name', '')}".strip())
+        if node["Node Type"] == "Seq Scan":
+            scans.append(node["Relation Name"])
+        nodes.extend(node.get("Plans", []))
+    return steps, scans
+
+def query_plans(connection):
+    """Yield (name, plan steps, scanned tables) for every hot query."""
+    explain = _postgres_scans if connection.dialect.name == "postgresql" else _sqlite_scans
+    if connection.dialect.name == "postgresql":
+        connection.execute(text("SET LOCAL enable_seqscan = off"))
+    for name, statement in HOT_QUERIES.items():
+        sql = str(statement.compile(dialect=connection.dialect, compile_kwargs={"literal_binds": True}))
+        plan, scans = explain(connection, sql)
+        yield name, plan, scans
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--upgrade", action="store_true", help="migrate to the latest revision first")
+    parser.add_argument("--verbose", action="store_true", help="print every plan")
+    args = parser.parse_args()
+
+    if args.upgrade:
+        upgrade_database()
+
+    failures = 0
+    with engine.connect() as connection:
+        for name, plan, scans in query_plans(connection):
+            failures += bool(scans)
+            print(f"{'SCAN ' + ', '.join(scans) if scans else 'ok':<24}{name}")
+            if args.verbose or scans:
+                for step in plan:
+                    print(f"{'':<24}  {step}")
+        connection.rollback()
+
+    print(f"\n{failures} of {len(HOT_QUERIES)} hot queries scan a table" if failures else f"\nall {len(HOT_QUERIES)} hot queries use an index")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
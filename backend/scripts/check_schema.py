@@ -0,0 +1,59 @@
+"""Check the configured database against the models and the migrations.
+
+Prints the database's migration revision next to the latest one and lists
+every difference between the live schema and the SQLAlchemy models
+(missing tables, columns, indexes, type changes). Exits non-zero if the
+database is behind or has drifted, so it can gate a deploy. Works with any
+DATABASE_URL.
+
+Usage (from the backend/ directory):
+    python -m scripts.check_schema [--upgrade]
+"""
+import argparse
+import sys
+from alembic.autogenerate import compare_metadata
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from app.database import Base, engine
+from app.utils.migrations import alembic_config, upgrade_database
+import app.models  # noqa: F401
+
+def describe(diff) -> str:
+    # Column modifications come grouped in lists, everything else as one tuple
+    if isinstance(diff, list):
+        return "; ".join(describe(d) for d in diff)
+    kind = diff[0]
+    if kind in ("add_table", "remove_table"):
+        return f"{kind} {diff[1].name}"
+    if kind in ("add_index", "remove_index"):
+        return f"{kind} {diff[1].name} on {diff[1].table.name}"
+    if kind in ("add_column", "remove_column"):
+        return f"{kind} {diff[2]}.{diff[3].name}"
+    if kind.startswith("modify_"):
+        return f"{kind} {diff[2]}.{diff[3]}: {diff[5]} -> {diff[6]}"
+    return " ".join(str(part) for part in diff)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--upgrade", action="store_true", help="migrate to the latest revision before checking")
+    args = parser.parse_args()
+
+    if args.upgrade:
+        upgrade_database()
+
+    head = ScriptDirectory.from_config(alembic_config()).get_current_head()
+    with engine.connect() as connection:
+        context = MigrationContext.configure(connection, opts={"compare_type": True})
+        current = context.get_current_revision()
+        diffs = compare_metadata(context, Base.metadata)
+
+    print(f"database: {engine.url.render_as_string(hide_password=True)}")
+    print(f"revision: {current or '(none)'}, latest: {head}")
+    for diff in diffs:
+        print(f"  {describe(diff)}")
+    ok = current == head and not diffs
+    print("schema OK" if ok else f"schema out of date ({len(diffs)} differences)")
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
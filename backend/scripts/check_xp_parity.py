@@ -0,0 +1,73 @@
+"""Check that the SQL leaderboard aggregation matches the Python XP rules.
+
+Compares, against the reference per-submission Python implementation
+(group by user/room/day, then get_daily_multiplier):
+  * the CASE tiers of daily_xp_sql for every submission count 0..10,
+  * global totals computed in SQL from the XP ledger,
+  * per-room totals computed in SQL from the XP ledger.
+
+Usage (from the backend/ directory):
+    python -m scripts.check_xp_parity
+Exits with status 1 on any mismatch.
+"""
+import sys
+from collections import defaultdict
+from sqlalchemy import literal, Integer
+from app.database import SessionLocal
+from app.models import Submission, Task, Room
+from app.utils.game_logic import get_daily_multiplier, daily_xp_sql
+from app.utils import xp_ledger
+
+def python_totals(db, room_id=None):
+    # Reference implementation: the leaderboard code before the ledger existed
+    query = db.query(Submission, Task.room_id).join(Task, Submission.task_id == Task.id)
+    if room_id is not None:
+        query = query.filter(Task.room_id == room_id)
+
+    user_room_day_map = defaultdict(lambda: defaultdict(lambda: defaultdict(list)))
+    for sub, rid in query.all():
+        user_room_day_map[sub.user_id][rid][sub.timestamp.date()].append(sub)
+
+    totals = {}
+    for uid, rooms in user_room_day_map.items():
+        user_total = 0
+        for rid, days in rooms.items():
+            for d, subs in days.items():
+                base = sum((s.xp_awarded or 0) for s in subs)
+                user_total += int(base * get_daily_multiplier(len(subs)))
+        totals[uid] = user_total
+    return totals
+
+def main():
+    db = SessionLocal()
+    failures = []
+    try:
+        for count in range(0, 11):
+            for base in (0, 1, 3, 75, 100, 175, 999, 10001):
+                expected = int(base * get_daily_multiplier(count))
+                got = db.query(daily_xp_sql(literal(base, Integer), literal(count, Integer))).scalar()
+                if got != expected:
+                    failures.append(f"tier base={base} count={count}: sql={got} python={expected}")
+
+        expected = python_totals(db)
+        got = xp_ledger.global_totals(db)
+        if got != expected:
+            failures.append(f"global totals differ for users {sorted(set(got.items()) ^ set(expected.items()))}")
+
+        for (room_id,) in db.query(Room.id).all():
+            expected = python_totals(db, room_id)
+            got = xp_ledger.room_totals(db, room_id)
+            if got != expected:
+                failures.append(f"room {room_id} totals differ: {sorted(set(got.items()) ^ set(expected.items()))}")
+    finally:
+        db.close()
+
+    for failure in failures:
+        print(f"MISMATCH {failure}")
+    if failures:
+        print("If only totals differ, run: python -m scripts.rebuild_xp_ledger")
+        sys.exit(1)
+    print("XP aggregation matches the Python implementation")
+
+if __name__ == "__main__":
+    main()
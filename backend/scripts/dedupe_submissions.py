@@ -0,0 +1,81 @@
+"""Remove duplicate submissions: several rows for the same task and user.
+
+Migration 0002 adds a unique index on submissions (task_id, user_id) and
+stops while duplicates exist (concurrent requests could both pass the old
+SELECT check). For every duplicated pair this keeps the verified
+submission if any, else the pending one, else the rejected one, the oldest
+first, and deletes the others: their blob references are released (files
+nobody uses anymore are deleted) and the XP ledger is rebuilt from the
+submissions left.
+
+Without --apply it only lists what it would delete. Run it with the API
+stopped, then start the API again (it runs the migration).
+
+Usage (from the backend/ directory):
+    python -m scripts.dedupe_submissions [--apply]
+"""
+import argparse
+from sqlalchemy import func
+from app.database import SessionLocal
+from app.models import Submission
+from app.utils import blobs
+from app.utils.xp_ledger import rebuild_ledger
+
+# Which duplicate survives: best status first, then the oldest row
+STATUS_ORDER = {"verified": 0, "pending": 1, "rejected": 2}
+
+def find_duplicates(db) -> list:
+    """[(kept submission, [submissions to delete])] for every duplicated (task_id, user_id) pair."""
+    pairs = db.query(Submission.task_id, Submission.user_id).group_by(
+        Submission.task_id, Submission.user_id
+    ).having(func.count(Submission.id) > 1).subquery()
+    rows = db.query(Submission).join(
+        pairs, (Submission.task_id == pairs.c.task_id) & (Submission.user_id == pairs.c.user_id)
+    ).order_by(Submission.task_id, Submission.user_id)
+
+    groups = {}
+    for submission in rows:
+        groups.setdefault((submission.task_id, submission.user_id), []).append(submission)
+    duplicates = []
+    for group in groups.values():
+        group.sort(key=lambda s: (STATUS_ORDER.get(s.status, 1), s.id))
+        duplicates.append((group[0], group[1:]))
+    return duplicates
+
+def remove_duplicates(db, duplicates: list) -> int:
+    """Delete the extra submissions found by find_duplicates and rebuild the XP ledger."""
+    doomed = [submission for _, extra in duplicates for submission in extra]
+    if not doomed:
+        return 0
+    unused_files = []
+    for submission in doomed:
+        unused_files += blobs.release_submission(db, submission)
+        db.delete(submission)
+    db.flush()
+    with blobs.removing_files(unused_files):
+        db.commit()
+    rebuild_ledger(db)
+    return len(doomed)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--apply", action="store_true", help="delete the duplicates (default: only list them)")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        duplicates = find_duplicates(db)
+        for kept, extra in duplicates:
+            print(f"task {kept.task_id}, user {kept.user_id}: keep #{kept.id} ({kept.status}), "
+                  f"delete {', '.join(f'#{s.id} ({s.status})' for s in extra)}")
+        if not duplicates:
+            print("No duplicate submissions")
+        elif args.apply:
+            print(f"Deleted {remove_duplicates(db, duplicates)} submissions and rebuilt the XP ledger")
+        else:
+            print(f"{sum(len(extra) for _, extra in duplicates)} submissions would be deleted; run again with --apply")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Move legacy "{uuid}_{filename}" submission files into the content-addressed store.
+
+Each file is hashed, stored once under UPLOAD_DIR/blobs/ and the submission
+is repointed at the blob; duplicates are deleted. Submissions whose file is
+missing are left untouched. Safe to run repeatedly.
+
+Usage (from the backend/ directory):
+    python -m scripts.migrate_uploads_to_blobs [--dry-run]
+"""
+import argparse
+import hashlib
+import os
+from app.database import SessionLocal
+from app.models import Blob, Submission
+from app.utils import blobs
+from app.utils.migrations import upgrade_database
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dry-run", action="store_true", help="report savings without changing anything")
+    args = parser.parse_args()
+
+    upgrade_database()
+    db = SessionLocal()
+    moved = duplicates = missing = saved = 0
+    placed = set()
+    try:
+        legacy = db.query(Submission).filter(~Submission.file_path.startswith(blobs.BLOB_DIR + "/")).all()
+        for submission in legacy:
+            legacy_path = blobs.resolve(submission.file_path)
+            if not os.path.isfile(legacy_path):
+                missing += 1
+                continue
+            sha256 = file_sha256(legacy_path)
+            size = os.path.getsize(legacy_path)
+            blob = db.query(Blob).filter(Blob.sha256 == sha256).first()
+            if blob is None:
+                blob = Blob(sha256=sha256, path=blobs.blob_path(sha256, submission.file_path), size=size, ref_count=0)
+                db.add(blob)
+            blob.ref_count = (blob.ref_count or 0) + 1
+            db.flush()
+
+            target = blobs.resolve(blob.path)
+            if os.path.exists(target) or blob.path in placed:
+                duplicates += 1
+                saved += size
+                if not args.dry_run:
+                    os.remove(legacy_path)
+            else:
+                moved += 1
+                placed.add(blob.path)
+                if not args.dry_run:
+                    os.makedirs(os.path.dirname(target), exist_ok=True)
+                    os.replace(legacy_path, target)
+            submission.file_path = blob.path
+            if not args.dry_run:
+                # Commit per file to keep the DB in step with the files moved so far
+                db.commit()
+        if args.dry_run:
+            db.rollback()
+    finally:
+        db.close()
+
+    print(f"moved {moved}, deduplicated {duplicates} ({saved / (1024 * 1024):.1f} MB freed), missing {missing}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,23 @@
+"""Recompute the xp_ledger table from scratch.
+
+Usage (from the backend/ directory):
+    python -m scripts.rebuild_xp_ledger
+
+Running API processes keep an in-memory ranking warmed at startup,
+restart them afterwards so it is reloaded from the new ledger.
+"""
+from app.database import SessionLocal
+from app.utils.migrations import upgrade_database
+from app.utils.xp_ledger import rebuild_ledger
+
+def main():
+    upgrade_database()
+    db = SessionLocal()
+    try:
+        rows = rebuild_ledger(db)
+        print(f"Rebuilt xp_ledger: {rows} rows")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
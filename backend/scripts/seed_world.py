@@ -0,0 +1,179 @@
+"""Fill a database with a synthetic, reproducible UniQuest world for benchmarking.
+
+Builds users, rooms (with memberships and admins), tasks of every type and
+submissions through the real models, then rebuilds the XP ledger. Activity
+is skewed like a real semester: a few popular rooms and very active users,
+most submissions shortly before deadlines, fewer on weekends, evening peaks.
+Every user's password is "password", so the benchmark runner can log in.
+
+Usage (writes to the configured database, i.e. ./uniquest.db of the
+working directory; run it from a scratch directory to keep your dev data):
+    PYTHONPATH=/path/to/backend python -m scripts.seed_world --reset \\
+        [--users 50000 --rooms 2000 --tasks 100000 --submissions 2000000] [--seed 42]
+"""
+import argparse
+import random
+import time
+from collections import defaultdict
+from itertools import accumulate
+from datetime import datetime, timedelta
+from sqlalchemy import insert, func, text
+from app.database import SessionLocal, Base, engine
+from app.models import User, Room, RoomMember, Task, Submission, TaskType
+from app.utils.auth import get_password_hash
+from app.utils.migrations import upgrade_database
+from app.utils.xp_ledger import rebuild_ledger
+
+CHUNK = 20000
+
+TASK_TYPES = [t.value for t in TaskType]
+TASK_TYPE_WEIGHTS = [40, 25, 5, 15, 10, 5]
+# Share of Saturday/Sunday submissions that stay on the weekend
+WEEKEND_KEEP = {5: 0.45, 6: 0.6}
+# Hour-of-day profile, peaking in the evening
+HOUR_WEIGHTS = [1, 0.5, 0.3, 0.2, 0.2, 0.3, 0.6, 1, 2, 3, 3, 3, 3, 3, 3, 3, 4, 5, 6, 7, 7, 6, 4, 2]
+
+def _insert(conn, table, rows):
+    for start in range(0, len(rows), CHUNK):
+        conn.execute(insert(table), rows[start:start + CHUNK])
+
+def _zipf_weights(n, s=1.1):
+    return [1.0 / (rank ** s) for rank in range(1, n + 1)]
+
+def _submission_time(rng, deadline, created_at, now):
+    # Most work is handed in during the last day or two before the deadline
+    ts = deadline - timedelta(hours=rng.expovariate(1 / 30))
+    ts = ts.replace(hour=rng.choices(range(24), HOUR_WEIGHTS)[0], minute=rng.randrange(60), second=rng.randrange(60))
+    # Thin out weekends by moving some of those submissions to the Friday before
+    if ts.weekday() in WEEKEND_KEEP and rng.random() > WEEKEND_KEEP[ts.weekday()]:
+        ts -= timedelta(days=ts.weekday() - 4)
+    return max(created_at, min(ts, deadline, now))
+
+def seed(users: int, rooms: int, tasks: int, submissions: int, days: int, seed_value: int):
+    rng = random.Random(seed_value)
+    now = datetime.utcnow().replace(microsecond=0)
+    start = now - timedelta(days=days)
+    password = get_password_hash("password")
+
+    with engine.begin() as conn:
+        print(f"users: {users}")
+        _insert(conn, User.__table__, [
+            {"username": f"user{i}", "email": f"user{i}@example.com", "hashed_password": password,
+             "student_id": f"S{i:07d}", "provider": "traditional", "created_at": start}
+            for i in range(1, users + 1)
+        ])
+        user_ids = [uid for (uid,) in conn.execute(User.__table__.select().with_only_columns(User.id).order_by(User.id))]
+
+        print(f"rooms: {rooms}")
+        admins = [rng.choice(user_ids) for _ in range(rooms)]
+        _insert(conn, Room.__table__, [
+            {"name": f"Course {i}", "description": f"Synthetic course {i}", "code": f"{i:08X}",
+             "admin_id": admins[i - 1], "is_public": rng.random() < 0.8, "created_at": start}
+            for i in range(1, rooms + 1)
+        ])
+        room_ids = [rid for (rid,) in conn.execute(Room.__table__.select().with_only_columns(Room.id).order_by(Room.id))]
+
+        # Room popularity follows a power law; each user takes 1-6 courses
+        popularity = _zipf_weights(len(room_ids))
+        members = defaultdict(set)
+        for room_id, admin_id in zip(room_ids, admins):
+            members[room_id].add(admin_id)
+        for user_id in user_ids:
+            for room_id in rng.choices(room_ids, popularity, k=rng.randint(1, 6)):
+                members[room_id].add(user_id)
+        membership_rows = [
+            {"user_id": user_id, "room_id": room_id, "is_admin": user_id == admin_id, "joined_at": start}
+            for room_id, admin_id in zip(room_ids, admins) for user_id in members[room_id]
+        ]
+        print(f"memberships: {len(membership_rows)}")
+        _insert(conn, RoomMember.__table__, membership_rows)
+
+        # Bigger rooms get more tasks; deadlines spread over the semester and two weeks ahead
+        print(f"tasks: {tasks}")
+        room_weights = [len(members[r]) ** 0.5 for r in room_ids]
+        task_rows = []
+        for room_id in rng.choices(room_ids, room_weights, k=tasks):
+            task_type = rng.choices(TASK_TYPES, TASK_TYPE_WEIGHTS)[0]
+            deadline = start + timedelta(seconds=rng.uniform(0, (days + 14) * 86400))
+            created_at = max(start, deadline - timedelta(days=rng.uniform(3, 21)))
+            task_rows.append({
+                "room_id": room_id, "type": task_type, "title": f"{task_type.title()} {len(task_rows) + 1}",
+                "deadline": deadline, "created_at": created_at,
+                "start_time": deadline - timedelta(hours=2) if task_type == "lecture" else None,
+                "end_time": deadline if task_type == "lecture" else None,
+                "xp_value": 100 if task_type == "lecture" else 75,
+            })
+        _insert(conn, Task.__table__, task_rows)
+        task_ids = [tid for (tid,) in conn.execute(Task.__table__.select().with_only_columns(Task.id).order_by(Task.id))]
+
+        # Spread the submissions over the tasks that already opened, proportionally
+        # to room size, never more than one per member and task
+        open_tasks = [(tid, row) for tid, row in zip(task_ids, task_rows) if row["created_at"] < now]
+        weights = [len(members[row["room_id"]]) * rng.uniform(0.3, 1.0) for _, row in open_tasks]
+        scale = submissions / max(sum(weights), 1)
+        activity = {uid: rng.paretovariate(1.5) for uid in user_ids}
+        pools = {}
+
+        print(f"submissions: ~{submissions}")
+        batch, written = [], 0
+        for (task_id, row), weight in zip(open_tasks, weights):
+            if row["room_id"] not in pools:
+                room_members = sorted(members[row["room_id"]])
+                pools[row["room_id"]] = (room_members, list(accumulate(activity[uid] for uid in room_members)))
+            room_members, cum_weights = pools[row["room_id"]]
+            count = min(len(room_members), int(weight * scale + rng.random()))
+            if count <= 0:
+                continue
+            # Active users are more likely to submit; top up uniformly after dropping repeats
+            chosen = set(rng.choices(room_members, cum_weights=cum_weights, k=count))
+            if len(chosen) < count:
+                chosen.update(rng.sample([uid for uid in room_members if uid not in chosen], count - len(chosen)))
+            for user_id in sorted(chosen):
+                status = rng.choices(("verified", "pending", "rejected"), (70, 25, 5))[0]
+                batch.append({
+                    "task_id": task_id, "user_id": user_id, "file_path": f"seed/{task_id}_{user_id}.pdf",
+                    "timestamp": _submission_time(rng, row["deadline"], row["created_at"], now),
+                    "xp_awarded": 0 if status == "rejected" else row["xp_value"], "status": status,
+                })
+            if len(batch) >= CHUNK:
+                _insert(conn, Submission.__table__, batch)
+                written += len(batch)
+                batch = []
+        _insert(conn, Submission.__table__, batch)
+        written += len(batch)
+        print(f"submissions written: {written}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=50000)
+    parser.add_argument("--rooms", type=int, default=2000)
+    parser.add_argument("--tasks", type=int, default=100000)
+    parser.add_argument("--submissions", type=int, default=2000000)
+    parser.add_argument("--days", type=int, default=120, help="length of the simulated semester so far")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--reset", action="store_true", help="drop all tables and migrate from scratch first")
+    args = parser.parse_args()
+
+    if args.reset:
+        Base.metadata.drop_all(bind=engine)
+        with engine.begin() as conn:
+            conn.execute(text("DROP TABLE IF EXISTS alembic_version"))
+    upgrade_database()
+    db = SessionLocal()
+    try:
+        if db.query(func.count(User.id)).scalar():
+            parser.error("the database already has users, pass --reset to replace them")
+    finally:
+        db.close()
+
+    started = time.perf_counter()
+    seed(args.users, args.rooms, args.tasks, args.submissions, args.days, args.seed)
+    db = SessionLocal()
+    try:
+        rows = rebuild_ledger(db)
+    finally:
+        db.close()
+    print(f"xp_ledger rows: {rows}; done in {time.perf_counter() - started:.1f}s")
+
+if __name__ == "__main__":
+    main()
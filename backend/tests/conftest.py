@@ -0,0 +1,72 @@
+"""Shared fixtures: one seeded database and one app for the whole run.
+
+The database is a temporary SQLite file, or TEST_DATABASE_URL when set (a
+scratch PostgreSQL database, for instance; it is emptied first). Settings
+are read at import time, so the environment is prepared before anything
+from app/ is imported.
+
+Run from the backend/ directory:
+    python -m pytest
+    TEST_DATABASE_URL=postgresql://localhost/uniquest_test python -m pytest
+"""
+import os
+import shutil
+import tempfile
+import pytest
+
+WORKDIR = tempfile.mkdtemp(prefix="uniquest-tests-")
+os.environ["DATABASE_URL"] = os.environ.get("TEST_DATABASE_URL") or f"sqlite:///{os.path.join(WORKDIR, 'test.db')}"
+os.environ["LOG_FILE"] = ""
+os.environ["RANK_INDEX_RESYNC_SECONDS"] = "0"
+# Cheap hashes, computed inline
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+os.environ.setdefault("PASSWORD_WORKERS", "0")
+
+from sqlalchemy import text
+from fastapi.testclient import TestClient
+from app.config import settings
+from app.database import Base, SessionLocal, engine
+from app.models import Room, User
+from app.utils.migrations import upgrade_database
+from app.utils.xp_ledger import rebuild_ledger
+from scripts.seed_world import seed
+
+settings.UPLOAD_DIR = os.path.join(WORKDIR, "uploads")
+
+# Password of every seeded user (see scripts/seed_world.py)
+PASSWORD = "password"
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(WORKDIR, ignore_errors=True)
+
+@pytest.fixture(scope="session")
+def world():
+    """A small seeded world: users, rooms, tasks of every type, submissions and the XP ledger."""
+    Base.metadata.drop_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE IF EXISTS alembic_version"))
+    upgrade_database()
+    seed(users=60, rooms=4, tasks=40, submissions=600, days=21, seed_value=7)
+    with SessionLocal() as db:
+        rebuild_ledger(db)
+
+@pytest.fixture(scope="session")
+def client(world):
+    """The app, started once (several TestClients would rebind the activity bus's loop)."""
+    from app.main import app
+    with TestClient(app) as test_client:
+        yield test_client
+
+def login(client: TestClient, username: str, password: str = PASSWORD):
+    """Make the client's following requests as this user."""
+    client.cookies.clear()
+    response = client.post("/auth/login", json={"identifier": username, "password": password})
+    assert response.status_code == 200, response.text
+
+@pytest.fixture
+def room_admin(client):
+    """(room code, admin username) of the first seeded room, logged in as its admin."""
+    with SessionLocal() as db:
+        code, username = db.query(Room.code, User.username).join(User, User.id == Room.admin_id).order_by(Room.id).first()
+    login(client, username)
+    return code, username
@@ -0,0 +1,84 @@
+"""Helper for test_db_modes: run in a subprocess, since DB_ASYNC is read at import time.
+
+    python tests/mode_snapshot.py seed       seed the world into DATABASE_URL
+    python tests/mode_snapshot.py snapshot   print the JSON responses of a fixed
+                                             sequence of reads and writes
+"""
+import asyncio
+import io
+import json
+import os
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.environ["LOG_FILE"] = ""
+os.environ["RANK_INDEX_RESYNC_SECONDS"] = "0"
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+os.environ.setdefault("PASSWORD_WORKERS", "0")
+
+# Set from the clock when the request runs
+VOLATILE = {"timestamp"}
+
+def _stable(value):
+    if isinstance(value, dict):
+        return {k: _stable(v) for k, v in value.items() if k not in VOLATILE}
+    if isinstance(value, list):
+        return [_stable(v) for v in value]
+    return value
+
+def seed_world():
+    from app.database import SessionLocal
+    from app.utils.migrations import upgrade_database
+    from app.utils.xp_ledger import rebuild_ledger
+    from scripts.seed_world import seed
+    upgrade_database()
+    seed(users=30, rooms=3, tasks=20, submissions=250, days=14, seed_value=11)
+    with SessionLocal() as db:
+        rebuild_ledger(db)
+
+async def snapshot() -> list:
+    import httpx
+    from app.config import settings
+    from app.database import SessionLocal
+    from app.models import Room, RoomMember, Task, User
+    settings.UPLOAD_DIR = tempfile.mkdtemp()
+    from app.main import app, lifespan
+
+    with SessionLocal() as db:
+        code, admin = db.query(Room.code, User.username).join(User, User.id == Room.admin_id).order_by(Room.id).first()
+        members = [u for (u,) in db.query(User.username).join(RoomMember, RoomMember.user_id == User.id).join(
+            Room, Room.id == RoomMember.room_id).filter(Room.code == code).order_by(User.id).limit(4)]
+        task_id = db.query(Task.id).join(Room, Room.id == Task.room_id).filter(Room.code == code).order_by(Task.id).first()[0]
+
+    results = []
+    async with lifespan(app), httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as http:
+        async def call(method, url, **kwargs):
+            response = await http.request(method, url, **kwargs)
+            body = response.json() if response.headers.get("content-type", "").startswith("application/json") else response.text
+            results.append([method, url, response.status_code, _stable(body)])
+
+        for username in [admin] + members:
+            http.cookies.clear()
+            await call("POST", "/auth/login", json={"identifier": username, "password": "password"})
+            await call("GET", "/dashboard")
+            await call("GET", "/rooms/my")
+            await call("GET", f"/rooms/{code}/tasks")
+            await call("POST", f"/submissions/{task_id}", files={"file": ("proof.txt", io.BytesIO(b"same proof"))})
+        await call("GET", "/rooms/global/leaderboard", params={"limit": 500})
+        await call("GET", f"/rooms/{code}/leaderboard", params={"limit": 500})
+        await call("GET", f"/rooms/{code}/members")
+        http.cookies.clear()
+        await call("POST", "/auth/login", json={"identifier": admin, "password": "password"})
+        await call("POST", f"/rooms/{code}/tasks/submissions/verify", json={"task_id": task_id, "current_status": "pending"})
+        await call("GET", f"/rooms/{code}/tasks/{task_id}/submissions")
+        await call("GET", "/dashboard")
+        await call("GET", "/rooms/global/leaderboard", params={"limit": 500})
+    return results
+
+if __name__ == "__main__":
+    if sys.argv[1] == "seed":
+        seed_world()
+    else:
+        print(json.dumps(asyncio.run(snapshot())))
@@ -0,0 +1,92 @@
+import asyncio
+import hashlib
+import io
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+import pytest
+from app.database import SessionLocal
+from app.models import Blob, Submission, Task
+from app.utils import blobs, xp_events, xp_ledger
+from app.utils.uploads import TEMP_DIR, StagedUpload
+
+def _tasks(client, code: str, count: int):
+    deadline = (datetime.utcnow() + timedelta(days=2)).isoformat()
+    return [client.post(f"/rooms/{code}/tasks/", json={"title": f"Blob {i}", "type": "lab", "deadline": deadline}).json()["id"]
+            for i in range(count)]
+
+def _submit(client, task_id: int, content: bytes) -> str:
+    response = client.post(f"/submissions/{task_id}", files={"file": ("proof.pdf", io.BytesIO(content))})
+    assert response.status_code == 200, response.text
+    return response.json()["file_path"]
+
+def _ref_count(path: str):
+    with SessionLocal() as db:
+        return db.query(Blob.ref_count).filter(Blob.path == path).scalar()
+
+def test_shared_file_lives_until_its_last_submission_goes(client, room_admin):
+    code, _ = room_admin
+    first, second = _tasks(client, code, 2)
+    path = _submit(client, first, b"shared blob")
+    assert _submit(client, second, b"shared blob") == path
+    assert _ref_count(path) == 2
+
+    assert client.delete(f"/rooms/{code}/tasks/{first}").status_code == 200
+    assert _ref_count(path) == 1 and os.path.exists(blobs.resolve(path))
+    assert client.delete(f"/rooms/{code}/tasks/{second}").status_code == 200
+    assert _ref_count(path) is None and not os.path.exists(blobs.resolve(path))
+
+def test_failed_commit_keeps_the_files(client, room_admin):
+    code, _ = room_admin
+    (task_id,) = _tasks(client, code, 1)
+    path = _submit(client, task_id, b"kept on rollback")
+    with pytest.raises(RuntimeError):
+        with blobs.removing_files([path]):
+            assert not os.path.exists(blobs.resolve(path))
+            raise RuntimeError("commit failed")
+    assert os.path.exists(blobs.resolve(path))
+
+def test_upload_during_release_stores_the_file_again(client, room_admin):
+    code, _ = room_admin
+    released, other = _tasks(client, code, 2)
+    content = b"released while uploaded"
+    path = _submit(client, released, content)
+    user_id = client.get("/auth/me").json()["id"]
+    with SessionLocal() as db:
+        room_id = db.get(Task, other).room_id
+
+    def upload():
+        # As submit: acquire, commit, then store the staged copy
+        os.makedirs(TEMP_DIR, exist_ok=True)
+        temp_path = os.path.join(TEMP_DIR, "race.part")
+        with open(temp_path, "wb") as f:
+            f.write(content)
+        staged = StagedUpload(temp_path, "proof.pdf", len(content), hashlib.sha256(content).hexdigest())
+        with SessionLocal() as db:
+            submission = Submission(task_id=other, user_id=user_id, file_path=blobs.acquire(db, staged).path, xp_awarded=0, status="pending")
+            db.add(submission)
+            db.flush()
+            xp_ledger.record_submission(db, submission, room_id)
+            db.commit()
+            xp_events.xp_changed(db, [user_id], [room_id])
+        asyncio.run(blobs.store(staged, path))
+
+    # As delete_task, holding the transaction open around the upload
+    with SessionLocal() as db:
+        task = db.get(Task, released)
+        affected_users = xp_ledger.remove_task(db, task)
+        unused = blobs.release_task(db, released)
+        db.delete(task)
+        db.flush()
+        assert unused == [path]
+        uploader = threading.Thread(target=upload)
+        with blobs.removing_files(unused):
+            uploader.start()
+            # The upload waits on the released row until this commit
+            time.sleep(0.5)
+            db.commit()
+        xp_events.xp_changed(db, affected_users, [room_id])
+    uploader.join()
+    assert _ref_count(path) == 1
+    assert os.path.exists(blobs.resolve(path))
@@ -0,0 +1,28 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+
+SNAPSHOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "mode_snapshot.py")
+
+def _run(step: str, db_path: str, db_async: bool) -> str:
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{db_path}", DB_ASYNC="1" if db_async else "0")
+    out = subprocess.run([sys.executable, SNAPSHOT, step], cwd=os.path.dirname(db_path), env=env,
+                         capture_output=True, text=True, timeout=300)
+    assert out.returncode == 0, out.stderr
+    return out.stdout
+
+def test_sync_and_async_modes_respond_alike(tmp_path):
+    # The same seeded database, copied for each mode, then the same requests
+    seeded = str(tmp_path / "seeded.db")
+    _run("seed", seeded, False)
+    snapshots = {}
+    for mode in ("sync", "async"):
+        path = str(tmp_path / f"{mode}.db")
+        shutil.copyfile(seeded, path)
+        snapshots[mode] = json.loads(_run("snapshot", path, mode == "async").strip().splitlines()[-1])
+    assert [status for _, _, status, _ in snapshots["sync"]].count(200) > len(snapshots["sync"]) // 2
+    for sync_call, async_call in zip(snapshots["sync"], snapshots["async"]):
+        assert sync_call == async_call
+    assert len(snapshots["sync"]) == len(snapshots["async"])
@@ -0,0 +1,51 @@
+import firebase_admin
+import pytest
+from fastapi import HTTPException
+from firebase_admin import auth
+from app.config import settings
+from app.utils import firebase
+from scripts.bench_firebase_login import _minter, _write_keyset
+
+@pytest.fixture
+def mint(tmp_path, monkeypatch):
+    """Mint ID tokens signed with a local key set the SDK verifies against."""
+    path, private_pem = _write_keyset(str(tmp_path))
+    monkeypatch.setattr(settings, "FIREBASE_KEYSET_PATH", path)
+    for app in list(firebase_admin._apps.values()):
+        firebase_admin.delete_app(app)
+    firebase._verified_tokens.clear()
+    yield lambda uid, project_id=firebase._project_id(), kid="bench-key", **kwargs: _minter(private_pem, project_id, kid)(uid, **kwargs)
+    firebase_admin.delete_app(firebase.get_app())
+    firebase._verified_tokens.clear()
+
+def _refused(token: str) -> str:
+    with pytest.raises(HTTPException) as error:
+        firebase.verify_firebase_token(token)
+    assert error.value.status_code == 401
+    return error.value.detail
+
+def test_valid_token_is_verified_once(mint, monkeypatch):
+    token = mint("alice")
+    calls = []
+    verify = auth.verify_id_token
+    monkeypatch.setattr(auth, "verify_id_token", lambda *args, **kwargs: calls.append(1) or verify(*args, **kwargs))
+    assert firebase.verify_firebase_token(token)["uid"] == "alice"
+    assert firebase.verify_firebase_token(token)["uid"] == "alice"
+    assert len(calls) == 1
+
+def test_expired_token_is_refused(mint):
+    assert "expired" in _refused(mint("bob", lifetime=-10)).lower()
+
+def test_token_for_another_project_is_refused(mint):
+    assert '"aud"' in _refused(mint("carol", project_id="some-other-project"))
+
+def test_token_signed_with_unknown_key_is_refused(mint):
+    assert "other-key" in _refused(mint("dave", kid="other-key"))
+
+def test_token_issued_in_the_future_is_refused(mint):
+    assert "too early" in _refused(mint("erin", iat=2 ** 31))
+
+def test_forged_token_is_refused(mint, tmp_path):
+    (tmp_path / "other").mkdir()
+    _, other_pem = _write_keyset(str(tmp_path / "other"))
+    assert "signature" in _refused(_minter(other_pem, firebase._project_id())("frank"))
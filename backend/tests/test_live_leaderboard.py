@@ -0,0 +1,31 @@
+import io
+from datetime import datetime, timedelta
+from app.database import SessionLocal
+from app.models import Room, RoomMember, User
+from conftest import login
+
+def test_room_leaderboard_snapshot_then_delta(client, room_admin):
+    code, admin = room_admin
+    deadline = (datetime.utcnow() + timedelta(days=2)).isoformat()
+    task_id = client.post(f"/rooms/{code}/tasks/", json={"title": "Live", "type": "lecture", "deadline": deadline}).json()["id"]
+    with SessionLocal() as db:
+        member = db.query(User.username).join(RoomMember, RoomMember.user_id == User.id).join(
+            Room, Room.id == RoomMember.room_id
+        ).filter(Room.code == code, RoomMember.is_admin.is_(False)).order_by(User.id.desc()).first().username
+
+    with client.websocket_connect(f"/activity/leaderboard/ws?room={code.lower()}") as socket:
+        snapshot = socket.receive_json()
+        assert snapshot["event"] == "leaderboard.snapshot"
+        entries = snapshot["data"]["entries"]
+        assert entries == client.get(f"/rooms/{code}/leaderboard", params={"limit": len(entries)}).json()
+
+        login(client, member)
+        response = client.post(f"/submissions/{task_id}", files={"file": ("live.txt", io.BytesIO(b"live"))})
+        assert response.status_code == 200, response.text
+        delta = socket.receive_json()
+        assert delta["event"] == "leaderboard.delta"
+        board = {e["user_id"]: e for e in client.get(f"/rooms/{code}/leaderboard", params={"limit": len(entries)}).json()}
+        changed = {e["user_id"]: e for e in delta["data"]["entries"]}
+        user_id = response.json()["user_id"]
+        assert changed[user_id]["total_xp"] == board[user_id]["total_xp"]
+        assert all(e["rank"] == board[uid]["rank"] for uid, e in changed.items())
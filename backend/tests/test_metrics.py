@@ -0,0 +1,22 @@
+from fastapi.testclient import TestClient
+from app.config import settings
+from app.main import app
+
+def _local():
+    # Without entering the context: no second lifespan
+    return TestClient(app, client=("127.0.0.1", 50000))
+
+def test_metrics_only_served_locally(client, monkeypatch):
+    monkeypatch.setattr(settings, "METRICS_TOKEN", "")
+    assert client.get("/metrics").status_code == 403
+    response = _local().get("/metrics")
+    assert response.status_code == 200
+    assert "uniquest_db_queries_total" in response.text
+    assert _local().get("/metrics", headers={"X-Forwarded-For": "203.0.113.9"}).status_code == 403
+
+def test_metrics_token(client, monkeypatch):
+    monkeypatch.setattr(settings, "METRICS_TOKEN", "scrape-me")
+    assert client.get("/metrics").status_code == 401
+    assert _local().get("/metrics").status_code == 401
+    assert client.get("/metrics", headers={"Authorization": "Bearer wrong"}).status_code == 401
+    assert client.get("/metrics", headers={"Authorization": "Bearer scrape-me"}).status_code == 200
@@ -0,0 +1,76 @@
+import os
+import pytest
+from alembic import command
+from alembic.util import CommandError
+from sqlalchemy import create_engine
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.models import Blob, Room, Submission, Task, User, XPLedger
+from app.utils import blobs
+from app.utils.migrations import alembic_config
+from scripts.dedupe_submissions import find_duplicates, remove_duplicates
+
+def _migrate(engine, revision):
+    config = alembic_config()
+    with engine.begin() as connection:
+        config.attributes["connection"] = connection
+        command.upgrade(config, revision)
+
+def _blob(letter, ref_count):
+    sha256 = letter * 64
+    path = blobs.blob_path(sha256, "proof.txt")
+    os.makedirs(os.path.dirname(blobs.resolve(path)), exist_ok=True)
+    with open(blobs.resolve(path), "w") as f:
+        f.write(letter)
+    return Blob(sha256=sha256, path=path, size=1, ref_count=ref_count)
+
+@pytest.fixture
+def old_database(tmp_path):
+    """A separate SQLite database at revision 0001, before the unique submission index."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    _migrate(engine, "0001")
+    yield engine
+    engine.dispose()
+
+def test_duplicate_submissions_stop_the_migration_until_removed(old_database):
+    with Session(old_database) as db:
+        admin, student = User(username="dupe-admin"), User(username="dupe-student")
+        db.add_all([admin, student])
+        db.flush()
+        room = Room(name="Dupes", code="DUPE0001", admin_id=admin.id)
+        db.add(room)
+        db.flush()
+        first, second = Task(room_id=room.id, type="lecture", title="First", xp_value=100), \
+            Task(room_id=room.id, type="lecture", title="Second", xp_value=100)
+        shared, alone = _blob("a", 2), _blob("b", 1)
+        db.add_all([first, second, shared, alone])
+        db.flush()
+        db.add_all([
+            Submission(task_id=first.id, user_id=student.id, file_path=shared.path, status="pending", xp_awarded=100),
+            Submission(task_id=first.id, user_id=student.id, file_path="legacy_proof.txt", status="verified", xp_awarded=100),
+            Submission(task_id=first.id, user_id=student.id, file_path=alone.path, status="rejected", xp_awarded=100),
+            Submission(task_id=second.id, user_id=student.id, file_path=shared.path, status="pending", xp_awarded=100),
+        ])
+        db.commit()
+        pair, second_id, shared_path, alone_path = (first.id, student.id), second.id, shared.path, alone.path
+
+    with pytest.raises(CommandError, match=rf"1 \(task_id, user_id\) pairs .*\({pair[0]}, {pair[1]}\)"):
+        _migrate(old_database, "head")
+
+    with Session(old_database) as db:
+        # Nothing was deleted by the failed migration
+        assert db.query(Submission).count() == 4
+        duplicates = find_duplicates(db)
+        assert [(kept.status, sorted(s.status for s in extra)) for kept, extra in duplicates] == [("verified", ["pending", "rejected"])]
+        assert remove_duplicates(db, duplicates) == 2
+        assert sorted((s.task_id, s.status) for s in db.query(Submission)) == [(pair[0], "verified"), (second_id, "pending")]
+        assert {b.path: b.ref_count for b in db.query(Blob)} == {shared_path: 1}
+        assert os.path.exists(blobs.resolve(shared_path)) and not os.path.exists(blobs.resolve(alone_path))
+        assert sorted((r.base_xp, r.submission_count) for r in db.query(XPLedger)) == [(200, 2)]
+        assert find_duplicates(db) == []
+
+    _migrate(old_database, "head")
+    with Session(old_database) as db:
+        db.add(Submission(task_id=pair[0], user_id=pair[1], file_path="again.txt", status="pending", xp_awarded=100))
+        with pytest.raises(IntegrityError):
+            db.flush()
@@ -0,0 +1,28 @@
+from passlib.hash import bcrypt
+from app.config import settings
+from app.database import SessionLocal
+from app.models import User
+from conftest import login
+
+def _stored_hash(username: str) -> str:
+    with SessionLocal() as db:
+        return db.query(User.hashed_password).filter(User.username == username).scalar()
+
+def test_login_rehashes_outdated_cost(client):
+    client.cookies.clear()
+    assert client.post("/auth/signup", json={"username": "rehash", "email": "rehash@example.com", "password": "pw"}).status_code == 200
+    assert _stored_hash("rehash").startswith(f"$2b${settings.BCRYPT_ROUNDS:02d}$")
+    outdated = bcrypt.using(rounds=settings.BCRYPT_ROUNDS + 1).hash("pw")
+    with SessionLocal() as db:
+        db.query(User).filter(User.username == "rehash").update({"hashed_password": outdated})
+        db.commit()
+
+    client.cookies.clear()
+    assert client.post("/auth/login", json={"identifier": "rehash", "password": "wrong"}).status_code == 401
+    assert _stored_hash("rehash") == outdated
+
+    login(client, "rehash", "pw")
+    upgraded = _stored_hash("rehash")
+    assert upgraded != outdated and upgraded.startswith(f"$2b${settings.BCRYPT_ROUNDS:02d}$")
+    login(client, "rehash", "pw")
+    assert _stored_hash("rehash") == upgraded
@@ -0,0 +1,54 @@
+import io
+from datetime import datetime, timedelta
+from app.utils import metrics
+from app.utils.dashboard_cache import dashboard_cache
+from conftest import PASSWORD, login
+
+def _statements(client, url: str) -> int:
+    """SQL statements run by one GET, as counted by the metrics instrumentation."""
+    # Nothing cached, so the dashboard is computed every time
+    dashboard_cache.clear()
+    before = sum(metrics.registry.db_queries.values())
+    response = client.get(url)
+    assert response.status_code == 200, response.text
+    return sum(metrics.registry.db_queries.values()) - before
+
+def _grow(client, code: str, admin: str, students, tasks: int):
+    """Add tasks to the room, and a submission per student and task."""
+    login(client, admin)
+    deadline = (datetime.utcnow() + timedelta(days=2)).isoformat()
+    created = client.post(f"/rooms/{code}/tasks/batch", json={"tasks": [
+        {"title": f"Count {i}", "type": "lecture", "deadline": deadline} for i in range(tasks)
+    ]}).json()
+    for student in students:
+        login(client, student)
+        for task in created:
+            proof = io.BytesIO(f"{student} {task['id']}".encode())
+            response = client.post(f"/submissions/{task['id']}", files={"file": ("proof.txt", proof)})
+            assert response.status_code == 200, response.text
+
+def _counts(client, code: str, student: str) -> dict:
+    login(client, student)
+    return {url: _statements(client, url) for url in (
+        f"/rooms/{code}/tasks", "/dashboard", f"/rooms/{code}/leaderboard",
+        "/rooms/global/leaderboard", f"/rooms/{code}/members",
+    )}
+
+def test_statement_counts_do_not_grow_with_data(client):
+    admin, *students = [f"counter{i}" for i in range(9)]
+    for name in [admin] + students:
+        client.cookies.clear()
+        response = client.post("/auth/signup", json={"username": name, "email": f"{name}@example.com", "password": PASSWORD})
+        assert response.status_code == 200, response.text
+    login(client, admin)
+    code = client.post("/rooms/", json={"name": "Counting"}).json()["code"]
+    for student in students:
+        login(client, student)
+        assert client.post("/rooms/join", params={"code": code}).status_code == 200
+
+    # One task and one submission, then 13 tasks with 8 students submitting to all of them
+    _grow(client, code, admin, students[:1], 1)
+    small = _counts(client, code, students[0])
+    _grow(client, code, admin, students, 12)
+    large = _counts(client, code, students[0])
+    assert large == small
@@ -0,0 +1,8 @@
+from app.database import engine
+from scripts.check_query_plans import query_plans
+
+def test_hot_queries_use_an_index(world):
+    with engine.connect() as connection:
+        scans = {name: plan for name, plan, scanned in query_plans(connection) if scanned}
+        connection.rollback()
+    assert scans == {}
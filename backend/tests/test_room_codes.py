@@ -0,0 +1,9 @@
+def test_task_endpoints_accept_lower_case_codes(client, room_admin):
+    code, _ = room_admin
+    tasks = client.get(f"/rooms/{code}/tasks").json()
+    assert tasks and client.get(f"/rooms/ {code.lower()} /tasks").json() == tasks
+    task_id = tasks[0]["id"]
+    submissions = client.get(f"/rooms/{code}/tasks/{task_id}/submissions")
+    assert submissions.status_code == 200
+    assert client.get(f"/rooms/{code.lower()}/tasks/{task_id}/submissions").json() == submissions.json()
+    assert client.get("/rooms/nosuchroom/tasks").status_code == 404
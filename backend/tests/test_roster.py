@@ -0,0 +1,32 @@
+import io
+import json
+
+def _import(client, code, csv_text):
+    response = client.post(f"/rooms/{code}/roster", files={"file": ("roster.csv", io.BytesIO(csv_text.encode()), "text/csv")})
+    assert response.status_code == 200, response.text
+    *results, summary = [json.loads(line) for line in response.text.splitlines()]
+    return results, summary["summary"]
+
+def test_username_and_email_of_different_accounts_are_conflicts(client, room_admin):
+    code, _ = room_admin
+    results, _ = _import(client, code, "username,email\nroster_ann,ann@roster.test\nroster_ben,ben@roster.test\n")
+    assert [r["status"] for r in results] == ["created", "created"]
+
+    results, summary = _import(client, code, "\n".join([
+        "username,email",
+        "roster_ben,ann@roster.test",    # email of one user, username of another
+        "roster_nobody,ann@roster.test",  # username that isn't the email's account
+        "roster_ann,new@roster.test",     # email that isn't the username's account
+        "roster_ann,ann@roster.test",
+        "roster_cid,cid@roster.test",
+        "roster_dee,cid@roster.test",     # same new email, another username
+    ]) + "\n")
+    assert [(r["line"], r["status"], r.get("detail")) for r in results] == [
+        (2, "conflict", "Email belongs to user 'roster_ann', not 'roster_ben'"),
+        (3, "conflict", "Email belongs to user 'roster_ann', not 'roster_nobody'"),
+        (4, "conflict", "User 'roster_ann' has a different email"),
+        (5, "already_member", None),
+        (6, "created", None),
+        (7, "conflict", "Email belongs to user 'roster_cid', not 'roster_dee'"),
+    ]
+    assert summary == {"created": 1, "added": 0, "already_member": 1, "conflict": 4, "error": 0}
@@ -0,0 +1,66 @@
+import io
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import Integer, literal
+from app.database import SessionLocal
+from app.models import Room, RoomMember, User
+from app.utils import xp_ledger
+from app.utils.game_logic import daily_xp_sql, get_daily_multiplier
+from scripts.check_xp_parity import python_totals
+from conftest import login
+
+def _assert_parity():
+    # The ledger (and the SQL tiers on top of it) against the per-submission Python rules
+    with SessionLocal() as db:
+        assert xp_ledger.global_totals(db) == python_totals(db)
+        for (room_id,) in db.query(Room.id):
+            assert xp_ledger.room_totals(db, room_id) == python_totals(db, room_id)
+
+@pytest.mark.parametrize("count", range(11))
+def test_daily_xp_sql_matches_multiplier(world, count):
+    with SessionLocal() as db:
+        for base in (0, 1, 3, 75, 100, 175, 999, 10001):
+            got = db.query(daily_xp_sql(literal(base, Integer), literal(count, Integer))).scalar()
+            assert got == int(base * get_daily_multiplier(count))
+
+def test_seeded_ledger_matches_python(world):
+    _assert_parity()
+
+def test_leaderboards_match_python(client):
+    with SessionLocal() as db:
+        expected = python_totals(db)
+        rooms = [(room.code, python_totals(db, room.id)) for room in db.query(Room)]
+    board = client.get("/rooms/global/leaderboard", params={"limit": 500}).json()
+    assert {e["user_id"]: e["total_xp"] for e in board if e["total_xp"]} == {u: xp for u, xp in expected.items() if xp}
+    assert [e["rank"] for e in board] == list(range(1, len(board) + 1))
+    for code, totals in rooms:
+        board = client.get(f"/rooms/{code}/leaderboard", params={"limit": 500}).json()
+        assert {e["user_id"]: e["total_xp"] for e in board if e["total_xp"]} == {u: xp for u, xp in totals.items() if xp}
+
+def test_ledger_follows_api_writes(client, room_admin):
+    code, admin = room_admin
+    with SessionLocal() as db:
+        member = db.query(User.username).join(RoomMember, RoomMember.user_id == User.id).join(
+            Room, Room.id == RoomMember.room_id
+        ).filter(Room.code == code, RoomMember.is_admin.is_(False)).order_by(User.id).first().username
+    deadline = (datetime.utcnow() + timedelta(days=2)).isoformat()
+    tasks = [client.post(f"/rooms/{code}/tasks/", json={"title": f"Parity {i}", "type": "lecture", "deadline": deadline}).json()["id"]
+             for i in range(3)]
+
+    login(client, member)
+    submissions = []
+    for task_id in tasks:
+        response = client.post(f"/submissions/{task_id}", files={"file": ("proof.txt", io.BytesIO(b"parity %d" % task_id))})
+        assert response.status_code == 200, response.text
+        submissions.append(response.json()["id"])
+        _assert_parity()
+
+    login(client, admin)
+    response = client.post(f"/rooms/{code}/tasks/{tasks[0]}/submissions/{submissions[0]}/verify", params={"status": "rejected"})
+    assert response.status_code == 200, response.text
+    _assert_parity()
+    response = client.post(f"/rooms/{code}/tasks/submissions/verify", json={"submission_ids": submissions, "status": "verified"})
+    assert response.status_code == 200, response.text
+    _assert_parity()
+    assert client.delete(f"/rooms/{code}/tasks/{tasks[1]}").status_code == 200
+    _assert_parity()